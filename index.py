@@ -3,24 +3,52 @@
 
 import os
 import logging
-import sh
 import requests
+import urllib
+import paho.mqtt.client as mqtt
 import datetime
 import status
 from status import set_password
-from time import sleep
+from status.archive import upload, SyslogArchive, SyslogState
+from status.batch import BatchReader, MAX_ITEMS, TIMEOUT
+from status.disks import disk_usages
+from status.cache import FieldCache
+from status.encoding import EncodedCache, EncodingError
+from status.encoding import parse_encoding, encode, dumps
+from status.feed import StatusFeed
+from status.fields import STATUS_FIELDS, FieldError, project
+from status.history import History
+from status.jobs import JobQueue, JobError
+from status.processes import SORT_KEYS
+from status.scheduler import Scheduler
+from status.store import WriteBehindStore
+from status.tags import TagCatalog, TagCatalogFile
+from status.versions import VersionTracker, VersionError
+from status.versions import parse_version, etag
 from sanji.core import Sanji
 from sanji.core import Route
+from sanji.message import Message
 from sanji.model_initiator import ModelInitiator
 from sanji.connection.mqtt import Mqtt
 
-from voluptuous import Schema
-from voluptuous import Required, REMOVE_EXTRA, Length, Any, All
+from voluptuous import Schema, Invalid
+from voluptuous import Required, REMOVE_EXTRA, Length, Any, All, Range, Coerce
 
 
 _logger = logging.getLogger("sanji.status")
 
 
+class CompactMqtt(Mqtt):
+    """Mqtt connection publishing compact JSON, without the spaces of the
+    default separators."""
+
+    def publish(self, topic="/controller", qos=2, payload=None):
+        result = self.client.publish(topic, payload=dumps(payload), qos=qos)
+        if result[0] == mqtt.MQTT_ERR_NO_CONN:
+            raise RuntimeError("No connection")
+        return result[1]
+
+
 class Index(Sanji):
 
     HOSTNAME_SCHEMA = Schema({
@@ -46,15 +74,82 @@ class Index(Sanji):
         "defaultRoute": ALIASNAME_SCHEMA
     }
 
+    UPDATE_PROPERTIES_SCHEMA = Schema(PROPERTIES_SCHEMA)
+
     UPDATE_PROPERTY_SCHEMA = Schema({
         "data": Any(list, dict, str, unicode, int, float)
     }, extra=REMOVE_EXTRA)
 
+    STATUS_CACHE_SCHEMA = Schema({
+        Required("ttls"): {
+            Any(*STATUS_FIELDS.names()): All(Any(int, float), Range(min=0))
+        }
+    }, extra=REMOVE_EXTRA)
+
+    STATUS_FEED_SCHEMA = Schema({
+        "enable": bool,
+        "interval": All(int, Range(min=0)),
+        "minInterval": All(Any(int, float), Range(min=0)),
+        "thresholds": {
+            Any(unicode, str): {
+                Required("high"): Any(int, float),
+                "low": Any(int, float)
+            }
+        }
+    }, extra=REMOVE_EXTRA)
+
+    HISTORY_SCHEMA = Schema({
+        "fields": Any(unicode, str),
+        "from": Coerce(float),
+        "to": Coerce(float),
+        "step": All(Coerce(int), Range(min=1))
+    }, extra=REMOVE_EXTRA)
+
+    PROCESSES_SCHEMA = Schema({
+        "sort": Any(*SORT_KEYS.keys()),
+        "limit": All(Coerce(int), Range(min=1, max=100))
+    }, extra=REMOVE_EXTRA)
+
+    BATCH_SCHEMA = Schema({
+        Required("requests"): All([{
+            Required("resource"): All(Any(unicode, str), Length(1, 4096)),
+            "query": {Any(unicode, str): Any(unicode, str, int, float, bool)},
+            "headers": dict
+        }], Length(1, MAX_ITEMS)),
+        "timeout": All(Any(int, float), Range(min=0, max=TIMEOUT))
+    }, extra=REMOVE_EXTRA)
+
+    SYSLOG_SCHEMA = Schema({
+        Required("url"): All(Any(unicode, str), Length(1, 4096)),
+        "headers": dict,
+        "from": Any(int, float),
+        "to": Any(int, float),
+        "files": [Any(unicode, str)],
+        "sinceLastUpload": bool,
+        "level": All(int, Range(min=1, max=9)),
+        "workers": All(int, Range(min=1, max=4))
+    }, extra=REMOVE_EXTRA)
+
     def init(self, *args, **kwargs):
         path_root = os.path.abspath(os.path.dirname(__file__))
         self.status = status.Status(name="status", path=path_root)
         self.properties = ModelInitiator(
             model_name="properties", model_path=path_root)
+        self.properties_store = WriteBehindStore(self.properties)
+        self.status_cache = FieldCache(ttls=STATUS_FIELDS.ttls())
+        self.status_versions = VersionTracker()
+        self.encoded = EncodedCache()
+        self.properties_versions = VersionTracker()
+        self.syslog_state = os.path.join(path_root, "data", "syslog.state")
+        # uploads wait on remote servers, keep them off reboot and password
+        self.jobs = JobQueue(lanes={"upload": 2})
+        self.batch = BatchReader()
+        self.tag_catalog = TagCatalog()
+        self.tag_file = TagCatalogFile()
+        self.history = History()
+        self.history_scheduler = Scheduler()
+        self.status_feed = StatusFeed()
+        self.history_scheduler.add("sample", 1, self.sample_status)
 
         # Check aliasName
         if self.properties.db.get("aliasName", "$ModelName") == "$ModelName":
@@ -70,109 +165,337 @@ class Index(Sanji):
         if saved_hostname != self.status.get_hostname():
             self.status.set_hostname(saved_hostname)
 
+    def run(self):
+        self.history_scheduler.run()
+
+    def before_stop(self):
+        self.history_scheduler.stop()
+        self.jobs.close()
+        self.batch.close()
+        self.properties_store.close()
+
+    def sample_status(self):
+        # mxsysstatusd keeps a persistent history, record only without it
+        record = self.status.history is None
+        if not record and not self.status_feed.enable:
+            return
+        metrics = self.status.get_metrics()
+        if record:
+            self.history.update(metrics)
+        if self.status_feed.enable:
+            self.publish_status(metrics)
+
+    def publish_status(self, metrics):
+        """Publish a /system/status event if one is due."""
+        event = self.status_feed.check(metrics)
+        if event is None:
+            return
+        event["status"] = dict([(_, self.get_status_field(_))
+                                for _ in STATUS_FIELDS.names()])
+        self.publish.event.put("/system/status", data=event)
+
     def set_alias(self):
         try:
-            version = sh.pversion()
-            self.properties.db["aliasName"] = version.split()[0]
+            version = self.status.get_pversion()
+            alias = version.split()[0]
         except Exception:
-            self.properties.db["aliasName"] = "ThingsPro"
-        self.properties.save_db()
+            alias = "ThingsPro"
+        self.properties_store.update({"aliasName": alias})
 
     def set_prodoct_info(self):
         try:
-            version = sh.pversion().replace("\n", "")
-            self.properties.db["modelName"] = version.split()[0]
-            self.properties.db["softwareVersion"] = version.replace(
-                version.split()[0]+" ", "")
+            version = self.status.get_pversion().replace("\n", "")
+            info = {
+                "modelName": version.split()[0],
+                "softwareVersion": version.replace(version.split()[0]+" ", "")
+            }
         except Exception:
-            self.properties.db["modelName"] = ""
-            self.properties.db["softwareVersion"] = ""
-        self.properties.save_db()
+            info = {"modelName": "", "softwareVersion": ""}
+        self.properties_store.update(info)
+
+    def get_status_field(self, field, filters=None):
+        return self.status_cache.get(
+            field, STATUS_FIELDS.loader(field, self.status, filters),
+            key=STATUS_FIELDS.key(field, filters))
+
+    def conditional_response(self, response, version, data, changed,
+                             encoding=("json", False)):
+        """Response of a conditional read: 304 if no key changed since the
+        version of the client, otherwise only the changed keys."""
+        if not changed:
+            return response(code=304, data={
+                "version": version, "etag": etag(version)})
+        return response(data=encode({
+            "version": version,
+            "etag": etag(version),
+            "data": dict([(_, data[_]) for _ in changed])
+        }, *encoding))
+
+    def encoded_response(self, response, key, version, build, encoding):
+        """Response encoded once for each version of the resource."""
+        if encoding == ("json", False):
+            return response(data=build())
+        return response(data=self.encoded.get(
+            key, version, encoding[0], encoding[1], build))
 
     @Route(methods="get", resource="/system/status")
     def get_status(self, message, response):
-        if message.query.get("fields") is None:
-            return response(
-                data={
-                    "hostname": self.status.get_hostname(),
-                    "version": self.status.get_product_version(),
-                    "uptimeSec": self.status.get_uptime(),
-                    "cpuUsage": self.status.get_cpu_usage(),
-                    "memoryUsage": self.status.get_memory_usage(),
-                    "memory": self.status.get_memory(),
-                    "disks": self.status.get_disks()
-                }
-            )
-
-        fields = [_.strip() for _ in message.query.get("fields").split(',')]
-        data = {}
-        if "hostname" in fields:
-            data["hostname"] = self.status.get_hostname()
-        if "version" in fields:
-            data["version"] = self.status.get_product_version()
-        if "uptimeSec" in fields:
-            data["uptimeSec"] = self.status.get_uptime()
-        if "cpuUsage" in fields:
-            data["cpuUsage"] = self.status.get_cpu_usage()
-        if "memoryUsage" in fields:
-            data["memoryUsage"] = self.status.get_memory_usage()
-        if "memory" in fields:
-            data["memory"] = self.status.get_memory()
-        if "disks" in fields:
-            data["disks"] = self.status.get_disks()
-
-        return response(data=data)
+        try:
+            fields, filters = STATUS_FIELDS.parse(message.query)
+            since = parse_version(message)
+            encoding = parse_encoding(message)
+        except (FieldError, VersionError, EncodingError) as e:
+            return response(code=400, data={"message": str(e)})
+
+        values = {}
+        keys = {}
+        for field in fields:
+            keys[field] = STATUS_FIELDS.key(field, filters.get(field))
+            values[keys[field]] = self.get_status_field(
+                field, filters.get(field))
+        version = self.status_versions.update(values)
+
+        def build():
+            return dict([(field, project(values[keys[field]], paths))
+                         for field, paths in fields.items()])
+
+        if since is None:
+            return self.encoded_response(
+                response, "status?%r" % sorted(fields.items() + [
+                    ("filters", sorted(filters.items()))]),
+                version, build, encoding)
+        changed = self.status_versions.changed(since, keys.values())
+        return self.conditional_response(
+            response, version, build(),
+            [_ for _ in fields if keys[_] in changed], encoding)
 
     @Route(methods="put", resource="/system/status")
     def put_status(self, message, response, schema=HOSTNAME_SCHEMA):
         self.status.set_hostname(message.data['hostname'])
+        self.status_cache.invalidate("hostname")
         return response(data=message.data)
 
+    @Route(methods="get", resource="/system/status/cache")
+    def get_status_cache(self, message, response):
+        return response(data=self.status_cache.stats())
+
+    @Route(methods="put", resource="/system/status/cache",
+           schema=STATUS_CACHE_SCHEMA)
+    def put_status_cache(self, message, response):
+        self.status_cache.ttls.update(message.data["ttls"])
+        return response(data=self.status_cache.stats())
+
+    @Route(methods="get", resource="/system/status/feed")
+    def get_status_feed(self, message, response):
+        return response(data=self.status_feed.to_dict())
+
+    @Route(methods="put", resource="/system/status/feed",
+           schema=STATUS_FEED_SCHEMA)
+    def put_status_feed(self, message, response):
+        try:
+            self.status_feed.configure(
+                enable=message.data.get("enable"),
+                interval=message.data.get("interval"),
+                min_interval=message.data.get("minInterval"),
+                thresholds=message.data.get("thresholds"))
+        except ValueError as e:
+            return response(code=400, data={"message": str(e)})
+        return response(data=self.status_feed.to_dict())
+
+    @Route(methods="get", resource="/system/status/history")
+    def get_status_history(self, message, response):
+        try:
+            query = Index.HISTORY_SCHEMA(message.query)
+            encoding = parse_encoding(message)
+        except (Invalid, EncodingError) as e:
+            return response(code=400, data={"message": str(e)})
+        fields = query.get("fields")
+        if fields is not None:
+            fields = [_.strip() for _ in fields.split(",") if _.strip()]
+        history = self.status.history
+        if history is None:
+            history = self.history
+        # every query covers new samples, there is no snapshot to reuse
+        return response(data=encode(history.query(
+            fields, query.get("from"), query.get("to"), query.get("step")),
+            *encoding))
+
+    def read(self, resource, query=None, headers=None):
+        """Answer a get request of this bundle in process.
+
+            Return:
+                response (tuple): (code, data)
+        """
+        if query:
+            resource = "%s%s%s" % (resource, "&" if "?" in resource else "?",
+                                   urllib.urlencode(query))
+        results = self.router.dispatch(Message({
+            "method": "get",
+            "resource": resource,
+            "headers": headers or {}
+        }))
+        if not results:
+            return 404, {"message": "Route '%s' not found." % resource}
+
+        answer = []
+
+        def respond(code=200, data=None, **kwargs):
+            answer.append((code, data))
+
+        for result in results:
+            for handler in result["handlers"]:
+                handler["callback"](self, result["message"], respond)
+        if not answer:
+            return 500, {"message": "No response."}
+        return answer[0]
+
+    @Route(methods="post", resource="/system/batch", schema=BATCH_SCHEMA)
+    def post_batch(self, message, response):
+        items = message.data["requests"]
+        results = self.batch.run(
+            [lambda item=item: self.read(
+                item["resource"], item.get("query"), item.get("headers"))
+             for item in items],
+            message.data.get("timeout", TIMEOUT))
+        return response(data={"responses": [{
+            "resource": item["resource"],
+            "code": code,
+            "data": data
+        } for item, (code, data) in zip(items, results)]})
+
     @Route(methods="get", resource="/network/interfaces")
     def get_net_interface(self, message, response):
+        query = getattr(message, "query", None) or {}
+        if query.get("counters") in ("1", "true"):
+            return response(data=self.status.get_net_counters())
         ifaces = self.status.get_net_interfaces()
         return response(data=ifaces)
 
-    @Route(methods="post", resource="/system/syslog")
+    @Route(methods="get", resource="/system/processes")
+    def get_processes(self, message, response):
+        try:
+            query = Index.PROCESSES_SCHEMA(message.query)
+        except Invalid as e:
+            return response(code=400, data={"message": str(e)})
+        return response(data=self.status.get_processes(
+            query.get("sort", "cpu"), query.get("limit", 10)))
+
+    @Route(methods="post", resource="/system/syslog", schema=SYSLOG_SCHEMA)
     def post_syslog(self, message, response):
-        output = status.tar_syslog_files(
-            "/run/shm/syslog-%s.tar.gz" %
-            (datetime.datetime.now().strftime("%Y%m%d%H%M")))
-        headers = message.data.get("headers", {})
-        r = requests.post(
-            message.data["url"],
-            files={output: open(output, "rb")},
-            headers=headers,
-            verify=False
-        )
+        data = message.data
+        job = self.jobs.submit(
+            "syslog", lambda job: self.upload_syslog(job, data),
+            lane="upload")
+        return response(code=202, data=job.to_dict())
+
+    def upload_syslog(self, job, data):
+        filename = "syslog-%s.tar.gz" % (
+            datetime.datetime.now().strftime("%Y%m%d%H%M"))
+        headers = data.get("headers", {})
+        archive = SyslogArchive(
+            status.SYSLOG_PATHS,
+            globs=data.get("files"),
+            start=data.get("from"),
+            end=data.get("to"),
+            state=SyslogState(self.syslog_state)
+            if data.get("sinceLastUpload") else None,
+            level=data.get("level", 6),
+            workers=data.get("workers", 1))
+
+        def chunks():
+            for chunk in archive.chunks():
+                job.check()
+                job.progress = {"files": archive.files,
+                                "bytes": archive.compressed_bytes}
+                yield chunk
+
+        try:
+            r = upload(data["url"], filename, chunks(), headers=headers)
+        except requests.exceptions.RequestException as e:
+            _logger.warning("Cannot upload %s: %s" % (filename, e))
+            raise JobError("Can't upload config.")
 
         if r.status_code != requests.codes.ok:
-            return response(
-                code=r.status_code,
-                data={"message": "Can't upload config."}
-            )
+            raise JobError("Can't upload config.", r.status_code)
 
-        sh.rm("-rf", sh.glob("/run/shm/syslog-*.tar.gz"))
         resp = r.json()
         if "url" not in resp:
-            return response(
-                code=500, data={"message": "Can't get file link."})
+            raise JobError("Can't get file link.")
 
-        return response(data={"url": resp["url"]})
+        archive.commit()
+        result = archive.stats()
+        result["url"] = resp["url"]
+        _logger.info("Uploaded %s: %d files, %d bytes, ratio %.3f, %.3fs" % (
+            filename, result["files"], result["bytes"], result["ratio"],
+            result["seconds"]))
+        return result
 
     @Route(methods="post", resource="/system/reboot")
     def post_reboot(self, message, response):
-        response()
-        sleep(3)
-        self.status.reboot()
+        def reboot(job):
+            job.sleep(3)
+            self.status.reboot()
+
+        job = self.jobs.submit("reboot", reboot)
+        return response(code=202, data=job.to_dict())
 
     @Route(methods="put", resource="/system/password", schema=PASSWORD_SCHEMA)
     def post_passwd(self, message, response):
-        set_password(message.data["password"])
-        return response()
+        password = message.data["password"]
+
+        def change_password(job):
+            set_password(password)
+
+        job = self.jobs.submit("password", change_password)
+        return response(code=202, data=job.to_dict())
+
+    @Route(methods="get", resource="/system/jobs")
+    def get_jobs(self, message, response):
+        return response(data=[_.to_dict() for _ in self.jobs.list()])
+
+    def _job_id(self, message):
+        try:
+            return int(message.param["id"])
+        except (KeyError, ValueError):
+            return None
+
+    @Route(methods="get", resource="/system/jobs/:id")
+    def get_job(self, message, response):
+        job = self.jobs.get(self._job_id(message))
+        if job is None:
+            return response(code=404, data={"message": "No such job."})
+        return response(data=job.to_dict())
+
+    @Route(methods="delete", resource="/system/jobs/:id")
+    def delete_job(self, message, response):
+        job = self.jobs.cancel(self._job_id(message))
+        if job is None:
+            return response(code=404, data={"message": "No such job."})
+        return response(data=job.to_dict())
 
     @Route(methods="get", resource="/system/properties")
     def get_properties(self, message, response):
+        try:
+            since = parse_version(message)
+            encoding = parse_encoding(message)
+        except (VersionError, EncodingError) as e:
+            return response(code=400, data={"message": str(e)})
+        version = self.properties_versions.update(self.properties.db)
+        if since is None:
+            return self.encoded_response(
+                response, "properties", version,
+                lambda: self.properties.db, encoding)
+        return self.conditional_response(
+            response, version, self.properties.db,
+            self.properties_versions.changed(since), encoding)
+
+    @Route(methods="put", resource="/system/properties")
+    def put_properties(self, message, response):
+        try:
+            data = Index.UPDATE_PROPERTIES_SCHEMA(message.data)
+        except Invalid as e:
+            return response(code=400, data={"message": str(e)})
+        self.properties_store.update(data)
         return response(data=self.properties.db)
 
     @Route(methods="get", resource="/system/properties/:key")
@@ -189,40 +512,20 @@ class Index(Sanji):
         if key not in Index.PROPERTIES_SCHEMA:
             return response(code=400, data={"message": "wrong key."})
         data = Index.PROPERTIES_SCHEMA.get(key)(message.data["data"])
-        self.properties.db[key] = data
-        self.properties.save_db()
+        self.properties_store.update({key: data})
         return response(data=self.properties.db[key])
 
     @Route(methods="get", resource="/mxc/system/equipments")
     def get_system_equipments(self, message, response):
-        equs = [
-            {
-                "equipmentName": "SYSTEM",
-                "equipmentTags": [
-                    {
-                        "name": "cpu_usage",
-                        "dataType": "float64",
-                        "access": "ro",
-                        "size": 8,
-                        "description": "CPU Usage"
-                    },
-                    {
-                        "name": "memory_usage",
-                        "dataType": "float64",
-                        "access": "ro",
-                        "size": 8,
-                        "description": "Memory Usage"
-                    },
-                    {
-                        "name": "disk_usage",
-                        "dataType": "float64",
-                        "access": "ro",
-                        "size": 8,
-                        "description": "Disk Usage"
-                    }
-                ]
-            }
-        ]
+        # catalog of the tags mxsysstatusd publishes, or of this host
+        equs = self.tag_file.load()
+        if equs is None:
+            self.tag_catalog.update(
+                self.status.get_cpu_count() or 0,
+                [key for key, _ in disk_usages(
+                    self.get_status_field("disks"))],
+                self.status.get_net_interfaces())
+            equs = self.tag_catalog.equipments()
         return response(data=equs)
 
 
@@ -231,5 +534,5 @@ if __name__ == "__main__":
     logging.basicConfig(level=0, format=FORMAT)
     _logger = logging.getLogger("status")
     logging.getLogger("sh").setLevel(logging.WARN)
-    bundle = Index(connection=Mqtt())
+    bundle = Index(connection=CompactMqtt())
     bundle.start()
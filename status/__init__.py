@@ -7,18 +7,27 @@ import sh
 import psutil
 import socket
 import re
-import tarfile
-import glob
 import netifaces
 from passlib.hash import sha512_crypt
-from sh import grep, cut, usermod
 from sanji.model import Model
 
 from libmxidaf_py import TagV2
+from snapshot import SnapshotReader, SNAPSHOT_PATH
+from facts import StaticFacts, which
+from disks import DiskCollector, disk_get_alias, disk_usages
+from history import History
+from netdev import NetDevSampler, read_net_dev, rate_metrics
+from processes import ProcessScanner, top_processes
+from rrd import RRDStore, RRDError, RRD_PATH
+from scheduler import monotonic
+from archive import walk, tar_stream, gzip_stream
+from system import sethostname, atomic_write, update_hosts
+from system import get_shadow_password, set_shadow_password
 
 
 _logger = logging.getLogger("sanji.status")
 HOSTNAME_REGEX = re.compile("[^a-zA-Z\d\-]")
+SYSLOG_PATHS = ["/var/log"]
 
 
 def is_valid_hostname(hostname):
@@ -32,28 +41,28 @@ def is_valid_hostname(hostname):
     raise StatusError("Invaild Hostname")
 
 
-def tar_syslog_files(output):
+def tar_syslog_files(paths=SYSLOG_PATHS, level=6):
     """
-    Tar and Compress (gz) syslog files to output directory
+    Tar and Compress (gz) syslog files as a stream of chunks, nothing is
+    staged on disk
     """
-    filelist = glob.glob("/var/log")
-    with tarfile.open(output, "w:gz") as tar:
-        for name in filelist:
-            if not os.path.exists(name):
-                continue
-            _logger.info("Packing %s" % (name))
-            tar.add(name, arcname=os.path.basename(name))
-
-    return output
+    return gzip_stream(tar_stream(walk(paths)), level)
 
 
 def get_password(username="moxa", shadow_file="/etc/shadow"):
-    return cut(grep(username, shadow_file), "-f", 2, "-d", ":").strip()
+    password = get_shadow_password(username, shadow_file)
+    if password is None:
+        raise StatusError("No such user: %s" % username)
+    return password
 
 
-def set_password(password, username="moxa", salt=None):
+def set_password(password, username="moxa", salt=None, root="/"):
     hashed_password = sha512_crypt.encrypt(password, rounds=10000)
-    return usermod("-p", hashed_password, username)
+    try:
+        set_shadow_password(username, hashed_password,
+                            os.path.join(root, "etc/shadow"), root)
+    except KeyError:
+        raise StatusError("No such user: %s" % username)
 
 
 class StatusError(Exception):
@@ -91,9 +100,25 @@ class SysStatus(object):
 class Status(Model):
 
     def __init__(self, *args, **kwargs):
+        # root of /etc files, for tests
+        self.root = kwargs.pop("root", "/")
         super(Status, self).__init__(*args, **kwargs)
         self.sysstatus = SysStatus()
         self.sysstatus.run()
+        self.snapshot = SnapshotReader(SNAPSHOT_PATH)
+        self.facts = StaticFacts()
+        self.facts.register(
+            "pversion", lambda: str(sh.pversion()),
+            lambda: [_ for _ in [which("pversion")] if _ is not None])
+        self.facts.register(
+            "memory", lambda: psutil.virtual_memory().total)
+        self.facts.register(
+            "cpus", lambda: psutil.cpu_count())
+        self._disk_collector = None
+        self._net_dev = NetDevSampler()
+        self._process_scanner = None
+        self._history = None
+        self._history_retry = 0
 
     def get_hostname(self):
         """Get hostname
@@ -112,24 +137,33 @@ class Status(Model):
             Args:
                 hostname (str): hostname to be updated
         """
+        old_hostname = self.get_hostname()
+        is_valid_hostname(hostname)
+
+        sethostname(hostname)
+        atomic_write(os.path.join(self.root, "etc/hostname"), hostname + "\n")
+        hosts = os.path.join(self.root, "etc/hosts")
         try:
-            old_hostname = self.get_hostname()
+            with open(hosts, "r") as f:
+                text = f.read()
+        except IOError:
+            text = ""
+        atomic_write(hosts, update_hosts(text, old_hostname, hostname))
+        self.update(id=1, newObj={"hostname": hostname})
 
-            is_valid_hostname(hostname)
+    def get_pversion(self):
+        """Get output of pversion, cached until pversion is updated.
 
-            sh.hostname("-b", hostname)
-            sh.echo(hostname, _out="/etc/hostname")
+            Return:
+                pversion (str): ex: "UC-8112-LX-CG version 1.1 Build 1234"
 
-            try:
-                # sed -i 's/ old$/ new/g' /etc/hosts
-                sh.sed("-i", "s/ {}$/ {}/g".format(old_hostname, hostname),
-                       "/etc/hosts")
-            except:
-                with open("/etc/hosts", "a") as f:
-                    f.write("127.0.0.1       localhost {}\n".format(hostname))
-            self.update(id=1, newObj={"hostname": hostname})
-        except Exception as e:
-            raise e
+            Raises:
+                StatusError: pversion is not available
+        """
+        pversion = self.facts.get("pversion")
+        if pversion is None:
+            raise StatusError("pversion is not available")
+        return pversion
 
     def get_product_version(self):
         """Get product version
@@ -138,11 +172,25 @@ class Status(Model):
                 version (str): product version (#.#)
         """
         try:
-            return " ".join(sh.pversion().split(" ")[2:])
-        except:
+            return " ".join(self.get_pversion().split(" ")[2:])
+        except StatusError:
             pass
         return "(not installed)"
 
+    def get_model_name(self):
+        """Get model name
+
+            Return:
+                model name (str): empty if pversion is not available
+        """
+        try:
+            return self.get_pversion().split()[0]
+        except (StatusError, IndexError):
+            return ""
+
+    def get_cpu_count(self):
+        return self.facts.get("cpus")
+
     def get_uptime(self):
         """Get system uptime by seconds.
 
@@ -172,6 +220,29 @@ class Status(Model):
             _logger.error("Cannot get interfaces: %s" % e)
             return []
 
+    def get_net_counters(self):
+        """Get traffic counters of network interfaces
+
+            Returns:
+                interfaces (array): [{
+                  "name": interface name,
+                  "rxBytes", "rxPackets", "rxErrors", "rxDropped",
+                  "txBytes", "txPackets", "txErrors", "txDropped":
+                    counters since boot,
+                  "rxBytesRate", ...: rate of each counter per second,
+                    sampled by mxsysstatusd, missing without it
+                }]
+        """
+        interfaces = self.snapshot.get("interfaces")
+        if interfaces is None:
+            try:
+                interfaces = read_net_dev()
+            except (IOError, OSError, ValueError) as e:
+                _logger.error("Cannot get interface counters: %s" % e)
+                interfaces = {}
+        return [dict(name=iface, **interfaces[iface])
+                for iface in sorted(interfaces)]
+
     def _parse_collectd_value(self, value):
         if len(value) != 1:
             return 0.0
@@ -179,58 +250,23 @@ class Status(Model):
             return value[0].split('=')[1]
 
     def get_cpu_usage(self):
-        return self.sysstatus.cpu_usage
+        return self.snapshot.get("cpuUsage", self.sysstatus.cpu_usage)
 
     def get_memory_usage(self):
-        return self.sysstatus.memory_usage
+        return self.snapshot.get("memoryUsage", self.sysstatus.memory_usage)
 
     def get_memory(self):
-        return psutil.virtual_memory().total
-
-    def _disk_get_alias(self, mapping, device):
-        dev = mapping["device"].search(device)
-        if dev is None:
-            return None
-        alias = "%s" % mapping["alias"]
-        if mapping["part"] is None:
-            return alias
-        part = mapping["part"].findall(dev.group(0))
-        try:
-            float(part[0])
-            part[0] = str(int(part[0]) + 1)
-        except ValueError:
-            part[0] = str(ord(part[0]) - 96)
-        except:
-            _logger.error("Cannot convert storage info.: {}".format(part[0]))
-        if part is not None:
-            alias += "{}".format("-".join(part))
-        return alias
+        memory = self.snapshot.get("memory")
+        if memory is not None:
+            return memory
+        return self.facts.get("memory")
 
-    def disk_get_alias(self, device):
-        # SD: /dev/mmcblk0, /dev/mmcblk0p1
-        # USB: /dev/sda, /dev/sda1
-        # search() for device
-        # findall() for drive and partition
-        dev_mapping = [
-            {"alias": "System",
-             "device": re.compile("/dev/root"),
-             "part": None},
-            {"alias": "SD",
-             "device": re.compile("(?<=/dev/mmcblk)\w+"),
-             "part": re.compile("^\d+|\d+$")},
-            {"alias": "USB",
-             "device": re.compile("(?<=/dev/sd)\w+"),
-             "part": re.compile("^[a-z]+|\d+$")}
-        ]
-        for mapping in dev_mapping:
-            alias = self._disk_get_alias(mapping, device)
-            if alias is not None:
-                return alias
-        return "UNKNOWN"
-
-    def get_disks(self):
+    def get_disks(self, mounts=None):
         """Get disks usages, including system, SD card, and USB stick.
 
+            Args:
+                mounts (list): only get disks of these mount points
+
             Returns:
                 disks (array): array with all disks information
                     [{
@@ -245,25 +281,80 @@ class Status(Model):
                       }
                     }]
         """
-        disks = []
-        disk_parts = psutil.disk_partitions()
-        for disk_part in disk_parts:
-            disk = {}
-            disk["name"] = self.disk_get_alias(disk_part.device)
-            disk["mount"] = disk_part.mountpoint
-            disk["device"] = disk_part.device
-            disk["usage"] = {}
-
-            # FIXME: Most Linux filesystems reserve 5% space for use only the
-            # root user. Use the following commane to check:
-            #   $ sudo dumpe2fs /dev/mmcblk0p2 | grep -i reserved
-            disk_usage = psutil.disk_usage(disk_part.mountpoint)
-            disk["usage"]["total"] = disk_usage.total
-            disk["usage"]["used"] = disk_usage.used
-            disk["usage"]["free"] = disk_usage.free
-            disk["usage"]["percent"] = disk_usage.percent
-            disks.append(disk)
-        return disks
+        disks = self.snapshot.get("disks")
+        if disks is not None:
+            if mounts is not None:
+                disks = [_ for _ in disks if _["mount"] in mounts]
+            return disks
+        return self.disk_collector.collect(mounts=mounts)
+
+    def get_metrics(self):
+        """Get the current value of the metrics kept in history.
+
+            Return:
+                metrics (dict): {"cpuUsage", "memoryUsage",
+                    "diskUsage.<disk key>", "rxRate.<interface>",
+                    "txRate.<interface>"}, rates are in bytes per second,
+                    sampled by mxsysstatusd or since the previous call
+        """
+        metrics = {
+            "cpuUsage": self.get_cpu_usage(),
+            "memoryUsage": self.get_memory_usage()
+        }
+        for key, percent in disk_usages(self.get_disks()):
+            metrics["diskUsage.%s" % key] = percent
+
+        interfaces = self.snapshot.get("interfaces")
+        if interfaces is None:
+            interfaces = self._net_dev.sample()
+        metrics.update(rate_metrics(interfaces))
+        return metrics
+
+    def get_processes(self, sort="cpu", limit=10):
+        """Get the processes using the most cpu or memory.
+
+            Args:
+                sort (str): "cpu" or "rss"
+                limit (int): number of processes
+
+            Return:
+                processes (dict): {"processes": top processes, see
+                    ProcessScanner.scan, "scan": cost of the scan}, from
+                    mxsysstatusd (which keeps its top processes only) or
+                    scanned here, cpu usages are since the previous scan
+        """
+        processes = self.snapshot.get("processes")
+        if processes is not None:
+            scan = self.snapshot.get("processScan", {})
+        else:
+            if self._process_scanner is None:
+                self._process_scanner = ProcessScanner()
+            processes = self._process_scanner.scan()
+            scan = self._process_scanner.stats()
+        return {
+            "processes": top_processes(processes, sort, limit),
+            "scan": scan
+        }
+
+    @property
+    def history(self):
+        """History recorded by mxsysstatusd, None if it is not available."""
+        if self._history is None and monotonic() >= self._history_retry:
+            try:
+                self._history = History(store=RRDStore(RRD_PATH))
+            except (RRDError, IOError, OSError) as e:
+                _logger.debug("Cannot open history: %s" % e)
+                self._history_retry = monotonic() + 60
+        return self._history
+
+    @property
+    def disk_collector(self):
+        if self._disk_collector is None:
+            self._disk_collector = DiskCollector()
+        return self._disk_collector
+
+    def disk_get_alias(self, device):
+        return disk_get_alias(device)
 
     def reboot(self):
         _logger.info("Rebooting...")
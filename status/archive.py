@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import fnmatch
+import json
+import logging
+import os
+import stat
+import tarfile
+import time
+import uuid
+import zlib
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+
+_logger = logging.getLogger("sanji.status.archive")
+
+CHUNK_SIZE = 64 * 1024
+BLOCK_SIZE = tarfile.BLOCKSIZE
+# input of each gzip member compressed by a worker
+GZIP_BLOCK_SIZE = 1024 * 1024
+
+
+def walk(paths):
+    """Iterate (path, arcname) of paths and everything under them, arcname
+    is relative to the parent of each path (/var/log/messages is
+    log/messages)."""
+    for top in paths:
+        if not os.path.lexists(top):
+            continue
+        parent = os.path.dirname(top.rstrip("/"))
+        yield top, os.path.relpath(top, parent)
+        if not os.path.isdir(top) or os.path.islink(top):
+            continue
+        for dirpath, dirnames, filenames in os.walk(top):
+            dirnames.sort()
+            for name in sorted(dirnames) + sorted(filenames):
+                path = os.path.join(dirpath, name)
+                yield path, os.path.relpath(path, parent)
+
+
+def _tarinfo(path, arcname, offset=0):
+    st = os.lstat(path)
+    info = tarfile.TarInfo(arcname)
+    info.mode = stat.S_IMODE(st.st_mode)
+    info.uid = st.st_uid
+    info.gid = st.st_gid
+    info.mtime = st.st_mtime
+    if stat.S_ISREG(st.st_mode):
+        info.type = tarfile.REGTYPE
+        info.size = max(st.st_size - offset, 0)
+    elif stat.S_ISDIR(st.st_mode):
+        info.type = tarfile.DIRTYPE
+    elif stat.S_ISLNK(st.st_mode):
+        info.type = tarfile.SYMTYPE
+        info.linkname = os.readlink(path)
+    else:
+        return None
+    return info
+
+
+def _file_blocks(path, offset, size, chunk_size):
+    """Read size bytes of a file from offset, padded to tar blocks. A log
+    may grow or be truncated while it is read, the member keeps the size in
+    its header."""
+    left = size
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while left > 0:
+                data = f.read(min(chunk_size, left))
+                if not data:
+                    break
+                left -= len(data)
+                yield data
+    except (IOError, OSError) as e:
+        _logger.warning("Cannot read %s: %s" % (path, e))
+    while left > 0:
+        data = "\0" * min(chunk_size, left)
+        left -= len(data)
+        yield data
+    if size % BLOCK_SIZE:
+        yield "\0" * (BLOCK_SIZE - size % BLOCK_SIZE)
+
+
+def tar_stream(files, chunk_size=CHUNK_SIZE, offsets=None):
+    """Generate a tar archive of files without staging it.
+
+        Args:
+            files (iterable): (path, arcname)
+            chunk_size (int): bytes read from a file at once
+            offsets (dict): {path: offset}, only pack a file from offset
+    """
+    if offsets is None:
+        offsets = {}
+    for path, arcname in files:
+        offset = offsets.get(path, 0)
+        try:
+            info = _tarinfo(path, arcname, offset)
+        except (IOError, OSError) as e:
+            _logger.warning("Cannot pack %s: %s" % (path, e))
+            continue
+        if info is None:
+            continue
+        _logger.info("Packing %s" % path)
+        yield info.tobuf(tarfile.GNU_FORMAT)
+        if info.isreg():
+            for data in _file_blocks(path, offset, info.size, chunk_size):
+                yield data
+    yield "\0" * (BLOCK_SIZE * 2)
+
+
+def gzip_stream(chunks, level=6):
+    """Compress chunks into gzip format on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _gzip_member(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def parallel_gzip_stream(chunks, level=6, workers=2,
+                         block_size=GZIP_BLOCK_SIZE):
+    """Compress chunks into concatenated gzip members in worker threads.
+
+    zlib releases the GIL while compressing, so blocks are compressed in
+    parallel. At most 2 * workers blocks are in flight, and members are
+    yielded in order.
+    """
+    pool = ThreadPool(workers)
+    pending = []
+    block = []
+    size = 0
+    try:
+        for chunk in chunks:
+            block.append(chunk)
+            size += len(chunk)
+            if size < block_size:
+                continue
+            pending.append(pool.apply_async(
+                _gzip_member, ("".join(block), level)))
+            block = []
+            size = 0
+            while len(pending) >= workers * 2:
+                yield pending.pop(0).get()
+        if block or not pending:
+            pending.append(pool.apply_async(
+                _gzip_member, ("".join(block), level)))
+        for result in pending:
+            yield result.get()
+    finally:
+        pool.terminate()
+
+
+def multipart_stream(boundary, filename, chunks, name="file"):
+    """Wrap chunks of a file into a multipart/form-data body."""
+    yield ("--%s\r\n"
+           "Content-Disposition: form-data; name=\"%s\"; filename=\"%s\"\r\n"
+           "Content-Type: application/gzip\r\n\r\n") % (
+        boundary, name, filename)
+    for chunk in chunks:
+        yield chunk
+    yield "\r\n--%s--\r\n" % boundary
+
+
+def upload(url, filename, chunks, headers=None, verify=False):
+    """Upload chunks as a file with a chunked multipart/form-data POST.
+
+        Args:
+            url (str): upload target
+            filename (str): file name of the upload
+            chunks (iterable): file content
+            headers (dict): extra request headers
+
+        Return:
+            response (requests.Response)
+    """
+    boundary = uuid.uuid4().hex
+    headers = dict(headers or {})
+    headers["Content-Type"] = "multipart/form-data; boundary=%s" % boundary
+    return requests.post(
+        url,
+        data=multipart_stream(boundary, filename, chunks),
+        headers=headers,
+        verify=verify
+    )
+
+
+class SyslogState(object):
+    """Bytes of each log file which are already uploaded.
+
+    Files are tracked by device and inode, so a log renamed by logrotate
+    (messages to messages.1) is still known, and only data appended since
+    the last upload is shipped.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        try:
+            with open(path, "r") as f:
+                self._sizes = json.load(f)
+        except (IOError, OSError, ValueError):
+            self._sizes = {}
+
+    @staticmethod
+    def key(st):
+        return "%d:%d" % (st.st_dev, st.st_ino)
+
+    def offset(self, st):
+        """Offset to pack a file from, None if nothing is new."""
+        size = self._sizes.get(self.key(st))
+        if size is None or st.st_size < size:
+            return 0
+        if st.st_size == size:
+            return None
+        return size
+
+    def save(self, sizes, seen):
+        """Save uploaded sizes, and forget files which no longer exist.
+
+            Args:
+                sizes (dict): {key: size} of uploaded files
+                seen (set): keys of existing files
+        """
+        state = dict([(k, v) for k, v in self._sizes.items() if k in seen])
+        state.update(sizes)
+        dirname = os.path.dirname(self._path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp = self._path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, self._path)
+        self._sizes = state
+
+
+class SyslogArchive(object):
+    """tar.gz stream of selected log files.
+
+        Args:
+            paths (list): log directories or files
+            globs (list): only pack files whose path relative to the log
+                directory matches one of these patterns
+            start (float): only pack files modified since this time
+            end (float): only pack files modified until this time
+            state (SyslogState): only pack data not uploaded yet
+            level (int): compression level, 1 (fast) to 9 (small)
+            workers (int): compress in parallel if more than 1
+    """
+
+    def __init__(self, paths, globs=None, start=None, end=None, state=None,
+                 level=6, workers=1):
+        self._paths = paths
+        self._globs = globs
+        self._start = start
+        self._end = end
+        self._state = state
+        self._level = level
+        self._workers = workers
+        self._sizes = {}
+        self._seen = set()
+        self.files = 0
+        self.bytes = 0
+        self.compressed_bytes = 0
+        self.seconds = 0
+
+    def _match(self, arcname):
+        if not self._globs:
+            return True
+        relname = arcname.split("/", 1)[-1]
+        return any([fnmatch.fnmatch(relname, _) or
+                    fnmatch.fnmatch(arcname, _) for _ in self._globs])
+
+    def select(self):
+        """Iterate (path, arcname, offset) of selected files."""
+        filtered = self._globs or self._start or self._end or self._state
+        for path, arcname in walk(self._paths):
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if not filtered:
+                yield path, arcname, 0
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            self._seen.add(SyslogState.key(st))
+            if not self._match(arcname):
+                continue
+            if self._start is not None and st.st_mtime < self._start:
+                continue
+            if self._end is not None and st.st_mtime > self._end:
+                continue
+            offset = 0
+            if self._state is not None:
+                offset = self._state.offset(st)
+                if offset is None:
+                    continue
+            self._sizes[SyslogState.key(st)] = st.st_size
+            yield path, arcname, offset
+
+    def _count(self, chunks, attr):
+        for chunk in chunks:
+            setattr(self, attr, getattr(self, attr) + len(chunk))
+            yield chunk
+
+    def chunks(self):
+        """Generate the tar.gz archive."""
+        begin = time.time()
+        offsets = {}
+
+        def files():
+            for path, arcname, offset in self.select():
+                self.files += 1
+                offsets[path] = offset
+                yield path, arcname
+
+        tar = self._count(tar_stream(files(), offsets=offsets), "bytes")
+        if self._workers > 1:
+            gz = parallel_gzip_stream(tar, self._level, self._workers)
+        else:
+            gz = gzip_stream(tar, self._level)
+        for chunk in self._count(gz, "compressed_bytes"):
+            yield chunk
+        self.seconds = time.time() - begin
+
+    def commit(self):
+        """Remember the uploaded data, call after a successful upload."""
+        if self._state is not None:
+            self._state.save(self._sizes, self._seen)
+
+    def stats(self):
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "compressedBytes": self.compressed_bytes,
+            "ratio": round(float(self.compressed_bytes) / self.bytes, 4)
+            if self.bytes else 0,
+            "seconds": round(self.seconds, 3)
+        }
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import logging
+import threading
+from Queue import Queue
+
+
+_logger = logging.getLogger("sanji.status.batch")
+
+# longest batch and slowest item accepted
+MAX_ITEMS = 16
+TIMEOUT = 10
+
+
+class BatchReader(object):
+    """Run the reads of a batch request concurrently.
+
+    Reads go to a small pool of worker threads shared by all batches, so
+    a batch takes as long as its slowest read instead of their sum. Reads
+    which are not answered before the timeout are reported with 504 and
+    their results are dropped when they come in.
+    """
+
+    def __init__(self, workers=4):
+        self._requests = Queue()
+        self._workers = []
+        for index in range(workers):
+            worker = threading.Thread(
+                target=self._work, name="batch-%d" % index)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            batch, index, read = request
+            try:
+                result = read()
+            except Exception as e:
+                _logger.error("Batch read failed: %s" % e, exc_info=True)
+                result = (500, {"message": "Internal Error."})
+            with batch["lock"]:
+                batch["results"][index] = result
+                batch["pending"] -= 1
+                if batch["pending"] == 0:
+                    batch["lock"].notify()
+
+    def run(self, reads, timeout=TIMEOUT):
+        """Run reads.
+
+            Args:
+                reads (list): callables returning (code, data)
+                timeout (float): seconds to wait for all reads
+
+            Return:
+                results (list): (code, data) of each read, in order
+        """
+        batch = {
+            "lock": threading.Condition(),
+            "results": [None] * len(reads),
+            "pending": len(reads)
+        }
+        for index, read in enumerate(reads):
+            self._requests.put((batch, index, read))
+
+        with batch["lock"]:
+            if batch["pending"]:
+                batch["lock"].wait(timeout)
+            results = list(batch["results"])
+        return [_ if _ is not None else
+                (504, {"message": "Timeout after %ss." % timeout})
+                for _ in results]
+
+    def close(self):
+        for _ in self._workers:
+            self._requests.put(None)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import logging
+import threading
+
+from scheduler import monotonic
+
+
+_logger = logging.getLogger("sanji.status.cache")
+
+
+class _Entry(object):
+
+    def __init__(self):
+        self.value = None
+        self.loaded = None
+        self.flight = None
+
+
+class _Flight(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class FieldCache(object):
+    """Per-field cache in front of the status collectors.
+
+    A value is fresh for the ttl of its field. After that, the stale value
+    is still served (up to max_stale seconds) while one background thread
+    collects a new one. Concurrent requests of a field which has no usable
+    value wait for a single collection instead of running their own.
+    """
+
+    def __init__(self, ttls=None, default_ttl=1.0, max_stale=60,
+                 clock=monotonic, background=True):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+        self._clock = clock
+        self._background = background
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def _count(self, field, name):
+        counters = self._counters.setdefault(
+            field, {"hit": 0, "stale": 0, "miss": 0, "wait": 0, "error": 0})
+        counters[name] += 1
+
+    def ttl(self, field):
+        return self.ttls.get(field, self.default_ttl)
+
+    def get(self, field, loader, key=None):
+        """Get the value of a field.
+
+            Args:
+                field (str): field name
+                loader (callable): collect the value of the field
+                key (str): cache entry of a filtered field, the ttl and
+                    counters are still of the field
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.setdefault(key or field, _Entry())
+            age = now - entry.loaded if entry.loaded is not None else None
+            ttl = self.ttl(field)
+
+            if age is not None and age < ttl:
+                self._count(field, "hit")
+                return entry.value
+
+            if age is not None and age < ttl + self.max_stale and \
+                    self._background:
+                self._count(field, "stale")
+                if entry.flight is None:
+                    entry.flight = _Flight()
+                    thread = threading.Thread(
+                        target=self._load, args=(field, entry, loader),
+                        name="cache-%s" % field)
+                    thread.daemon = True
+                    thread.start()
+                return entry.value
+
+            flight = entry.flight
+            if flight is None:
+                self._count(field, "miss")
+                flight = entry.flight = _Flight()
+                owner = True
+            else:
+                self._count(field, "wait")
+                owner = False
+
+        if owner:
+            self._load(field, entry, loader)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _load(self, field, entry, loader):
+        flight = entry.flight
+        try:
+            flight.value = loader()
+        except Exception as e:
+            _logger.warning("Cannot collect %s: %s" % (field, e))
+            flight.error = e
+        with self._lock:
+            if flight.error is None:
+                entry.value = flight.value
+                entry.loaded = self._clock()
+            else:
+                self._count(field, "error")
+            entry.flight = None
+        flight.done.set()
+
+    def invalidate(self, field=None):
+        with self._lock:
+            for key, entry in self._entries.items():
+                if field is None or key == field or \
+                        key.startswith(field + "?"):
+                    entry.loaded = None
+
+    def stats(self):
+        """Get counters and ttl of each field.
+
+            Return:
+                stats (dict): {field: {"ttl", "hit", "stale", "miss",
+                    "wait", "error"}}
+        """
+        with self._lock:
+            stats = {}
+            for field in set(self._counters.keys() + self.ttls.keys()):
+                stats[field] = dict(self._counters.get(
+                    field,
+                    {"hit": 0, "stale": 0, "miss": 0, "wait": 0, "error": 0}))
+                stats[field]["ttl"] = self.ttl(field)
+            return stats
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import logging
+import socket
+
+import psutil
+
+
+_logger = logging.getLogger("sanji.status.collectd")
+
+
+class CollectdError(Exception):
+    pass
+
+
+def parse_values(lines):
+    """Parse GETVAL reply lines into a dict.
+
+        Args:
+            lines (list): reply lines, ex: ["value=1.000000e+00"]
+
+        Return:
+            values (dict): ex: {"value": 1.0}
+    """
+    values = {}
+    for line in lines:
+        name, sep, value = line.partition("=")
+        if not sep:
+            continue
+        try:
+            values[name] = float(value)
+        except ValueError:
+            values[name] = 0.0
+    return values
+
+
+class Collectd(object):
+    """Client of collectd unixsock plugin.
+
+    Replies are read through a line buffer, and commands for one sampling
+    are written in a single batch (pipelined), so the cost of a sampling
+    does not depend on the number of cpu cores.
+    """
+
+    UNIX_SOCKET_PATH = "/var/run/collectd.sock"
+    RECV_SIZE = 4096
+
+    def __init__(self, path=UNIX_SOCKET_PATH, timeout=None):
+        self._path = path
+        self._timeout = timeout
+        self._sock = None
+        self._buf = ""
+        self._cpus = []
+        self._host = "localhost"
+        self.connect()
+
+    def __del__(self):
+        self.close()
+
+    def connect(self):
+        """Connect to collectd and discover host name and cpu cores."""
+        self.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+        sock.connect(self._path)
+        self._sock = sock
+        self._buf = ""
+
+        # get real host name and cpu cores
+        self._cpus = []
+        status, lines = self.pipeline(["LISTVAL"])[0]
+        if status > 0 and lines:
+            self._host = lines[0].split(" ")[1].split("/")[0]
+        for line in lines:
+            key = line.split("/")[1]
+            if "cpu" not in key or key in self._cpus:
+                continue
+            self._cpus.append(key)
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    @property
+    def cpus(self):
+        return list(self._cpus)
+
+    @property
+    def host(self):
+        return self._host
+
+    def pipeline(self, commands):
+        """Send commands in one write and read all replies.
+
+            Args:
+                commands (list): collectd commands without newline
+
+            Return:
+                replies (list): list of (status, lines) in the same order
+        """
+        if self._sock is None:
+            raise CollectdError("Not connected")
+        self._sock.sendall("".join([cmd + "\n" for cmd in commands]))
+
+        replies = []
+        for _ in commands:
+            status = self._readline().split(" ", 1)[0]
+            try:
+                status = int(status)
+            except ValueError:
+                raise CollectdError("Invalid reply: %s" % status)
+            lines = []
+            for _ in range(status):
+                lines.append(self._readline())
+            replies.append((status, lines))
+        return replies
+
+    def _readline(self):
+        while True:
+            idx = self._buf.find("\n")
+            if idx >= 0:
+                line = self._buf[:idx]
+                self._buf = self._buf[idx + 1:]
+                return line
+            data = self._sock.recv(self.RECV_SIZE)
+            if not data:
+                raise CollectdError("Connection closed")
+            self._buf += data
+
+    def getval_many(self, keys, flush=True):
+        """Get values of identifiers in one round trip.
+
+            Args:
+                keys (list): identifiers, ex: ["localhost/memory/memory-used"]
+                flush (bool): flush the identifiers after reading
+
+            Return:
+                values (dict): identifier to parsed values, missing
+                    identifiers are mapped to an empty dict
+        """
+        commands = ["GETVAL \"%s\"" % key for key in keys]
+        if flush and keys:
+            commands.append("FLUSH " + " ".join(
+                ["identifier=\"%s\"" % key for key in keys]))
+        replies = self.pipeline(commands)
+
+        values = {}
+        for key, (status, lines) in zip(keys, replies):
+            values[key] = parse_values(lines) if status > 0 else {}
+        return values
+
+    def get(self, key, flush=True):
+        return self.getval_many([key], flush=flush)[key]
+
+    def _cpu_keys(self):
+        keys = []
+        for cpu in self._cpus:
+            keys.append(self._host + "/" + cpu + "/cpu-user")
+            keys.append(self._host + "/" + cpu + "/cpu-system")
+        return keys
+
+    def _mem_key(self):
+        return self._host + "/memory/memory-used"
+
+    def _calc_cpu_usages(self, values):
+        usages = []
+        for cpu in self._cpus:
+            prefix = self._host + "/" + cpu
+            usages.append(
+                values[prefix + "/cpu-user"].get("value", 0.0) +
+                values[prefix + "/cpu-system"].get("value", 0.0))
+        return usages
+
+    def _calc_cpu_usage(self, values):
+        usages = self._calc_cpu_usages(values)
+        if len(usages) <= 0:
+            return 0.0
+        return sum(usages) / len(usages)
+
+    def _calc_mem_usage(self, values, total):
+        if total is None:
+            total = psutil.virtual_memory().total
+        return values[self._mem_key()].get("value", 0.0) * 100.0 / total
+
+    def get_cpu_usage(self):
+        return self._calc_cpu_usage(self.getval_many(self._cpu_keys()))
+
+    def get_cpu_usages(self):
+        return self._calc_cpu_usages(self.getval_many(self._cpu_keys()))
+
+    def get_mem_usage(self, total=None):
+        return self._calc_mem_usage(
+            self.getval_many([self._mem_key()]), total)
+
+    def get_usages(self, total=None):
+        """Get per-core cpu and memory usage in one round trip.
+
+            Args:
+                total (int): total memory size, default from psutil
+
+            Return:
+                usage (tuple): (cpu usage of each core, memory usage)
+        """
+        values = self.getval_many(self._cpu_keys() + [self._mem_key()])
+        return (self._calc_cpu_usages(values),
+                self._calc_mem_usage(values, total))
+
+    def get_usage(self, total=None):
+        """Get cpu and memory usage in one round trip.
+
+            Args:
+                total (int): total memory size, default from psutil
+
+            Return:
+                usage (tuple): (cpu usage, memory usage) in percent
+        """
+        cpu_usages, mem_usage = self.get_usages(total)
+        if len(cpu_usages) <= 0:
+            return 0.0, mem_usage
+        return sum(cpu_usages) / len(cpu_usages), mem_usage
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import collections
+import logging
+import re
+import select
+import threading
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+import psutil
+
+
+_logger = logging.getLogger("sanji.status.disks")
+
+# SD: /dev/mmcblk0, /dev/mmcblk0p1
+# USB: /dev/sda, /dev/sda1
+# search() for device
+# findall() for drive and partition
+DEV_MAPPING = [
+    {"alias": "System",
+     "device": re.compile("/dev/root"),
+     "part": None},
+    {"alias": "SD",
+     "device": re.compile(r"(?<=/dev/mmcblk)\w+"),
+     "part": re.compile(r"^\d+|\d+$")},
+    {"alias": "USB",
+     "device": re.compile(r"(?<=/dev/sd)\w+"),
+     "part": re.compile(r"^[a-z]+|\d+$")}
+]
+
+
+def _disk_get_alias(mapping, device):
+    dev = mapping["device"].search(device)
+    if dev is None:
+        return None
+    alias = "%s" % mapping["alias"]
+    if mapping["part"] is None:
+        return alias
+    part = mapping["part"].findall(dev.group(0))
+    try:
+        float(part[0])
+        part[0] = str(int(part[0]) + 1)
+    except ValueError:
+        part[0] = str(ord(part[0]) - 96)
+    except Exception:
+        _logger.error("Cannot convert storage info.: {}".format(part[0]))
+    if part is not None:
+        alias += "{}".format("-".join(part))
+    return alias
+
+
+def disk_get_alias(device):
+    for mapping in DEV_MAPPING:
+        alias = _disk_get_alias(mapping, device)
+        if alias is not None:
+            return alias
+    return "UNKNOWN"
+
+
+def disk_usages(disks):
+    """Usage of each disk by a unique key, for tags and metrics.
+
+    The key is the alias, or "<alias>:<mount point>" when disks share an
+    alias (ex: UNKNOWN for /dev/vda and /dev/vdb).
+
+        Return:
+            usages (list): [(key, percent)] of disks with a usage
+    """
+    counts = collections.Counter([_["name"] for _ in disks])
+    return [("%s:%s" % (_["name"], _["mount"]) if counts[_["name"]] > 1
+             else _["name"], _["usage"]["percent"])
+            for _ in disks if "percent" in _["usage"]]
+
+
+class DiskCollector(object):
+    """Collect disk usages.
+
+    The partition list and device aliases are cached, and refreshed only
+    when the mount table changes (/proc/self/mountinfo reports POLLPRI).
+    statvfs of each mount runs in a worker pool with a deadline; a mount
+    which does not answer in time (stalled USB stick or NFS) is reported
+    with its last known usage and "stale": True, and is not queried again
+    until the pending query returns.
+    """
+
+    MOUNTINFO = "/proc/self/mountinfo"
+
+    def __init__(self, mountinfo=MOUNTINFO, timeout=1.0, workers=4):
+        self._timeout = timeout
+        self._pool = ThreadPool(workers)
+        self._lock = threading.Lock()
+        self._partitions = None
+        self._aliases = {}
+        self._usages = {}
+        self._pending = {}
+        self._mountinfo = None
+        self._poller = None
+        try:
+            self._mountinfo = open(mountinfo, "r")
+            self._poller = select.poll()
+            self._poller.register(
+                self._mountinfo.fileno(), select.POLLPRI | select.POLLERR)
+        except (IOError, OSError) as e:
+            _logger.warning("Cannot watch %s: %s" % (mountinfo, e))
+
+    def mounts_changed(self):
+        """Check if the mount table is changed since last check."""
+        if self._poller is None:
+            return True
+        if not self._poller.poll(0):
+            return False
+        self._mountinfo.seek(0)
+        self._mountinfo.read()
+        return True
+
+    def refresh_mounts(self, force=False):
+        """Refresh the cached partitions if the mount table is changed.
+
+            Return:
+                changed (bool): True if refreshed
+        """
+        if not (self.mounts_changed() or force or self._partitions is None):
+            return False
+        partitions = psutil.disk_partitions()
+        with self._lock:
+            self._partitions = partitions
+            mounts = set([_.mountpoint for _ in partitions])
+            for mount in list(self._usages):
+                if mount not in mounts:
+                    del self._usages[mount]
+        return True
+
+    def partitions(self):
+        self.refresh_mounts()
+        return self._partitions
+
+    def alias(self, device):
+        alias = self._aliases.get(device)
+        if alias is None:
+            alias = self._aliases[device] = disk_get_alias(device)
+        return alias
+
+    def _submit(self, mount):
+        with self._lock:
+            result = self._pending.get(mount)
+            if result is None:
+                result = self._pending[mount] = self._pool.apply_async(
+                    psutil.disk_usage, (mount,))
+        return result
+
+    def _wait(self, mount, result, deadline):
+        try:
+            usage = result.get(max(deadline - time.time(), 0))
+        except TimeoutError:
+            _logger.warning("Disk usage of %s timeout" % mount)
+            return None
+        except Exception as e:
+            _logger.warning("Cannot get disk usage of %s: %s" % (mount, e))
+            usage = None
+        with self._lock:
+            self._pending.pop(mount, None)
+            if usage is not None:
+                self._usages[mount] = {
+                    "total": usage.total,
+                    "used": usage.used,
+                    "free": usage.free,
+                    "percent": usage.percent
+                }
+        return usage
+
+    def collect(self, mounts=None):
+        """Get disks usages, see Status.get_disks().
+
+            Args:
+                mounts (list): only collect these mount points
+
+            Return:
+                disks (list): disks whose usage is not available in time
+                    carry their last known usage and "stale": True
+        """
+        partitions = self.partitions()
+        if mounts is not None:
+            partitions = [_ for _ in partitions if _.mountpoint in mounts]
+
+        results = [(_, self._submit(_.mountpoint)) for _ in partitions]
+        deadline = time.time() + self._timeout
+        disks = []
+        for part, result in results:
+            # FIXME: Most Linux filesystems reserve 5% space for use only the
+            # root user. Use the following commane to check:
+            #   $ sudo dumpe2fs /dev/mmcblk0p2 | grep -i reserved
+            fresh = self._wait(part.mountpoint, result, deadline) is not None
+            disk = {
+                "name": self.alias(part.device),
+                "mount": part.mountpoint,
+                "device": part.device,
+                "usage": dict(self._usages.get(part.mountpoint, {}))
+            }
+            if not fresh:
+                disk["stale"] = True
+            disks.append(disk)
+        return disks
+
+    def close(self):
+        self._pool.terminate()
+        if self._mountinfo is not None:
+            self._mountinfo.close()
+            self._mountinfo = None
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import base64
+import json
+import struct
+import threading
+from collections import OrderedDict
+
+
+ENCODINGS = ("json", "cbor")
+COMPACT = (",", ":")
+
+# key dictionary of a packed list of objects
+KEYS = "$keys"
+ROWS = "$rows"
+
+
+class EncodingError(ValueError):
+    pass
+
+
+def parse_encoding(message):
+    """Get the encoding a client asks for.
+
+    The encoding is given by the "encoding" query parameter or an Accept
+    header (application/cbor), and the key dictionary by "pack=true".
+
+        Return:
+            encoding (tuple): (encoding name, packed)
+    """
+    query = getattr(message, "query", None) or {}
+    headers = getattr(message, "headers", None) or {}
+    encoding = query.get("encoding")
+    if encoding is None:
+        encoding = "cbor" if "application/cbor" in headers.get(
+            "Accept", "") else "json"
+    if encoding not in ENCODINGS:
+        raise EncodingError("Unknown encoding: %s" % encoding)
+    return encoding, query.get("pack") in ("1", "true")
+
+
+def _shape(item):
+    """Keys of an object, nested objects as {key: keys}."""
+    return [{k: _shape(item[k])} if isinstance(item[k], dict) else k
+            for k in sorted(item)]
+
+
+def _flatten(item, keys, row):
+    for key in keys:
+        if isinstance(key, dict):
+            key, nested = key.items()[0]
+            _flatten(item[key], nested, row)
+        else:
+            row.append(pack(item[key]))
+    return row
+
+
+def _unflatten(values, keys):
+    item = {}
+    for key in keys:
+        if isinstance(key, dict):
+            key, nested = key.items()[0]
+            item[key] = _unflatten(values, nested)
+        else:
+            item[key] = unpack(next(values))
+    return item
+
+
+def pack(data):
+    """Replace lists of objects with the same keys by a key dictionary,
+    ex: [{"a": 1, "b": {"c": 2}}, {"a": 3, "b": {"c": 4}}] is packed into
+    {"$keys": ["a", {"b": ["c"]}], "$rows": [[1, 2], [3, 4]]}, nested
+    objects are flattened into the rows.
+    """
+    if isinstance(data, dict):
+        return dict([(k, pack(v)) for k, v in data.iteritems()])
+    if not isinstance(data, (list, tuple)):
+        return data
+    if len(data) < 2 or not all([isinstance(_, dict) for _ in data]):
+        return [pack(_) for _ in data]
+    keys = _shape(data[0])
+    if not all([_shape(_) == keys for _ in data[1:]]):
+        return [pack(_) for _ in data]
+    return {KEYS: keys, ROWS: [_flatten(_, keys, []) for _ in data]}
+
+
+def unpack(data):
+    """Revert pack()."""
+    if isinstance(data, list):
+        return [unpack(_) for _ in data]
+    if not isinstance(data, dict):
+        return data
+    if KEYS in data and ROWS in data and len(data) == 2:
+        return [_unflatten(iter(row), data[KEYS]) for row in data[ROWS]]
+    return dict([(k, unpack(v)) for k, v in data.iteritems()])
+
+
+def _head(major, n):
+    major <<= 5
+    if n < 24:
+        return chr(major | n)
+    if n < 0x100:
+        return struct.pack(">BB", major | 24, n)
+    if n < 0x10000:
+        return struct.pack(">BH", major | 25, n)
+    if n < 0x100000000:
+        return struct.pack(">BI", major | 26, n)
+    if n < 0x10000000000000000:
+        return struct.pack(">BQ", major | 27, n)
+    raise EncodingError("Integer too large: %d" % n)
+
+
+def _float(value):
+    single = struct.pack(">f", value)
+    if struct.unpack(">f", single)[0] == value:
+        return "\xfa" + single
+    return "\xfb" + struct.pack(">d", value)
+
+
+def _dumps(data, out):
+    if data is None:
+        out.append("\xf6")
+    elif data is True:
+        out.append("\xf5")
+    elif data is False:
+        out.append("\xf4")
+    elif isinstance(data, (int, long)):
+        if data >= 0:
+            out.append(_head(0, data))
+        else:
+            out.append(_head(1, -1 - data))
+    elif isinstance(data, float):
+        out.append(_float(data))
+    elif isinstance(data, (str, unicode)):
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        out.append(_head(3, len(data)))
+        out.append(data)
+    elif isinstance(data, (list, tuple)):
+        out.append(_head(4, len(data)))
+        for item in data:
+            _dumps(item, out)
+    elif isinstance(data, dict):
+        out.append(_head(5, len(data)))
+        for key in sorted(data):
+            _dumps(key, out)
+            _dumps(data[key], out)
+    else:
+        raise EncodingError("Cannot encode %r" % type(data))
+
+
+def cbor_dumps(data):
+    """Encode json-like data in CBOR (RFC 7049)."""
+    out = []
+    _dumps(data, out)
+    return "".join(out)
+
+
+def _loads(buf, offset):
+    initial = ord(buf[offset])
+    major, info = initial >> 5, initial & 0x1f
+    offset += 1
+    if major == 7:
+        if info == 20:
+            return False, offset
+        if info == 21:
+            return True, offset
+        if info == 22:
+            return None, offset
+        if info == 26:
+            return struct.unpack_from(">f", buf, offset)[0], offset + 4
+        if info == 27:
+            return struct.unpack_from(">d", buf, offset)[0], offset + 8
+        raise EncodingError("Unsupported simple value: %d" % info)
+    if info < 24:
+        n = info
+    elif info <= 27:
+        fmt = {24: ">B", 25: ">H", 26: ">I", 27: ">Q"}[info]
+        n = struct.unpack_from(fmt, buf, offset)[0]
+        offset += struct.calcsize(fmt)
+    else:
+        raise EncodingError("Unsupported length: %d" % info)
+
+    if major == 0:
+        return n, offset
+    if major == 1:
+        return -1 - n, offset
+    if major in (2, 3):
+        value = buf[offset:offset + n]
+        return (value.decode("utf-8") if major == 3 else value), offset + n
+    if major == 4:
+        items = []
+        for _ in xrange(n):
+            item, offset = _loads(buf, offset)
+            items.append(item)
+        return items, offset
+    if major == 5:
+        items = {}
+        for _ in xrange(n):
+            key, offset = _loads(buf, offset)
+            items[key], offset = _loads(buf, offset)
+        return items, offset
+    raise EncodingError("Unsupported major type: %d" % major)
+
+
+def cbor_loads(buf):
+    """Decode CBOR encoded by cbor_dumps()."""
+    data, offset = _loads(buf, 0)
+    if offset != len(buf):
+        raise EncodingError("Extra data after CBOR item")
+    return data
+
+
+def dumps(data):
+    """Serialize json without spaces, as messages are sent."""
+    return json.dumps(data, separators=COMPACT)
+
+
+def encode(data, encoding="json", packed=False):
+    """Encode response data.
+
+    Sanji messages are JSON, so CBOR goes in base64:
+    {"encoding": "cbor", "payload": "<base64 of CBOR>"}, which costs
+    about as much as CBOR saves; packed compact JSON is smaller on the bus
+    (see dumps and CompactMqtt).
+    """
+    if packed:
+        data = pack(data)
+    if encoding == "cbor":
+        return {"encoding": "cbor",
+                "payload": base64.b64encode(cbor_dumps(data))}
+    return data
+
+
+class EncodedCache(object):
+    """Encoded responses by resource version, so a snapshot is encoded
+    once for each encoding rather than once for each request."""
+
+    def __init__(self, max_entries=64):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version, encoding, packed, build):
+        """Get an encoded response.
+
+            Args:
+                key (str): resource and query of the response
+                version (int): version of the resource
+                build (callable): build the data of the response
+        """
+        cache_key = (key, encoding, packed)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        encoded = encode(build(), encoding, packed)
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            self._entries[cache_key] = (version, encoded)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return encoded
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import logging
+import os
+import threading
+
+
+_logger = logging.getLogger("sanji.status.facts")
+
+
+def which(program, path=None):
+    """Find an executable in PATH without forking.
+
+        Return:
+            path (str): None if not found
+    """
+    if path is None:
+        path = os.environ.get("PATH", os.defpath)
+    for dirname in path.split(os.pathsep):
+        filename = os.path.join(dirname, program)
+        if os.path.isfile(filename) and os.access(filename, os.X_OK):
+            return filename
+    return None
+
+
+def _mtime(filename):
+    try:
+        return os.stat(filename).st_mtime
+    except OSError:
+        return None
+
+
+class StaticFacts(object):
+    """Cache of system facts which rarely change.
+
+    A fact is loaded once and reloaded only when the mtime of one of its
+    source files changes (ex: the pversion script after a firmware
+    upgrade). A fact without sources is loaded once for the whole process.
+    A failed load is cached as None.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader, sources=None):
+        """Register a fact.
+
+            Args:
+                name (str): fact name
+                loader (callable): load the fact
+                sources (callable): return the list of source files
+        """
+        self._loaders[name] = (loader, sources)
+        self._values.pop(name, None)
+
+    def _key(self, sources):
+        if sources is None:
+            return None
+        return tuple([(_, _mtime(_)) for _ in sources()])
+
+    def get(self, name):
+        loader, sources = self._loaders[name]
+        key = self._key(sources)
+        cached = self._values.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        with self._lock:
+            try:
+                value = loader()
+            except Exception as e:
+                _logger.info("Cannot load %s: %s" % (name, e))
+                value = None
+            self._values[name] = (key, value)
+        return value
+
+    def invalidate(self, name=None):
+        if name is None:
+            self._values.clear()
+        else:
+            self._values.pop(name, None)
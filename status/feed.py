@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import fnmatch
+import threading
+
+from scheduler import monotonic
+
+
+class Threshold(object):
+    """Threshold of a metric with hysteresis.
+
+    A metric goes high when it reaches high and back to normal only when
+    it falls to low, so a value moving around one limit does not flap.
+    """
+
+    def __init__(self, high, low=None):
+        if low is None:
+            low = high
+        if low > high:
+            raise ValueError("low (%s) is above high (%s)" % (low, high))
+        self.high = high
+        self.low = low
+
+    def check(self, above, value):
+        """New state of a metric.
+
+            Args:
+                above (bool): metric is high
+                value (float): current value
+        """
+        if not above and value >= self.high:
+            return True
+        if above and value <= self.low:
+            return False
+        return above
+
+    def to_dict(self):
+        return {"high": self.high, "low": self.low}
+
+
+class StatusFeed(object):
+    """When to publish status events.
+
+    An event is due every interval seconds (0 disables periodic events)
+    and as soon as a metric crosses its threshold. Events are never sent
+    more often than min_interval, crossings within it are sent together
+    with the next event, which puts a ceiling on the bus load.
+    """
+
+    def __init__(self, enable=False, interval=60, min_interval=1,
+                 thresholds=None, clock=monotonic):
+        self.enable = enable
+        self.interval = interval
+        self.min_interval = min_interval
+        self.thresholds = {}
+        self.published = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._above = {}
+        self._pending = []
+        self._last = None
+        self.configure(thresholds=thresholds or {})
+
+    def configure(self, enable=None, interval=None, min_interval=None,
+                  thresholds=None):
+        """Update the configuration.
+
+            Args:
+                thresholds (dict): {metric or pattern: {"high", "low"}},
+                    replace all thresholds
+
+            Raises:
+                ValueError: low is above high
+        """
+        with self._lock:
+            if thresholds is not None:
+                self.thresholds = dict([
+                    (name, Threshold(_["high"], _.get("low")))
+                    for name, _ in thresholds.items()])
+                self._above = {}
+            if enable is not None:
+                self.enable = enable
+            if interval is not None:
+                self.interval = interval
+            if min_interval is not None:
+                self.min_interval = min_interval
+
+    def threshold(self, metric):
+        threshold = self.thresholds.get(metric)
+        if threshold is not None:
+            return threshold
+        for pattern in sorted(self.thresholds):
+            if fnmatch.fnmatchcase(metric, pattern):
+                return self.thresholds[pattern]
+        return None
+
+    def check(self, metrics):
+        """Check the metrics of a sample.
+
+            Args:
+                metrics (dict): {metric: value}, see Status.get_metrics
+
+            Return:
+                event (dict): {"reason": "interval" or "threshold",
+                    "alerts": [threshold crossings]}, None if no event
+                    is due
+        """
+        now = self._clock()
+        with self._lock:
+            for metric in sorted(metrics):
+                threshold = self.threshold(metric)
+                if threshold is None:
+                    continue
+                above = self._above.get(metric, False)
+                state = threshold.check(above, metrics[metric])
+                if state == above:
+                    continue
+                self._above[metric] = state
+                alert = {
+                    "metric": metric,
+                    "value": metrics[metric],
+                    "state": "high" if state else "normal"
+                }
+                alert.update(threshold.to_dict())
+                self._pending.append(alert)
+
+            elapsed = now - self._last if self._last is not None else None
+            if elapsed is not None and elapsed < self.min_interval:
+                return None
+            if self._pending:
+                reason = "threshold"
+            elif self.interval and (elapsed is None or
+                                    elapsed >= self.interval):
+                reason = "interval"
+            else:
+                return None
+            event = {"reason": reason, "alerts": self._pending}
+            self._pending = []
+            self._last = now
+            self.published += 1
+            return event
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "enable": self.enable,
+                "interval": self.interval,
+                "minInterval": self.min_interval,
+                "thresholds": dict([
+                    (name, _.to_dict())
+                    for name, _ in self.thresholds.items()]),
+                "high": sorted([_ for _, above in self._above.items()
+                                if above]),
+                "published": self.published
+            }
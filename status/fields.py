@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import re
+import sys
+from collections import OrderedDict
+
+
+class FieldError(Exception):
+    pass
+
+
+class Field(object):
+    """A field of /system/status.
+
+        Args:
+            name (str): field name
+            collector (str): name of the Status method collecting the field
+            schema (dict): swagger schema of the field
+            ttl (float): seconds to reuse a collected value
+            filters (dict): {query parameter: collector argument}, the
+                parameter filters the items of an array field by the item
+                key of the same name, and is passed to the collector if the
+                argument is not None
+    """
+
+    def __init__(self, name, collector, schema, ttl=1, filters=None):
+        self.name = name
+        self.collector = collector
+        self.schema = schema
+        self.ttl = ttl
+        self.filters = filters or {}
+
+
+class FieldRegistry(object):
+    """Fields of a resource, with their collectors and schema.
+
+    A query selects fields by "fields=a,b.c" (nested paths are separated by
+    "."), and filters array items by the filter parameters of the fields,
+    e.g. "fields=disks.usage.percent&mount=/". Only the selected fields are
+    collected, and filters are passed down to the collectors.
+    """
+
+    def __init__(self, name, definition, definitions=None):
+        self.name = name
+        self.definition = definition
+        self.definitions = definitions or OrderedDict()
+        self._fields = OrderedDict()
+
+    def register(self, name, collector, schema, ttl=1, filters=None):
+        self._fields[name] = Field(name, collector, schema, ttl, filters)
+
+    def __getitem__(self, name):
+        return self._fields[name]
+
+    def __contains__(self, name):
+        return name in self._fields
+
+    def names(self):
+        return self._fields.keys()
+
+    def ttls(self):
+        return dict([(_.name, _.ttl) for _ in self._fields.values()])
+
+    def _resolve(self, schema):
+        ref = schema.get("$ref")
+        if ref is not None:
+            return self.definitions[ref.split("/")[-1]]
+        return schema
+
+    def _check_path(self, path):
+        parts = path.split(".")
+        if parts[0] not in self._fields:
+            raise FieldError("Unknown field: %s" % path)
+        schema = self._fields[parts[0]].schema
+        for part in parts[1:]:
+            schema = self._resolve(schema)
+            while schema.get("type") == "array":
+                schema = self._resolve(schema["items"])
+            properties = schema.get("properties", {})
+            if part not in properties:
+                raise FieldError("Unknown field: %s" % path)
+            schema = properties[part]
+        return parts[0], tuple(parts[1:])
+
+    def parse(self, query):
+        """Parse the fields and filters of a query.
+
+            Args:
+                query (dict): query string parameters
+
+            Return:
+                fields (OrderedDict): {field: [sub-path tuples]}, an empty
+                    tuple selects the whole field
+                filters (dict): {field: {parameter: [values]}}
+        """
+        fields = OrderedDict()
+        spec = query.get("fields")
+        if spec is None:
+            for name in self._fields:
+                fields[name] = [()]
+        else:
+            for path in [_.strip() for _ in spec.split(",")]:
+                if not path:
+                    continue
+                name, subpath = self._check_path(path)
+                fields.setdefault(name, []).append(subpath)
+
+        filters = {}
+        for name in fields:
+            for param in self._fields[name].filters:
+                if query.get(param) is None:
+                    continue
+                values = [_.strip() for _ in query[param].split(",")]
+                filters.setdefault(name, {})[param] = values
+        return fields, filters
+
+    def key(self, name, filters=None):
+        """Cache key of a field with filters."""
+        if not filters:
+            return name
+        return name + "?" + "&".join(
+            ["%s=%s" % (k, ",".join(sorted(filters[k])))
+             for k in sorted(filters)])
+
+    def loader(self, name, target, filters=None):
+        """Get a function which collects a field from target.
+
+            Args:
+                name (str): field name
+                target (object): object providing the collectors (Status)
+                filters (dict): {parameter: [values]}
+        """
+        field = self._fields[name]
+        filters = filters or {}
+        collector = getattr(target, field.collector)
+        kwargs = dict([(field.filters[k], v) for k, v in filters.items()
+                       if field.filters.get(k) is not None])
+
+        def load():
+            value = collector(**kwargs)
+            for key, values in filters.items():
+                value = [_ for _ in value if _.get(key) in values]
+            return value
+        return load
+
+    def schema(self):
+        """Swagger definitions generated from the registry."""
+        properties = OrderedDict()
+        for field in self._fields.values():
+            properties[field.name] = field.schema
+        definition = OrderedDict(self.definition)
+        definition["properties"] = properties
+        if "example" in definition:
+            definition["example"] = definition.pop("example")
+        definitions = OrderedDict([(self.name, definition)])
+        definitions.update(self.definitions)
+        return definitions
+
+
+def project(value, paths):
+    """Select sub-paths of a value.
+
+        Args:
+            value: dict, list of dicts or scalar
+            paths (list): sub-path tuples, an empty tuple selects all
+    """
+    if () in paths or not isinstance(value, (dict, list)):
+        return value
+    if isinstance(value, list):
+        return [project(_, paths) for _ in value]
+    result = OrderedDict()
+    for path in paths:
+        if path[0] in value:
+            result[path[0]] = None
+    for key in result:
+        result[key] = project(
+            value[key], [_[1:] for _ in paths if _[0] == key])
+    return dict(result)
+
+
+_QUOTE = re.compile(r"[:#'\"{}\[\]()/^$*?|,&!%@`]")
+
+
+def _yaml_scalar(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, long, float)):
+        return str(value)
+    if value == "" or _QUOTE.search(value) or value.strip() != value or \
+            value in ("true", "false", "null", "yes", "no"):
+        return "'%s'" % value.replace("'", "''")
+    return value
+
+
+def dump_yaml(value, indent=0):
+    """Dump dicts, lists and scalars as the block style of schema/*.yaml."""
+    lines = []
+    prefix = " " * indent
+    for key, item in value.items():
+        if isinstance(item, dict):
+            lines.append("%s%s:" % (prefix, key))
+            lines.extend(dump_yaml(item, indent + 2))
+        elif isinstance(item, list):
+            lines.append("%s%s:" % (prefix, key))
+            lines.extend(["%s- %s" % (prefix, _yaml_scalar(_))
+                          for _ in item])
+        else:
+            lines.append("%s%s: %s" % (prefix, key, _yaml_scalar(item)))
+    return lines
+
+
+def update_schema(text, registry):
+    """Replace definitions of the registry in a swagger document."""
+    lines = text.split("\n")
+    for name, definition in registry.schema().items():
+        start = lines.index("  %s:" % name)
+        end = start + 1
+        while end < len(lines) and (
+                lines[end].startswith("   ") or lines[end] == ""):
+            end += 1
+        while lines[end - 1] == "":
+            end -= 1
+        block = dump_yaml(OrderedDict([(name, definition)]), 2)
+        lines[start:end] = block
+    return "\n".join(lines)
+
+
+_DISK = OrderedDict([
+    ("description", "Disk information"),
+    ("type", "object"),
+    ("readOnly", True),
+    ("properties", OrderedDict([
+        ("name", OrderedDict([
+            ("description", "Disk alias"),
+            ("type", "string"),
+            ("readOnly", True)])),
+        ("mount", OrderedDict([
+            ("description", "Mount point"),
+            ("type", "string"),
+            ("readOnly", True)])),
+        ("device", OrderedDict([
+            ("description", "Physical device node path"),
+            ("type", "string"),
+            ("readOnly", True)])),
+        ("usage", OrderedDict([
+            ("description", "Usage of this disk"),
+            ("type", "object"),
+            ("readOnly", True),
+            ("properties", OrderedDict([
+                ("total", OrderedDict([
+                    ("description", "Total size (unit: byte)"),
+                    ("type", "integer"),
+                    ("readOnly", True)])),
+                ("used", OrderedDict([
+                    ("description", "Used size (unit: byte)"),
+                    ("type", "integer"),
+                    ("readOnly", True)])),
+                ("free", OrderedDict([
+                    ("description", "Free size (unit: byte)"),
+                    ("type", "integer"),
+                    ("readOnly", True)])),
+                ("percent", OrderedDict([
+                    ("description", "Percent of used size"),
+                    ("type", "number"),
+                    ("readOnly", True)]))
+            ]))
+        ])),
+        ("stale", OrderedDict([
+            ("description", "Usage is not updated in time"),
+            ("type", "boolean"),
+            ("readOnly", True)]))
+    ]))
+])
+
+STATUS_FIELDS = FieldRegistry(
+    "SystemStatus", OrderedDict([
+        ("description", "System status"),
+        ("type", "object"),
+        ("example", OrderedDict([
+            ("$ref", "#/externalDocs/x-mocks/SystemStatusExample")]))
+    ]),
+    OrderedDict([("Disk", _DISK)]))
+
+STATUS_FIELDS.register(
+    "hostname", "get_hostname", OrderedDict([
+        ("description", "Hostname"),
+        ("type", "string"),
+        ("minLength", 1),
+        ("maxLength", 63),
+        ("pattern", "/^(?![0-9]+$)(?!.*-$)(?!-)[a-zA-Z0-9-]{1,63}$/")]),
+    ttl=5)
+STATUS_FIELDS.register(
+    "version", "get_product_version", OrderedDict([
+        ("description", "Version of system"),
+        ("type", "string"),
+        ("readOnly", True)]),
+    ttl=60)
+STATUS_FIELDS.register(
+    "uptimeSec", "get_uptime", OrderedDict([
+        ("description", "System uptime (unit: seconds)"),
+        ("type", "string"),
+        ("readOnly", True)]))
+STATUS_FIELDS.register(
+    "cpuUsage", "get_cpu_usage", OrderedDict([
+        ("description", "CPU usage (in percentage)"),
+        ("type", "number"),
+        ("readOnly", True)]))
+STATUS_FIELDS.register(
+    "memoryUsage", "get_memory_usage", OrderedDict([
+        ("description", "System memory usage (in percentage)"),
+        ("type", "number"),
+        ("readOnly", True)]))
+STATUS_FIELDS.register(
+    "memory", "get_memory", OrderedDict([
+        ("description", "System total memory (unit: byte)"),
+        ("type", "integer"),
+        ("readOnly", True)]),
+    ttl=3600)
+STATUS_FIELDS.register(
+    "disks", "get_disks", OrderedDict([
+        ("type", "array"),
+        ("readOnly", True),
+        ("items", OrderedDict([("$ref", "#/definitions/Disk")]))]),
+    ttl=10, filters={"mount": "mounts", "name": None, "device": None})
+
+
+if __name__ == "__main__":
+    # update definitions of schema/index.yaml: fields.py schema/index.yaml
+    with open(sys.argv[1], "r") as f:
+        text = f.read()
+    with open(sys.argv[1], "w") as f:
+        f.write(update_schema(text, STATUS_FIELDS))
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import fnmatch
+import logging
+import threading
+import time
+from array import array
+
+
+_logger = logging.getLogger("sanji.status.history")
+
+# (step, slots): 10 minutes of 1s, 1 day of 1m and 1 week of 1h
+TIERS = [(1, 600), (60, 1440), (3600, 168)]
+
+MAX_METRICS = 32
+
+
+class Tier(object):
+    """Fixed-size ring of min/avg/max buckets of one resolution.
+
+    The slot of a bucket is its number (timestamp // step) modulo the number
+    of slots, and the bucket number is kept in the slot to tell a current
+    bucket from an overwritten one. Nothing is allocated after __init__.
+    Bucket numbers are kept as doubles, a 32-bit "l" overflows in 2038.
+    """
+
+    def __init__(self, step, slots):
+        self.step = step
+        self.slots = slots
+        self._buckets = array("d", [-1]) * slots
+        self._count = array("l", [0]) * slots
+        self._sum = array("d", [0.0]) * slots
+        self._min = array("d", [0.0]) * slots
+        self._max = array("d", [0.0]) * slots
+
+    def push(self, value, timestamp):
+        bucket = int(timestamp // self.step)
+        slot = bucket % self.slots
+        if self._buckets[slot] != bucket:
+            self._buckets[slot] = bucket
+            self._count[slot] = 1
+            self._sum[slot] = value
+            self._min[slot] = value
+            self._max[slot] = value
+            return
+        self._count[slot] += 1
+        self._sum[slot] += value
+        if value < self._min[slot]:
+            self._min[slot] = value
+        if value > self._max[slot]:
+            self._max[slot] = value
+
+    def newest(self):
+        """Number of the newest bucket, -1 if nothing was pushed."""
+        return int(max(self._buckets))
+
+    def buckets(self, start, end):
+        """Iterate (timestamp, count, sum, min, max) in [start, end]."""
+        last = int(end // self.step)
+        first = max(int(start // self.step), last - self.slots + 1)
+        for bucket in xrange(first, last + 1):
+            slot = bucket % self.slots
+            if self._buckets[slot] != bucket:
+                continue
+            yield (bucket * self.step, self._count[slot], self._sum[slot],
+                   self._min[slot], self._max[slot])
+
+
+def least_recent(metrics):
+    """Find the least recently updated metric.
+
+        Args:
+            metrics (list): (name, tiers) of each metric
+
+        Return:
+            metric (tuple): (name, expires), expires is the time all its
+                buckets are out of the longest tier, None without metrics
+    """
+    result = None
+    for name, tiers in metrics:
+        tier = max(tiers, key=lambda _: _.step * _.slots)
+        expires = (tier.newest() + tier.slots) * tier.step
+        if result is None or expires < result[1]:
+            result = (name, expires)
+    return result
+
+
+class MemoryStore(object):
+    """Tiers of each metric in process memory.
+
+    When the store is full, a metric whose buckets are all out of the
+    longest tier is evicted to make room for a new one.
+    """
+
+    def __init__(self, tiers=TIERS, max_metrics=MAX_METRICS):
+        self.tiers = tiers
+        self._max_metrics = max_metrics
+        self._metrics = {}
+        # no metric expires before this time
+        self._full_until = 0
+
+    def names(self):
+        return self._metrics.keys()
+
+    def get(self, metric):
+        return self._metrics.get(metric)
+
+    def create(self, metric, timestamp=None):
+        """Allocate tiers of a new metric, None if the store is full."""
+        if len(self._metrics) >= self._max_metrics:
+            if timestamp is None or timestamp < self._full_until:
+                return None
+            name, expires = least_recent(self._metrics.items())
+            if timestamp < expires:
+                self._full_until = expires
+                return None
+            _logger.info("Evict history of %s" % name)
+            del self._metrics[name]
+        tiers = self._metrics[metric] = [
+            Tier(step, slots) for step, slots in self.tiers]
+        return tiers
+
+
+class History(object):
+    """Multi-resolution history of metrics.
+
+    Each metric is pushed into every tier, so memory is fixed by TIERS and
+    max_metrics no matter how long the device is up. The tiers are kept in
+    a store, MemoryStore by default or a memory-mapped RRDStore.
+    """
+
+    def __init__(self, tiers=TIERS, max_metrics=MAX_METRICS,
+                 clock=time.time, store=None):
+        self._store = store or MemoryStore(tiers, max_metrics)
+        self._tiers = self._store.tiers
+        self._clock = clock
+        self._lock = threading.Lock()
+        # metrics not recorded as the store is full, warned once
+        self.rejected = set()
+
+    @property
+    def store(self):
+        return self._store
+
+    def push(self, metric, value, timestamp=None):
+        if value is None:
+            return
+        if timestamp is None:
+            timestamp = self._clock()
+        with self._lock:
+            tiers = self._store.get(metric)
+            if tiers is None:
+                tiers = self._store.create(metric, timestamp)
+                if tiers is None:
+                    if metric not in self.rejected:
+                        self.rejected.add(metric)
+                        _logger.warning(
+                            "Too many metrics, %s is not recorded" % metric)
+                    return
+                self.rejected.discard(metric)
+            for tier in tiers:
+                tier.push(value, timestamp)
+
+    def update(self, values, timestamp=None):
+        """Push {metric: value} with the same timestamp."""
+        if timestamp is None:
+            timestamp = self._clock()
+        for metric, value in values.items():
+            self.push(metric, value, timestamp)
+
+    def metrics(self, patterns=None):
+        """Recorded metrics matching patterns, "diskUsage" matches also
+        "diskUsage.*"."""
+        names = sorted(self._store.names())
+        if patterns is None:
+            return names
+        return [_ for _ in names
+                if any([_ == p or fnmatch.fnmatchcase(_, p) or
+                        _.startswith(p + ".") for p in patterns])]
+
+    def _tier(self, start, step, now):
+        """Index of the coarsest tier not coarser than step, or a coarser
+        one if it does not reach back to start."""
+        for index, (tier_step, slots) in enumerate(self._tiers):
+            covered = (int(now // tier_step) - slots + 1) * tier_step <= start
+            coarser = index + 1 < len(self._tiers) and \
+                self._tiers[index + 1][0] <= step
+            if covered and not coarser:
+                return index
+        return len(self._tiers) - 1
+
+    def query(self, patterns=None, start=None, end=None, step=None):
+        """Get min/avg/max of metrics.
+
+            Args:
+                patterns (list): metric names or patterns, None for all
+                start (float): from timestamp, default 10 minutes ago
+                end (float): to timestamp, default now
+                step (int): seconds of each point, default the step of the
+                    finest tier which still covers start
+
+            Return:
+                history (dict): {"from", "to", "step", "metrics": {metric:
+                    [{"time", "min", "avg", "max"}]}}
+        """
+        now = self._clock()
+        end = now if end is None else min(end, now)
+        start = end - 600 if start is None else start
+        index = self._tier(start, step or 1, now)
+        tier_step = self._tiers[index][0]
+        step = max(int(step or tier_step) // tier_step, 1) * tier_step
+
+        data = {}
+        with self._lock:
+            for metric in self.metrics(patterns):
+                tier = self._store.get(metric)[index]
+                points = []
+                for timestamp, count, total, low, high in \
+                        tier.buckets(start, end):
+                    timestamp = timestamp // step * step
+                    if points and points[-1][0] == timestamp:
+                        point = points[-1]
+                        point[1] += count
+                        point[2] += total
+                        point[3] = min(point[3], low)
+                        point[4] = max(point[4], high)
+                    else:
+                        points.append([timestamp, count, total, low, high])
+                data[metric] = [
+                    {"time": _[0], "min": _[3], "avg": _[2] / _[1],
+                     "max": _[4]} for _ in points]
+        return {"from": start, "to": end, "step": step, "metrics": data}
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from Queue import Queue
+
+
+_logger = logging.getLogger("sanji.status.jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+DEFAULT_LANE = "default"
+
+
+class JobError(Exception):
+    """Failure of a job, reported with a response code."""
+
+    def __init__(self, message, code=500):
+        super(JobError, self).__init__(message)
+        self.code = code
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job(object):
+    """A slow operation run by a worker of JobQueue.
+
+    The function of a job is called with the job, it may report progress
+    and should raise JobCancelled (see check()) when the job is cancelled.
+    Its return value is the result of the job.
+    """
+
+    def __init__(self, id, name, func):
+        self.id = id
+        self.name = name
+        self.state = QUEUED
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._func = func
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def sleep(self, seconds):
+        """Sleep which is interrupted by cancel()."""
+        if self._cancel.wait(seconds):
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def run(self):
+        if self._cancel.is_set():
+            self._finish(CANCELLED)
+            return
+        self.state = RUNNING
+        self.started = time.time()
+        try:
+            self.result = self._func(self)
+            self._finish(DONE)
+        except JobCancelled:
+            self._finish(CANCELLED)
+        except JobError as e:
+            self.error = {"code": e.code, "message": str(e)}
+            self._finish(FAILED)
+        except Exception as e:
+            _logger.exception("Job %s (%s) failed" % (self.id, self.name))
+            self.error = {"code": 500, "message": str(e)}
+            self._finish(FAILED)
+
+    def _finish(self, state):
+        self.state = state
+        self.finished = time.time()
+        self._done.set()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created,
+            "startedAt": self.started,
+            "finishedAt": self.finished
+        }
+
+
+class JobQueue(object):
+    """Run jobs in pools of worker threads.
+
+    Each lane has its own queue and workers, so slow jobs (ex: uploads)
+    in one lane never hold back the jobs of another: lanes gives the
+    workers of each lane besides the default one. Finished jobs are
+    kept for their results, the oldest ones are dropped when there are
+    more than max_jobs.
+    """
+
+    def __init__(self, workers=2, max_jobs=100, lanes=None):
+        self._max_jobs = max_jobs
+        self._queues = {}
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._workers = []
+        lanes = dict(lanes or {})
+        lanes.setdefault(DEFAULT_LANE, workers)
+        for lane, count in lanes.items():
+            queue = self._queues[lane] = Queue()
+            for index in range(count):
+                worker = threading.Thread(
+                    target=self._work, args=(queue,),
+                    name="job-%s-%d" % (lane, index))
+                worker.daemon = True
+                worker.start()
+                self._workers.append((worker, queue))
+
+    def _work(self, queue):
+        while True:
+            job = queue.get()
+            if job is None:
+                break
+            job.run()
+
+    def _prune(self):
+        finished = [_ for _ in self._jobs.values() if _.state in FINISHED]
+        for job in finished[:max(len(self._jobs) - self._max_jobs, 0)]:
+            del self._jobs[job.id]
+
+    def submit(self, name, func, lane=DEFAULT_LANE):
+        """Queue a job.
+
+            Args:
+                name (str): kind of the job, e.g. "syslog"
+                func (callable): func(job) runs the job
+                lane (str): lane running the job
+
+            Return:
+                job (Job)
+        """
+        with self._lock:
+            job = Job(next(self._ids), name, func)
+            self._jobs[job.id] = job
+            self._prune()
+        self._queues[lane].put(job)
+        return job
+
+    def get(self, id):
+        with self._lock:
+            return self._jobs.get(id)
+
+    def list(self):
+        with self._lock:
+            return self._jobs.values()
+
+    def cancel(self, id):
+        """Cancel a job, a running job stops at its next check.
+
+            Return:
+                job (Job): None if there is no such job
+        """
+        job = self.get(id)
+        if job is not None and job.state not in FINISHED:
+            job.cancel()
+            if job.state == QUEUED:
+                job.state = CANCELLED
+        return job
+
+    def close(self):
+        for job in self.list():
+            job.cancel()
+        for _, queue in self._workers:
+            queue.put(None)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import logging
+
+from scheduler import monotonic
+
+
+_logger = logging.getLogger("sanji.status.netdev")
+
+NET_DEV_PATH = "/proc/net/dev"
+# counters of 32-bit kernels wrap at 2**32
+COUNTER_WRAP = 2 ** 32
+
+# columns of /proc/net/dev used, by index after the interface name
+COUNTERS = [
+    ("rxBytes", 0, "rx_bytes", "received bytes"),
+    ("rxPackets", 1, "rx_packets", "received packets"),
+    ("rxErrors", 2, "rx_errors", "receive errors"),
+    ("rxDropped", 3, "rx_dropped", "dropped received packets"),
+    ("txBytes", 8, "tx_bytes", "transmitted bytes"),
+    ("txPackets", 9, "tx_packets", "transmitted packets"),
+    ("txErrors", 10, "tx_errors", "transmit errors"),
+    ("txDropped", 11, "tx_dropped", "dropped transmitted packets")
+]
+
+
+def ignored(iface):
+    return iface.startswith("lo") or iface.startswith("mon.")
+
+
+def parse_net_dev(text):
+    """Parse the content of /proc/net/dev.
+
+        Return:
+            counters (dict): {interface: {"rxBytes", "rxPackets", ...}}
+    """
+    counters = {}
+    for line in text.splitlines()[2:]:
+        iface, sep, values = line.partition(":")
+        if not sep:
+            continue
+        iface = iface.strip()
+        values = values.split()
+        if ignored(iface) or len(values) < 16:
+            continue
+        counters[iface] = dict(
+            [(name, int(values[index])) for name, index, _, _ in COUNTERS])
+    return counters
+
+
+def read_net_dev(path=NET_DEV_PATH):
+    with open(path, "r") as f:
+        return parse_net_dev(f.read())
+
+
+def counter_delta(prev, curr):
+    """Increase of a counter, a counter going back wrapped if it was a
+    32-bit value, otherwise it was reset and counts from 0."""
+    if curr >= prev:
+        return curr - prev
+    if prev < COUNTER_WRAP:
+        return curr + COUNTER_WRAP - prev
+    return curr
+
+
+def interface_tag_names(iface):
+    """Get tag names of the counters and rates of an interface.
+
+        Return:
+            names (list): list of (tag name, key, description)
+    """
+    names = []
+    for name, _, tag, description in COUNTERS:
+        names.append(("net_%s_%s" % (iface, tag), name,
+                      "%s %s" % (iface, description)))
+        names.append(("net_%s_%s_rate" % (iface, tag), name + "Rate",
+                      "%s %s per second" % (iface, description)))
+    return names
+
+
+class NetDevSampler(object):
+    """Counters of each interface and their rates since the previous sample.
+
+    Each sample reads /proc/net/dev once; the previous counters are kept
+    here so callers get the rates without keeping any state.
+    """
+
+    def __init__(self, path=NET_DEV_PATH, clock=monotonic):
+        self._path = path
+        self._clock = clock
+        self._last = None
+
+    def sample(self):
+        """Sample the counters.
+
+            Return:
+                interfaces (dict): {interface: {"rxBytes", ...,
+                    "rxBytesRate", ...}}, rates are per second and are
+                    missing on the first sample of an interface
+        """
+        now = self._clock()
+        try:
+            counters = read_net_dev(self._path)
+        except (IOError, OSError, ValueError) as e:
+            _logger.warning("Cannot read %s: %s" % (self._path, e))
+            counters = {}
+        last, self._last = self._last, (now, counters)
+
+        interfaces = {}
+        for iface, values in counters.items():
+            interface = dict(values)
+            interfaces[iface] = interface
+            if last is None or now <= last[0] or iface not in last[1]:
+                continue
+            elapsed = now - last[0]
+            prev = last[1][iface]
+            for name, _, _, _ in COUNTERS:
+                interface[name + "Rate"] = \
+                    counter_delta(prev[name], values[name]) / float(elapsed)
+        return interfaces
+
+
+def rate_metrics(interfaces):
+    """Get history metrics of sampled interfaces.
+
+        Return:
+            metrics (dict): {"rxRate.<interface>", "txRate.<interface>"}
+    """
+    metrics = {}
+    for iface, interface in interfaces.items():
+        if "rxBytesRate" not in interface:
+            continue
+        metrics["rxRate.%s" % iface] = interface["rxBytesRate"]
+        metrics["txRate.%s" % iface] = interface["txBytesRate"]
+    return metrics
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import errno
+import logging
+import os
+import select
+import threading
+from Queue import Queue, Empty
+
+from scheduler import Scheduler, monotonic
+
+
+_logger = logging.getLogger("sanji.status.probes")
+
+
+class Backoff(object):
+    """Exponential backoff between attempts of a failing operation."""
+
+    def __init__(self, initial=1.0, maximum=60.0, factor=2.0,
+                 clock=monotonic):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = 0.0
+        self.failures = 0
+        self._clock = clock
+        self._next = 0.0
+
+    def ready(self):
+        return self._clock() >= self._next
+
+    def remaining(self):
+        return max(self._next - self._clock(), 0.0)
+
+    def failure(self):
+        self.failures += 1
+        self.delay = min(self.initial * self.factor ** (self.failures - 1),
+                         self.maximum)
+        self._next = self._clock() + self.delay
+
+    def success(self):
+        self.failures = 0
+        self.delay = 0.0
+        self._next = 0.0
+
+
+class Probe(object):
+    """A collector run in its own thread, at most one call at a time.
+
+    collect() runs in the probe thread and its result is passed to apply()
+    on the runtime thread. A result which takes longer than the timeout
+    is dropped, and ticks while a call is in flight are skipped, so a hung
+    source only stops its own probe.
+    """
+
+    def __init__(self, name, collect, apply, timeout, done,
+                 clock=monotonic):
+        self.name = name
+        self.timeout = timeout
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.overruns = 0
+        self.busy = False
+        self.started = None
+        self._collect = collect
+        self._apply = apply
+        self._done = done
+        self._clock = clock
+        self._hung = False
+        self._requests = Queue()
+        self._thread = threading.Thread(
+            target=self._work, name="probe-%s" % name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _work(self):
+        while self._requests.get() is not None:
+            try:
+                result, error = self._collect(), None
+            except Exception as e:
+                result, error = None, e
+            self._done(self, result, error)
+
+    def dispatch(self):
+        """Start a call, unless the previous one is still running."""
+        now = self._clock()
+        if self.busy:
+            self.overruns += 1
+            if not self._hung and now - self.started > self.timeout:
+                self._hung = True
+                _logger.warning("Probe %s is not answering for %.1fs" % (
+                    self.name, now - self.started))
+            return
+        self.busy = True
+        self.started = now
+        self._requests.put(True)
+
+    def complete(self, result, error):
+        """Apply the result of a call, on the runtime thread."""
+        self.busy = False
+        self._hung = False
+        self.runs += 1
+        if self._clock() - self.started > self.timeout:
+            self.timeouts += 1
+            _logger.warning("Probe %s timeout, result dropped" % self.name)
+            return
+        if error is not None:
+            self.errors += 1
+            _logger.warning("Probe %s failed: %s" % (self.name, error))
+            return
+        if self._apply is not None:
+            self._apply(result)
+
+    def stats(self):
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "overruns": self.overruns
+        }
+
+    def close(self):
+        self._requests.put(None)
+
+
+class ProbeRuntime(object):
+    """Run probes concurrently on one scheduler.
+
+    The scheduler only dispatches probes, so one slow source never delays
+    the others. Results are applied on the thread calling run(), between
+    ticks, so apply functions and plain jobs share state without locks.
+    The runtime sleeps in select() on a pipe which probe threads write
+    when a result is ready. after_tick is called after each round of jobs
+    or results.
+    """
+
+    def __init__(self, clock=monotonic, after_tick=None):
+        self._clock = clock
+        self._after_tick = after_tick
+        self._results = Queue()
+        self._probes = []
+        self._wakeup = os.pipe()
+        self.scheduler = Scheduler(
+            clock=clock, sleep=self._wait, after_tick=after_tick)
+
+    def add_probe(self, name, interval, collect, apply=None, timeout=None,
+                  delay=0):
+        """Add a probe.
+
+            Args:
+                collect (callable): blocking collector, run in the probe
+                    thread
+                apply (callable): apply(result) on the runtime thread
+                timeout (float): deadline of a call, default the interval
+        """
+        probe = Probe(name, collect, apply,
+                      timeout if timeout is not None else interval,
+                      self._done, self._clock)
+        self._probes.append(probe)
+        self.scheduler.add(name, interval, probe.dispatch, max_catchup=1,
+                           delay=delay)
+        return probe
+
+    def add_job(self, name, interval, func, max_catchup=3, delay=0):
+        """Add a job run on the runtime thread, see Scheduler.add."""
+        return self.scheduler.add(name, interval, func, max_catchup, delay)
+
+    def _done(self, probe, result, error):
+        self._results.put((probe, result, error))
+        try:
+            os.write(self._wakeup[1], "\0")
+        except OSError:
+            # closed
+            pass
+
+    def process(self):
+        """Apply results of probes.
+
+            Return:
+                count (int): number of applied results
+        """
+        count = 0
+        while True:
+            try:
+                probe, result, error = self._results.get_nowait()
+            except Empty:
+                break
+            try:
+                probe.complete(result, error)
+            except Exception as e:
+                probe.errors += 1
+                _logger.error("Probe %s failed: %s" % (probe.name, e),
+                              exc_info=True)
+            count += 1
+        if count and self._after_tick is not None:
+            self._after_tick()
+        return count
+
+    def _wait(self, delay):
+        """Sleep, applying results as soon as they are ready."""
+        end = self._clock() + delay
+        while True:
+            remaining = end - self._clock()
+            if remaining <= 0:
+                return
+            try:
+                readable = select.select(
+                    [self._wakeup[0]], [], [], remaining)[0]
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                continue
+            if readable:
+                os.read(self._wakeup[0], 4096)
+                self.process()
+
+    def run(self):
+        self.scheduler.run()
+
+    def stop(self):
+        self.scheduler.stop()
+
+    def stats(self):
+        """Get statistics of each probe and job."""
+        stats = self.scheduler.stats()
+        for probe in self._probes:
+            stats[probe.name].update(probe.stats())
+        return stats
+
+    def close(self):
+        for probe in self._probes:
+            probe.close()
+        for fd in self._wakeup:
+            os.close(fd)
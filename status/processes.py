@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import errno
+import heapq
+import logging
+import os
+import pwd
+import threading
+
+from scheduler import monotonic
+
+
+_logger = logging.getLogger("sanji.status.processes")
+
+PROC_PATH = "/proc"
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+CMDLINE_MAX = 256
+
+SORT_KEYS = {
+    "cpu": "cpuUsage",
+    "rss": "rss"
+}
+
+
+def parse_stat(text):
+    """Parse the content of /proc/<pid>/stat.
+
+        Return:
+            stat (tuple): (name, state, ppid, cpu ticks, start time, rss
+                pages)
+    """
+    # the name may contain spaces and parentheses, it ends at the last ")"
+    head, _, tail = text.rpartition(")")
+    name = head.partition("(")[2]
+    fields = tail.split()
+    return (name, fields[0], int(fields[1]),
+            int(fields[11]) + int(fields[12]), int(fields[19]),
+            int(fields[21]))
+
+
+def top_processes(processes, sort="cpu", limit=10):
+    """Get the processes using the most cpu or memory.
+
+        Args:
+            sort (str): "cpu" or "rss"
+    """
+    key = SORT_KEYS[sort]
+    return heapq.nlargest(
+        limit, processes, key=lambda _: (_.get(key, 0), -_["pid"]))
+
+
+class ProcessScanner(object):
+    """Process table read incrementally from /proc.
+
+    Only /proc/<pid>/stat is read on each scan. The command line and user
+    of a process are read once, when its pid (and start time, as pids are
+    reused) is first seen, and cpu usages come from the ticks kept since
+    the previous scan. The cost of each scan is measured, see stats().
+    """
+
+    def __init__(self, proc=PROC_PATH, clock=monotonic):
+        self._proc = proc
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._static = {}
+        self._ticks = {}
+        self._users = {}
+        self._last = None
+        self.scans = 0
+        self.processes = 0
+        self.static_reads = 0
+        self.scan_time = 0.0
+        self.scan_time_max = 0.0
+        self._scan_time_total = 0.0
+
+    def _read(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return os.read(fd, 4096)
+        finally:
+            os.close(fd)
+
+    def _user(self, uid):
+        user = self._users.get(uid)
+        if user is None:
+            try:
+                user = pwd.getpwuid(uid).pw_name
+            except KeyError:
+                user = str(uid)
+            self._users[uid] = user
+        return user
+
+    def _read_static(self, pid, name, start):
+        path = os.path.join(self._proc, pid)
+        self.static_reads += 1
+        cmdline = self._read(os.path.join(path, "cmdline"))
+        cmdline = cmdline.rstrip("\0").replace("\0", " ")[:CMDLINE_MAX]
+        return {
+            "start": start,
+            "cmdline": cmdline or "[%s]" % name,
+            "user": self._user(os.stat(path).st_uid)
+        }
+
+    def scan(self):
+        """Scan the process table.
+
+            Return:
+                processes (list): [{"pid", "ppid", "name", "cmdline",
+                    "user", "state", "rss" (bytes), "cpuUsage" (percent
+                    of one core, like top, missing on the first scan of a
+                    process)}]
+        """
+        with self._lock:
+            begin = monotonic()
+            now = self._clock()
+            elapsed = now - self._last if self._last is not None else 0
+            static = {}
+            ticks = {}
+            processes = []
+            for pid in os.listdir(self._proc):
+                if not pid.isdigit():
+                    continue
+                try:
+                    name, state, ppid, cpu, start, rss = parse_stat(
+                        self._read(os.path.join(self._proc, pid, "stat")))
+                    info = self._static.get(pid)
+                    if info is None or info["start"] != start:
+                        info = self._read_static(pid, name, start)
+                except (IOError, OSError) as e:
+                    # exited while scanning
+                    if e.errno not in (errno.ENOENT, errno.ESRCH):
+                        _logger.warning("Cannot read process %s: %s" % (
+                            pid, e))
+                    continue
+                except (ValueError, IndexError) as e:
+                    _logger.warning("Cannot parse process %s: %s" % (pid, e))
+                    continue
+                static[pid] = info
+                ticks[pid] = (start, cpu)
+                process = {
+                    "pid": int(pid),
+                    "ppid": ppid,
+                    "name": name,
+                    "cmdline": info["cmdline"],
+                    "user": info["user"],
+                    "state": state,
+                    "rss": rss * PAGE_SIZE
+                }
+                last = self._ticks.get(pid)
+                if elapsed > 0 and last is not None and last[0] == start:
+                    process["cpuUsage"] = \
+                        max(cpu - last[1], 0) * 100.0 / CLK_TCK / elapsed
+                processes.append(process)
+
+            # forget exited processes
+            self._static = static
+            self._ticks = ticks
+            self._last = now
+            self.processes = len(processes)
+            self.scans += 1
+            self.scan_time = monotonic() - begin
+            self.scan_time_max = max(self.scan_time_max, self.scan_time)
+            self._scan_time_total += self.scan_time
+            return processes
+
+    def stats(self):
+        """Get the cost of scans."""
+        return {
+            "processes": self.processes,
+            "scans": self.scans,
+            "staticReads": self.static_reads,
+            "scanTime": self.scan_time,
+            "scanTimeAvg": self._scan_time_total / self.scans
+            if self.scans else 0.0,
+            "scanTimeMax": self.scan_time_max
+        }
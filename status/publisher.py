@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import fnmatch
+import json
+import logging
+
+from scheduler import monotonic
+
+
+_logger = logging.getLogger("sanji.status.publisher")
+
+
+class PublishRule(object):
+    """When a tag value is worth publishing.
+
+    A value is published when it moves out of the deadband of the last
+    published value (absolute and/or percent of it), but not more often
+    than min_interval. max_interval is the heartbeat: the value is re-sent
+    after that long even if it has not moved.
+    """
+
+    def __init__(self, deadband=0.0, percent=0.0, min_interval=0,
+                 max_interval=None):
+        self.deadband = deadband
+        self.percent = percent
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(deadband=data.get("deadband", 0.0),
+                   percent=data.get("percent", 0.0),
+                   min_interval=data.get("minInterval", 0),
+                   max_interval=data.get("maxInterval", None))
+
+    def changed(self, last, value):
+        delta = abs(value - last)
+        if delta == 0:
+            return False
+        if delta <= self.deadband:
+            return False
+        if self.percent and delta <= abs(last) * self.percent / 100.0:
+            return False
+        return True
+
+    def should_publish(self, last, value, elapsed):
+        """Check the rule.
+
+            Args:
+                last (float): last published value, None if never published
+                value (float): new value
+                elapsed (float): seconds since last published
+        """
+        if last is None:
+            return True
+        if self.max_interval is not None and elapsed >= self.max_interval:
+            return True
+        if elapsed < self.min_interval:
+            return False
+        return self.changed(last, value)
+
+
+# first matched pattern wins
+DEFAULT_RULES = [
+    ("*_usage", PublishRule(deadband=0.5, min_interval=1, max_interval=60)),
+    ("net_*_rate", PublishRule(deadband=1.0, min_interval=5,
+                               max_interval=300)),
+    # interface counters grow all the time, their rates carry the changes
+    ("net_*", PublishRule(deadband=float("inf"), max_interval=300)),
+    ("*", PublishRule(deadband=1.0, min_interval=5, max_interval=300))
+]
+
+
+def load_rules(path):
+    """Load rules from a json file, ex:
+        [{"tag": "cpu_usage*", "deadband": 1, "maxInterval": 60}]
+    """
+    with open(path) as f:
+        return [(_["tag"], PublishRule.from_dict(_)) for _ in json.load(f)]
+
+
+class TagPublisher(object):
+    """Publish tags of an equipment under publish rules.
+
+    Updates are kept as pending until flush(), so tags updated in the same
+    tick are published together with one timestamp. With tags, only the
+    listed tags are published.
+    """
+
+    def __init__(self, tagv2, make_tag, timestamp, equipment="SYSTEM",
+                 rules=DEFAULT_RULES, clock=monotonic, tags=None):
+        """
+            Args:
+                tagv2: TagV2 instance
+                make_tag (callable): make_tag(value, timestamp) returns a Tag
+                timestamp (callable): timestamp of a batch, ex: Time.now
+                tags (set): names of published tags, default all
+        """
+        self._tagv2 = tagv2
+        self._make_tag = make_tag
+        self._timestamp = timestamp
+        self._equipment = equipment
+        self._rules = rules
+        self._clock = clock
+        self._rule_cache = {}
+        self._last = {}
+        self._pending = {}
+        self.tags = tags
+        self.published = 0
+        self.suppressed = 0
+
+    def rule(self, name):
+        rule = self._rule_cache.get(name)
+        if rule is None:
+            rule = PublishRule()
+            for pattern, _rule in self._rules:
+                if fnmatch.fnmatchcase(name, pattern):
+                    rule = _rule
+                    break
+            self._rule_cache[name] = rule
+        return rule
+
+    def update(self, name, value):
+        """Update a tag value, return True if it will be published."""
+        if self.tags is not None and name not in self.tags:
+            return False
+        now = self._clock()
+        last_value, last_time = self._last.get(name, (None, None))
+        elapsed = now - last_time if last_time is not None else 0
+        if not self.rule(name).should_publish(last_value, value, elapsed):
+            self.suppressed += 1
+            return False
+        self._pending[name] = value
+        self._last[name] = (value, now)
+        return True
+
+    def flush(self):
+        """Publish pending tags, return the number of published tags."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        timestamp = self._timestamp()
+        for name in sorted(pending):
+            self._tagv2.publish(
+                self._equipment, name,
+                self._make_tag(pending[name], timestamp))
+        self.published += len(pending)
+        return len(pending)
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "suppressed": self.suppressed
+        }
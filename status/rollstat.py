@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import collections
+import math
+import time
+
+
+# window name and length in seconds
+WINDOWS = [
+    ("5s", 5),
+    ("1m", 60),
+    ("15m", 900)
+]
+
+# statistics published as extra SYSTEM tags, ex: cpu_usage_avg_1m
+STATS = ["avg", "ewma", "min", "max", "p95"]
+
+STAT_DESCRIPTIONS = {
+    "avg": "average",
+    "ewma": "moving average",
+    "min": "minimum",
+    "max": "maximum",
+    "p95": "95th percentile"
+}
+
+
+def stat_tag_name(metric, stat, window):
+    return "%s_%s_%s" % (metric, stat, window)
+
+
+def stat_tag_names(metric, windows=WINDOWS, stats=STATS):
+    """Get extra tag names of a metric.
+
+        Return:
+            names (list): list of (tag name, stat, window name)
+    """
+    names = []
+    for window, _ in windows:
+        for stat in stats:
+            names.append((stat_tag_name(metric, stat, window), stat, window))
+    return names
+
+
+class RollingStats(object):
+    """Statistics over a sliding time window.
+
+    Running sum, monotonic min/max queues and a fixed-bin histogram are
+    updated on push and eviction, so each query costs O(1) (percentiles
+    cost O(bins)) no matter how many samples are in the window.
+    """
+
+    # recompute the running sum to cancel floating point drift
+    RESYNC = 1024
+
+    def __init__(self, window, lo=0.0, hi=100.0, bins=100):
+        self.window = window
+        self._lo = lo
+        self._hi = hi
+        self._bins = bins
+        self._hist = [0] * bins
+        self._samples = collections.deque()
+        self._mins = collections.deque()
+        self._maxs = collections.deque()
+        self._sum = 0.0
+        self._ewma = None
+        self._last = None
+        self._pushes = 0
+
+    def _bin(self, value):
+        idx = int((value - self._lo) * self._bins / (self._hi - self._lo))
+        return min(max(idx, 0), self._bins - 1)
+
+    def push(self, value, now=None):
+        """Add a sample.
+
+            Args:
+                value (float): sample value
+                now (float): sample time in seconds, default time.time()
+        """
+        now = time.time() if now is None else now
+        self._samples.append((now, value))
+        self._sum += value
+        self._hist[self._bin(value)] += 1
+
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((now, value))
+        while self._maxs and self._maxs[-1][1] <= value:
+            self._maxs.pop()
+        self._maxs.append((now, value))
+
+        if self._ewma is None:
+            self._ewma = value
+        else:
+            alpha = 1.0 - math.exp(-max(now - self._last, 0) / self.window)
+            self._ewma += alpha * (value - self._ewma)
+        self._last = now
+
+        self._evict(now)
+        self._pushes += 1
+        if self._pushes % self.RESYNC == 0:
+            self._sum = math.fsum([_[1] for _ in self._samples])
+
+    def _evict(self, now):
+        limit = now - self.window
+        while self._samples and self._samples[0][0] <= limit:
+            _, value = self._samples.popleft()
+            self._sum -= value
+            self._hist[self._bin(value)] -= 1
+        while self._mins and self._mins[0][0] <= limit:
+            self._mins.popleft()
+        while self._maxs and self._maxs[0][0] <= limit:
+            self._maxs.popleft()
+        if not self._samples:
+            self._sum = 0.0
+
+    def __len__(self):
+        return len(self._samples)
+
+    def mean(self):
+        if not self._samples:
+            return 0.0
+        return self._sum / len(self._samples)
+
+    def ewma(self):
+        return 0.0 if self._ewma is None else self._ewma
+
+    def min(self):
+        return self._mins[0][1] if self._mins else 0.0
+
+    def max(self):
+        return self._maxs[0][1] if self._maxs else 0.0
+
+    def percentile(self, percent):
+        """Get approximate percentile from the histogram.
+
+            Args:
+                percent (float): 0 ~ 100
+
+            Return:
+                value (float): interpolated within the matched bin
+        """
+        count = len(self._samples)
+        if count == 0:
+            return 0.0
+        rank = percent * count / 100.0
+        width = (self._hi - self._lo) / self._bins
+        seen = 0
+        for idx, num in enumerate(self._hist):
+            if num and seen + num >= rank:
+                value = self._lo + width * (idx + (rank - seen) / num)
+                return min(max(value, self.min()), self.max())
+            seen += num
+        return self.max()
+
+    def stat(self, name):
+        """Get statistic by name: avg, ewma, min, max or pNN."""
+        if name == "avg":
+            return self.mean()
+        if name == "ewma":
+            return self.ewma()
+        if name == "min":
+            return self.min()
+        if name == "max":
+            return self.max()
+        if name.startswith("p"):
+            return self.percentile(float(name[1:]))
+        raise ValueError("Unknown statistic: %s" % name)
+
+
+class MultiWindowStats(object):
+    """RollingStats of one metric over several windows."""
+
+    def __init__(self, windows=WINDOWS, **kwargs):
+        self._windows = [
+            (name, RollingStats(length, **kwargs)) for name, length in windows]
+        self._stats = dict(self._windows)
+
+    def push(self, value, now=None):
+        now = time.time() if now is None else now
+        for _, stats in self._windows:
+            stats.push(value, now)
+
+    def __getitem__(self, window):
+        return self._stats[window]
+
+    def summary(self, stats=STATS):
+        """Get statistics of every window.
+
+            Return:
+                summary (dict): {window: {stat: value}}
+        """
+        summary = {}
+        for name, rolling in self._windows:
+            summary[name] = dict([(_, rolling.stat(_)) for _ in stats])
+        return summary
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import logging
+import mmap
+import os
+import struct
+
+from history import TIERS, MAX_METRICS, least_recent
+
+
+_logger = logging.getLogger("sanji.status.rrd")
+
+# live file on tmpfs, written every second and read by the status bundle
+RRD_PATH = "/run/mxsysstatus/history.rrd"
+# copy on flash, updated every sync interval so history survives reboots
+RRD_BACKUP_PATH = "/var/lib/mxsysstatus/history.rrd"
+
+# magic, format version, number of tiers, max metrics
+HEADER = struct.Struct("<4sIII")
+TIER = struct.Struct("<II")
+NAME = struct.Struct("<48s")
+# bucket number, count, sum, min, max
+RECORD = struct.Struct("<qIdff")
+MAGIC = "MXRR"
+FORMAT_VERSION = 2
+PAGE_SHIFT = 12
+
+
+class RRDError(Exception):
+    pass
+
+
+class MappedTier(object):
+    """Tier (see history.Tier) of fixed-size records in a mapped file."""
+
+    def __init__(self, buf, offset, step, slots, dirty=None):
+        self.step = step
+        self.slots = slots
+        self._buf = buf
+        self._offset = offset
+        self._dirty = dirty
+
+    def push(self, value, timestamp):
+        bucket = int(timestamp // self.step)
+        offset = self._offset + (bucket % self.slots) * RECORD.size
+        last, count, total, low, high = RECORD.unpack_from(self._buf, offset)
+        if last != bucket:
+            count, total, low, high = 1, value, value, value
+        else:
+            count += 1
+            total += value
+            low = min(low, value)
+            high = max(high, value)
+        RECORD.pack_into(self._buf, offset, bucket, count, total, low, high)
+        if self._dirty is not None:
+            self._dirty[offset >> PAGE_SHIFT] = 1
+            self._dirty[(offset + RECORD.size - 1) >> PAGE_SHIFT] = 1
+
+    def newest(self):
+        """Number of the newest bucket, -1 if nothing was pushed."""
+        newest = -1
+        for slot in xrange(self.slots):
+            bucket, count = RECORD.unpack_from(
+                self._buf, self._offset + slot * RECORD.size)[:2]
+            if count and bucket > newest:
+                newest = bucket
+        return newest
+
+    def buckets(self, start, end):
+        """Iterate (timestamp, count, sum, min, max) in [start, end]."""
+        last = int(end // self.step)
+        first = max(int(start // self.step), last - self.slots + 1)
+        for bucket in xrange(first, last + 1):
+            offset = self._offset + (bucket % self.slots) * RECORD.size
+            record = RECORD.unpack_from(self._buf, offset)
+            if record[0] != bucket or record[1] == 0:
+                continue
+            yield (bucket * self.step,) + record[1:]
+
+
+def layout(tiers=TIERS, max_metrics=MAX_METRICS):
+    """Header bytes and total size of a file."""
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(tiers), max_metrics) + \
+        "".join([TIER.pack(step, slots) for step, slots in tiers])
+    slots = sum([_[1] for _ in tiers])
+    size = len(header) + NAME.size * max_metrics + \
+        RECORD.size * slots * max_metrics
+    return header, size
+
+
+def _valid(path, header, size):
+    try:
+        with open(path, "rb") as f:
+            return os.fstat(f.fileno()).st_size == size and \
+                f.read(len(header)) == header
+    except (IOError, OSError):
+        return False
+
+
+def _create(path, header, size, source=None):
+    """Atomically create a file, copied from source if it is given."""
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        if source is not None:
+            with open(source, "rb") as src:
+                f.write(src.read())
+        else:
+            f.write(header)
+            f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, path)
+
+
+class RRDStore(object):
+    """Round-robin history store in a memory-mapped file.
+
+    The file is a header, a table of metric names and, for each metric, the
+    preallocated records of every tier. A writer (mxsysstatusd) maps the
+    live file read-write and pushes into the records in place; readers map
+    it read-only and query the records without copying the file.
+
+    With a backup path, the live file is restored from the backup if it is
+    missing (after a reboot, /run is empty), and sync() copies only the
+    pages written since the last sync into the mapped backup and msyncs
+    it, so the flash is written once per sync interval. Tiers spanning no
+    more than sync_interval are not backed up: they are rewritten between
+    two syncs and have aged out by the time the backup is restored.
+
+    When the table of names is full, the slot of a metric whose buckets
+    are all out of the longest tier is reused, see history.MemoryStore.
+    """
+
+    def __init__(self, path=RRD_PATH, tiers=TIERS, max_metrics=MAX_METRICS,
+                 writable=False, backup=None, sync_interval=0):
+        self.tiers = tiers
+        self._sync_interval = sync_interval
+        self._path = path
+        self._max_metrics = max_metrics
+        self._writable = writable
+        self._header, self._size = layout(tiers, max_metrics)
+        self._names_offset = len(self._header)
+        self._data_offset = self._names_offset + NAME.size * max_metrics
+        self._metric_size = RECORD.size * sum([_[1] for _ in tiers])
+        self._mm = None
+        self._inode = None
+        self._backup = None
+        self._dirty = None
+        self._metrics = {}
+        self._full_until = 0
+
+        if writable:
+            self._prepare(backup)
+        self._open()
+
+    def _prepare(self, backup):
+        if not _valid(self._path, self._header, self._size):
+            if backup is not None and _valid(
+                    backup, self._header, self._size):
+                _logger.info("Restore history from %s" % backup)
+                _create(self._path, self._header, self._size, backup)
+            else:
+                _create(self._path, self._header, self._size)
+        if backup is None:
+            return
+        if not _valid(backup, self._header, self._size):
+            _create(backup, self._header, self._size, self._path)
+        fd = os.open(backup, os.O_RDWR)
+        try:
+            self._backup = mmap.mmap(fd, self._size, mmap.MAP_SHARED,
+                                     mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self._dirty = bytearray((self._size >> PAGE_SHIFT) + 1)
+
+    def _open(self):
+        if not _valid(self._path, self._header, self._size):
+            raise RRDError("Invalid history file: %s" % self._path)
+        flags = os.O_RDWR if self._writable else os.O_RDONLY
+        prot = mmap.PROT_READ | (mmap.PROT_WRITE if self._writable else 0)
+        fd = os.open(self._path, flags)
+        try:
+            self._inode = os.fstat(fd).st_ino
+            self._mm = mmap.mmap(fd, self._size, mmap.MAP_SHARED, prot)
+        finally:
+            os.close(fd)
+        self._metrics = {}
+
+    def _reopen_if_replaced(self):
+        if self._writable:
+            return
+        try:
+            inode = os.stat(self._path).st_ino
+        except OSError:
+            return
+        if inode != self._inode:
+            self._mm.close()
+            self._open()
+
+    def _name(self, index):
+        name = NAME.unpack_from(
+            self._mm, self._names_offset + index * NAME.size)[0]
+        return name.rstrip("\0")
+
+    def _tiers(self, index):
+        offset = self._data_offset + index * self._metric_size
+        tiers = []
+        for step, slots in self.tiers:
+            backed = step * slots > self._sync_interval
+            tiers.append(MappedTier(self._mm, offset, step, slots,
+                                    self._dirty if backed else None))
+            offset += RECORD.size * slots
+        return tiers
+
+    def names(self):
+        self._reopen_if_replaced()
+        metrics = {}
+        for index in xrange(self._max_metrics):
+            name = self._name(index)
+            if not name:
+                continue
+            # slots are reused by the writer, cached tiers are kept only
+            # for a metric still at the same index
+            cached = self._metrics.get(name)
+            metrics[name] = cached if cached and cached[0] == index else \
+                (index, self._tiers(index))
+        self._metrics = metrics
+        return metrics.keys()
+
+    def get(self, metric):
+        cached = self._metrics.get(metric)
+        if cached is None or self._name(cached[0]) != metric:
+            self.names()
+            cached = self._metrics.get(metric)
+        return cached[1] if cached else None
+
+    def _evict(self, timestamp):
+        """Free the slot of an expired metric, return its index."""
+        if timestamp is None or timestamp < self._full_until:
+            return None
+        self.names()
+        name, expires = least_recent(
+            [(name, tiers) for name, (_, tiers) in self._metrics.items()])
+        if timestamp < expires:
+            self._full_until = expires
+            return None
+        _logger.info("Evict history of %s" % name)
+        index = self._metrics.pop(name)[0]
+        # readers drop the metric as soon as its name is cleared
+        NAME.pack_into(self._mm, self._names_offset + index * NAME.size, "")
+        self._mark(self._names_offset + index * NAME.size, NAME.size)
+        return index
+
+    def create(self, metric, timestamp=None):
+        """Allocate records of a new metric, None if the store is full."""
+        if not self._writable:
+            raise RRDError("History is read-only")
+        if len(metric) > NAME.size:
+            _logger.warning("Metric name too long: %s" % metric)
+            return None
+        index = next((_ for _ in xrange(self._max_metrics)
+                      if not self._name(_)), None)
+        if index is None:
+            index = self._evict(timestamp)
+            if index is None:
+                return None
+        offset = self._data_offset + index * self._metric_size
+        self._mm[offset:offset + self._metric_size] = "\0" * self._metric_size
+        self._mark(offset, self._metric_size)
+        # name is written last, readers never see a half-cleared metric
+        NAME.pack_into(
+            self._mm, self._names_offset + index * NAME.size, metric)
+        self._mark(self._names_offset + index * NAME.size, NAME.size)
+        self._metrics[metric] = (index, self._tiers(index))
+        return self._metrics[metric][1]
+
+    def _mark(self, offset, size):
+        if self._dirty is None:
+            return
+        for page in xrange(offset >> PAGE_SHIFT,
+                           ((offset + size - 1) >> PAGE_SHIFT) + 1):
+            self._dirty[page] = 1
+
+    def sync(self):
+        """Copy pages written since last sync to the backup, and msync.
+
+            Return:
+                pages (int): number of copied pages
+        """
+        if self._backup is None:
+            return 0
+        pages = 0
+        page_size = 1 << PAGE_SHIFT
+        for page, dirty in enumerate(self._dirty):
+            if not dirty:
+                continue
+            start = page << PAGE_SHIFT
+            end = min(start + page_size, self._size)
+            self._backup[start:end] = self._mm[start:end]
+            self._dirty[page] = 0
+            pages += 1
+        if pages:
+            self._backup.flush()
+        return pages
+
+    def close(self):
+        if self._backup is not None:
+            self.sync()
+            self._backup.close()
+            self._backup = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
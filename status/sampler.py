@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import logging
+import os
+import socket
+import threading
+
+from collectd import Collectd
+from collectd import CollectdError
+from probes import Backoff
+
+
+_logger = logging.getLogger("sanji.status.sampler")
+
+
+class SamplerError(Exception):
+    pass
+
+
+class Sampler(object):
+    """Interface of cpu and memory usage sampler."""
+
+    def sample(self):
+        """Take a sample.
+
+            Return:
+                sample (dict): usages in percent
+                    {
+                      "cpu_usage": total cpu usage,
+                      "cpu_usages": [usage of each core],
+                      "memory_usage": memory usage
+                    }
+        """
+        raise NotImplementedError
+
+    def sample_cpu(self):
+        """Take a cpu sample.
+
+            Return:
+                sample (dict): "cpu_usage" and "cpu_usages" of sample()
+        """
+        sample = self.sample()
+        return {
+            "cpu_usage": sample["cpu_usage"],
+            "cpu_usages": sample["cpu_usages"]
+        }
+
+    def sample_memory(self):
+        """Take a memory sample.
+
+            Return:
+                memory usage (float): in percent
+        """
+        return self.sample()["memory_usage"]
+
+    def close(self):
+        pass
+
+
+class CollectdSampler(Sampler):
+    """Sampler backed by collectd unixsock plugin.
+
+    The connection is made on the first sample and rebuilt after failures,
+    so a missing or restarted collectd does not stop the daemon. Attempts
+    to reconnect back off exponentially up to max_backoff seconds. Calls
+    are serialized, so probes of cpu and memory may share the sampler.
+    """
+
+    def __init__(self, path=Collectd.UNIX_SOCKET_PATH, memory=None,
+                 timeout=3, max_backoff=60):
+        self._path = path
+        self._memory = memory
+        self._timeout = timeout
+        self._clt = None
+        self._lock = threading.Lock()
+        self.backoff = Backoff(maximum=max_backoff)
+
+    def _connect(self):
+        if not self.backoff.ready():
+            raise SamplerError("collectd: reconnect in %.1fs" %
+                               self.backoff.remaining())
+        try:
+            self._clt = Collectd(path=self._path, timeout=self._timeout)
+        except (socket.error, CollectdError, IndexError) as e:
+            self.backoff.failure()
+            raise SamplerError("collectd: %s" % e)
+        self.backoff.success()
+
+    def _call(self, method, *args):
+        with self._lock:
+            if self._clt is None:
+                self._connect()
+            try:
+                return getattr(self._clt, method)(*args)
+            except (socket.error, CollectdError) as e:
+                self._close()
+                raise SamplerError("collectd: %s" % e)
+
+    def _cpu_sample(self, cpu_usages):
+        cpu_usages = [min(_, 100.0) for _ in cpu_usages]
+        cpu_usage = sum(cpu_usages) / len(cpu_usages) if cpu_usages else 0.0
+        return {
+            "cpu_usage": cpu_usage,
+            "cpu_usages": cpu_usages
+        }
+
+    def sample(self):
+        cpu_usages, mem_usage = self._call("get_usages", self._memory)
+        sample = self._cpu_sample(cpu_usages)
+        sample["memory_usage"] = min(mem_usage, 100.0)
+        return sample
+
+    def sample_cpu(self):
+        return self._cpu_sample(self._call("get_cpu_usages"))
+
+    def sample_memory(self):
+        return min(self._call("get_mem_usage", self._memory), 100.0)
+
+    def _close(self):
+        if self._clt is not None:
+            self._clt.close()
+            self._clt = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+def _cpu_percent(prev, curr):
+    """Calculate cpu usage from two /proc/stat tick tuples."""
+    total = sum(curr) - sum(prev)
+    if total <= 0:
+        return 0.0
+    # idle + iowait
+    idle = (curr[3] + curr[4]) - (prev[3] + prev[4])
+    return min(max((total - idle) * 100.0 / total, 0.0), 100.0)
+
+
+class ProcSampler(Sampler):
+    """Sampler reading /proc/stat and /proc/meminfo directly.
+
+    CPU usages are calculated from the tick deltas between two samples,
+    the first sample reports usages since boot.
+    """
+
+    # user nice system idle iowait irq softirq steal (guest is in user)
+    CPU_FIELDS = 8
+
+    def __init__(self, proc="/proc"):
+        self._stat = open(os.path.join(proc, "stat"), "r")
+        self._meminfo = open(os.path.join(proc, "meminfo"), "r")
+        self._ticks = {}
+
+    def _read(self, f):
+        f.seek(0)
+        return f.read()
+
+    def read_ticks(self):
+        """Read cpu ticks from /proc/stat.
+
+            Return:
+                ticks (dict): "cpu" for total and "cpuN" for each core
+        """
+        ticks = {}
+        for line in self._read(self._stat).splitlines():
+            if not line.startswith("cpu"):
+                continue
+            fields = line.split()
+            ticks[fields[0]] = tuple(
+                [int(_) for _ in fields[1:self.CPU_FIELDS + 1]] +
+                [0] * (self.CPU_FIELDS + 1 - len(fields)))
+        return ticks
+
+    def read_meminfo(self):
+        """Read /proc/meminfo.
+
+            Return:
+                meminfo (dict): field name to size in bytes
+        """
+        meminfo = {}
+        for line in self._read(self._meminfo).splitlines():
+            name, _, value = line.partition(":")
+            value = value.split()
+            if not value:
+                continue
+            meminfo[name] = int(value[0]) * (1024 if len(value) > 1 else 1)
+        return meminfo
+
+    def get_memory_usage(self):
+        meminfo = self.read_meminfo()
+        total = meminfo.get("MemTotal", 0)
+        if total <= 0:
+            return 0.0
+        available = meminfo.get("MemAvailable")
+        if available is None:
+            available = (meminfo.get("MemFree", 0) +
+                         meminfo.get("Buffers", 0) +
+                         meminfo.get("Cached", 0))
+        return (total - available) * 100.0 / total
+
+    def sample(self):
+        sample = self.sample_cpu()
+        sample["memory_usage"] = self.sample_memory()
+        return sample
+
+    def sample_cpu(self):
+        try:
+            ticks = self.read_ticks()
+        except (IOError, ValueError) as e:
+            raise SamplerError("proc: %s" % e)
+
+        zero = (0,) * self.CPU_FIELDS
+        usages = {}
+        for name, curr in ticks.iteritems():
+            usages[name] = _cpu_percent(self._ticks.get(name, zero), curr)
+        self._ticks = ticks
+
+        cores = sorted([_ for _ in usages if _ != "cpu"],
+                       key=lambda x: int(x[3:]))
+        return {
+            "cpu_usage": usages.get("cpu", 0.0),
+            "cpu_usages": [usages[_] for _ in cores]
+        }
+
+    def sample_memory(self):
+        try:
+            return self.get_memory_usage()
+        except (IOError, ValueError) as e:
+            raise SamplerError("proc: %s" % e)
+
+    def close(self):
+        self._stat.close()
+        self._meminfo.close()
+
+
+SAMPLERS = {
+    "collectd": CollectdSampler,
+    "native": ProcSampler
+}
+
+
+def create_sampler(name, **kwargs):
+    """Create sampler by backend name ("collectd" or "native")."""
+    if name not in SAMPLERS:
+        raise SamplerError("Unknown sampler: %s" % name)
+    return SAMPLERS[name](**kwargs)
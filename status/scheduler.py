@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import ctypes
+import logging
+import os
+import time
+
+
+_logger = logging.getLogger("sanji.status.scheduler")
+
+
+try:
+    from time import monotonic
+except ImportError:
+    CLOCK_MONOTONIC = 1
+
+    class _timespec(ctypes.Structure):
+        _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+    _libc = ctypes.CDLL(None, use_errno=True)
+    _clock_gettime = _libc.clock_gettime
+    _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+
+    def monotonic():
+        """Monotonic clock in seconds (CLOCK_MONOTONIC)."""
+        ts = _timespec()
+        if _clock_gettime(CLOCK_MONOTONIC, ctypes.byref(ts)) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return ts.tv_sec + ts.tv_nsec * 1e-9
+
+
+class Job(object):
+
+    def __init__(self, name, interval, func, max_catchup, start):
+        self.name = name
+        self.interval = float(interval)
+        self.func = func
+        self.max_catchup = max_catchup
+        self.deadline = start
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.jitter_last = 0.0
+        self.jitter_max = 0.0
+        self.jitter_sum = 0.0
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "jitterLast": self.jitter_last,
+            "jitterMax": self.jitter_max,
+            "jitterAvg": self.jitter_sum / self.runs if self.runs else 0.0
+        }
+
+
+class Scheduler(object):
+    """Multi-rate scheduler on the monotonic clock.
+
+    Deadlines of a job stay on its own grid (start + n * interval), so the
+    period does not drift by the time spent in the jobs. Ticks missed by a
+    slow job run back to back, up to max_catchup of them, and the rest are
+    counted as skipped. Lateness of every run is recorded as jitter.
+    after_tick is called after each round of due jobs.
+    """
+
+    def __init__(self, clock=monotonic, sleep=time.sleep, after_tick=None):
+        self._clock = clock
+        self._sleep = sleep
+        self._after_tick = after_tick
+        self._jobs = []
+        self._running = False
+
+    def add(self, name, interval, func, max_catchup=3, delay=0):
+        """Add a job.
+
+            Args:
+                name (str): job name
+                interval (float): interval in seconds
+                func (callable): job without arguments
+                max_catchup (int): max missed ticks to run back to back
+                delay (float): delay of the first run
+        """
+        job = Job(name, interval, func, max_catchup, self._clock() + delay)
+        self._jobs.append(job)
+        return job
+
+    def next_deadline(self):
+        if not self._jobs:
+            return None
+        return min([_.deadline for _ in self._jobs])
+
+    def _run_job(self, job, now):
+        missed = int((now - job.deadline) / job.interval)
+        if missed >= job.max_catchup:
+            job.skipped += missed - job.max_catchup + 1
+            job.deadline += (missed - job.max_catchup + 1) * job.interval
+
+        while job.deadline <= now:
+            jitter = self._clock() - job.deadline
+            job.jitter_last = jitter
+            job.jitter_max = max(job.jitter_max, jitter)
+            job.jitter_sum += jitter
+            job.runs += 1
+            job.deadline += job.interval
+            try:
+                job.func()
+            except Exception as e:
+                job.errors += 1
+                _logger.error("Job %s failed: %s" % (job.name, e),
+                              exc_info=True)
+
+    def run_pending(self):
+        """Run jobs whose deadline has passed."""
+        now = self._clock()
+        due = [_ for _ in self._jobs if _.deadline <= now]
+        for job in sorted(due, key=lambda x: x.deadline):
+            self._run_job(job, now)
+        if due and self._after_tick is not None:
+            self._after_tick()
+
+    def run(self):
+        """Run jobs until stop() is called."""
+        self._running = True
+        while self._running:
+            self.run_pending()
+            deadline = self.next_deadline()
+            if deadline is None:
+                break
+            delay = deadline - self._clock()
+            if delay > 0:
+                self._sleep(delay)
+
+    def stop(self):
+        self._running = False
+
+    def stats(self):
+        """Get statistics of each job.
+
+            Return:
+                stats (dict): job name to runs, skipped ticks, errors and
+                    jitter (seconds)
+        """
+        return dict([(_.name, _.stats()) for _ in self._jobs])
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+
+_logger = logging.getLogger("sanji.status.snapshot")
+
+SNAPSHOT_PATH = "/run/mxsysstatus/status.snapshot"
+
+# magic, format version, sequence, timestamp, payload length
+HEADER = struct.Struct("<4sIIdI")
+MAGIC = "MXSS"
+FORMAT_VERSION = 1
+SIZE = 64 * 1024
+SEQ_OFFSET = 8
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class SnapshotWriter(object):
+    """Write metrics snapshots into a memory-mapped file.
+
+    The file is guarded by a sequence lock: the sequence is odd while the
+    payload is being written, and is bumped to the next even number when
+    done. Only one writer (mxsysstatusd) is expected.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, size=SIZE):
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size, mmap.MAP_SHARED,
+                                 mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self._size = size
+
+        # continue the sequence of the previous writer, so readers do not
+        # take the new payload as their cached one
+        magic, _, seq, _, _ = HEADER.unpack_from(self._mm, 0)
+        self._seq = (seq + (seq & 1)) if magic == MAGIC else 0
+
+    def write(self, data, timestamp=None, optional=()):
+        """Write a snapshot.
+
+            Args:
+                data (dict): json serializable metrics
+                timestamp (float): time of the snapshot, default time.time()
+                optional (list): keys dropped in order while the payload
+                    is too large
+
+            Return:
+                dropped (list): keys left out of the snapshot
+
+            Raises:
+                SnapshotError: payload is too large, the previous
+                    snapshot is kept
+        """
+        dropped = []
+        payload = json.dumps(data, separators=(",", ":"))
+        for key in optional:
+            if HEADER.size + len(payload) <= self._size:
+                break
+            if key not in data:
+                continue
+            dropped.append(key)
+            payload = json.dumps(
+                dict([_ for _ in data.items() if _[0] not in dropped]),
+                separators=(",", ":"))
+        if HEADER.size + len(payload) > self._size:
+            raise SnapshotError("Snapshot too large: %d" % len(payload))
+        timestamp = time.time() if timestamp is None else timestamp
+
+        self._seq = (self._seq + 1) & 0xffffffff
+        HEADER.pack_into(self._mm, 0, MAGIC, FORMAT_VERSION, self._seq,
+                         timestamp, len(payload))
+        self._mm[HEADER.size:HEADER.size + len(payload)] = payload
+        # the even sequence is stored last, once everything else is in
+        self._seq = (self._seq + 1) & 0xffffffff
+        struct.pack_into("<I", self._mm, SEQ_OFFSET, self._seq)
+        return dropped
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class SnapshotReader(object):
+    """Read metrics snapshots without locking the writer.
+
+    The file is mapped on first use. A read retries while the writer is in
+    the middle of an update, and the decoded snapshot is cached by its
+    sequence, so the payload is only copied and parsed once per update.
+    """
+
+    RETRIES = 10
+
+    def __init__(self, path=SNAPSHOT_PATH, max_age=10):
+        self._path = path
+        self._max_age = max_age
+        self._mm = None
+        self._seq = None
+        self._cache = None
+        self._timestamp = 0
+
+    def _open(self):
+        try:
+            with open(self._path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, mmap.MAP_SHARED,
+                                     mmap.PROT_READ)
+        except (IOError, OSError, ValueError):
+            self._mm = None
+        return self._mm
+
+    def read(self):
+        """Read the latest snapshot.
+
+            Return:
+                snapshot (dict): None if there is no fresh snapshot
+        """
+        if self._mm is None and self._open() is None:
+            return None
+
+        for _ in range(self.RETRIES):
+            magic, _, seq, timestamp, length = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                return None
+            if seq & 1:
+                continue
+            if seq != self._seq:
+                payload = self._mm[HEADER.size:HEADER.size + length]
+                if struct.unpack_from("<I", self._mm, SEQ_OFFSET)[0] != seq:
+                    continue
+                try:
+                    self._cache = json.loads(payload)
+                except ValueError:
+                    continue
+                self._seq = seq
+                self._timestamp = timestamp
+            break
+        else:
+            _logger.debug("Snapshot is busy")
+
+        if self._cache is None:
+            return None
+        if self._max_age and time.time() - self._timestamp > self._max_age:
+            return None
+        return self._cache
+
+    def get(self, key, default=None):
+        snapshot = self.read()
+        if snapshot is None or key not in snapshot:
+            return default
+        return snapshot[key]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
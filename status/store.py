@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import json
+import logging
+import threading
+
+from system import atomic_write
+
+
+_logger = logging.getLogger("sanji.status.store")
+
+
+class WriteBehindStore(object):
+    """Write-behind persistence of a sanji ModelInitiator database.
+
+    Updates are applied to the in-memory database at once, so reads see
+    them immediately, and the file is written later: every update within
+    delay seconds of the first pending one is coalesced into a single
+    atomic, fsync'd write. A delay of 0 writes on every update.
+    """
+
+    def __init__(self, model, delay=0.5):
+        self.model = model
+        self.delay = delay
+        self.writes = 0
+        self._lock = model.db_mutex
+        self._dirty = False
+        self._timer = None
+
+    @property
+    def db(self):
+        return self.model.db
+
+    def update(self, values):
+        """Update keys of the database and schedule a write.
+
+            Args:
+                values (dict): new values by key
+        """
+        with self._lock:
+            self.model.db.update(values)
+            self._dirty = True
+            if self.delay <= 0:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.delay, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write pending updates to the database file.
+
+            Return:
+                written (bool): False if there was nothing to write
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return False
+            data = json.dumps(self.model.db, indent=4)
+            atomic_write(self.model.json_db_path, data)
+            self._dirty = False
+            self.writes += 1
+            return True
+
+    def _flush(self):
+        try:
+            self.flush()
+        except Exception:
+            _logger.exception("Failed to write %s" % self.model.json_db_path)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+
+_libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+_libc.sethostname.argtypes = [ctypes.c_char_p, ctypes.c_size_t]
+
+# same lock file as lckpwdf(3), shared with passwd/usermod
+PWD_LOCK = "etc/.pwd.lock"
+
+_shadow_lock = threading.Lock()
+
+
+def sethostname(hostname):
+    """Set the kernel hostname with sethostname(2)."""
+    if isinstance(hostname, unicode):
+        hostname = hostname.encode("utf-8")
+    if _libc.sethostname(hostname, len(hostname)) != 0:
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+
+
+def fsync_dir(path):
+    """Flush a directory, so a rename in it survives a power failure."""
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data):
+    """Replace a file by writing a temporary file and renaming it, the
+    mode and owner of the original file are kept. The file and its
+    directory are synced, so either content is found after a power
+    failure."""
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+    try:
+        try:
+            st = os.stat(path)
+            os.fchmod(fd, st.st_mode & 07777)
+            os.fchown(fd, st.st_uid, st.st_gid)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        os.write(fd, data)
+        os.fsync(fd)
+    except Exception:
+        os.close(fd)
+        os.unlink(tmp)
+        raise
+    os.close(fd)
+    os.rename(tmp, path)
+    fsync_dir(os.path.dirname(path))
+
+
+# names of the loopback addresses, never renamed
+RESERVED_HOSTS = re.compile(r"^(localhost(\.localdomain)?|ip6-.*)$")
+
+
+def _alias(hostname):
+    return re.compile(r"(?<=\s)%s(?=\s|$)" % re.escape(hostname))
+
+
+def _split_hosts_line(line):
+    body = line.rstrip("\r\n")
+    content, sep, comment = body.partition("#")
+    fields = content.split()
+    return fields[0] if fields else None, content, sep + comment, \
+        line[len(body):]
+
+
+def update_hosts(text, old, new):
+    """Rename a host in the content of /etc/hosts.
+
+    Every alias equal to old is renamed, comments and layout are kept.
+    The names of the loopback addresses (localhost, ip6-*) are never
+    renamed: if old is one of them, or is not found, new is added as an
+    alias of 127.0.1.1 (or 127.0.0.1) unless it is already there.
+    """
+    lines = text.splitlines(True)
+    if old and not RESERVED_HOSTS.match(old):
+        pattern = _alias(old)
+        renamed = False
+        for index, line in enumerate(lines):
+            _, content, comment, eol = _split_hosts_line(line)
+            if pattern.search(content) is None:
+                continue
+            renamed = True
+            lines[index] = pattern.sub(new, content) + comment + eol
+        if renamed:
+            return "".join(lines)
+
+    pattern = _alias(new)
+    addresses = []
+    for line in lines:
+        address, content, _, _ = _split_hosts_line(line)
+        if pattern.search(content) is not None:
+            return text
+        addresses.append(address)
+
+    for address in ("127.0.1.1", "127.0.0.1"):
+        if address not in addresses:
+            continue
+        index = addresses.index(address)
+        _, content, comment, eol = _split_hosts_line(lines[index])
+        lines[index] = "%s %s%s%s%s" % (
+            content.rstrip(), new, " " if comment else "", comment, eol)
+        return "".join(lines)
+
+    if lines and not lines[-1].endswith("\n"):
+        lines.append("\n")
+    lines.append("127.0.0.1       localhost {}\n".format(new))
+    return "".join(lines)
+
+
+@contextmanager
+def pwd_lock(root="/"):
+    """Lock the password files against passwd/usermod and other threads."""
+    with _shadow_lock:
+        fd = os.open(os.path.join(root, PWD_LOCK),
+                     os.O_WRONLY | os.O_CREAT, 0600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+
+def read_shadow(shadow_file):
+    """Parse /etc/shadow.
+
+        Return:
+            entries (list): fields of each line
+    """
+    with open(shadow_file, "r") as f:
+        return [_.rstrip("\n").split(":") for _ in f if _.strip()]
+
+
+def get_shadow_password(username, shadow_file):
+    for fields in read_shadow(shadow_file):
+        if fields[0] == username and len(fields) > 1:
+            return fields[1]
+    return None
+
+
+def set_shadow_password(username, hashed_password, shadow_file, root="/"):
+    """Replace the password hash of a user in /etc/shadow atomically.
+
+        Raises:
+            KeyError: no such user
+    """
+    with pwd_lock(root):
+        entries = read_shadow(shadow_file)
+        for fields in entries:
+            if fields[0] == username and len(fields) > 1:
+                fields[1] = hashed_password
+                break
+        else:
+            raise KeyError("No such user: %s" % username)
+        atomic_write(shadow_file,
+                     "".join([":".join(_) + "\n" for _ in entries]))
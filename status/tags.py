@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import json
+import logging
+import os
+import re
+
+from rollstat import stat_tag_names, STAT_DESCRIPTIONS
+from netdev import interface_tag_names
+from system import atomic_write
+
+
+_logger = logging.getLogger("sanji.status.tags")
+
+# catalog written by mxsysstatusd, served by the status bundle
+TAGS_PATH = "/run/mxsysstatus/tags.json"
+EQUIPMENT = "SYSTEM"
+
+# metric tags, each also has statistic tags (see rollstat)
+METRICS = [
+    ("cpu_usage", "CPU Usage"),
+    ("memory_usage", "Memory Usage"),
+    ("disk_usage", "Disk Usage")
+]
+
+
+def _tag(name, description, data_type="float64"):
+    return {
+        "name": name,
+        "dataType": data_type,
+        "access": "ro",
+        "size": 8,
+        "description": description
+    }
+
+
+def core_tag_name(index):
+    return "cpu_%d_usage" % index
+
+
+def disk_tag_name(alias):
+    return "disk_%s_usage" % re.sub(
+        r"[^0-9a-z]+", "_", alias.lower()).strip("_")
+
+
+def build_tags(cpus=0, disks=(), interfaces=()):
+    """Get the SYSTEM tags of a host.
+
+        Args:
+            cpus (int): number of cores
+            disks (list): disk keys, see disks.disk_usages
+            interfaces (list): network interfaces
+
+        Return:
+            tags (list): equipment tags
+    """
+    tags = [_tag(name, description) for name, description in METRICS]
+    for metric, description in METRICS:
+        for name, stat, window in stat_tag_names(metric):
+            tags.append(_tag(name, "%s (%s, %s)" % (
+                description, STAT_DESCRIPTIONS[stat], window)))
+    for index in range(cpus):
+        tags.append(_tag(core_tag_name(index), "CPU %d Usage" % index))
+    for alias in disks:
+        tags.append(_tag(disk_tag_name(alias), "Disk Usage (%s)" % alias))
+    for iface in interfaces:
+        for name, key, description in interface_tag_names(iface):
+            tags.append(_tag(name, description, "float64"
+                             if key.endswith("Rate") else "uint64"))
+    return tags
+
+
+class TagCatalog(object):
+    """SYSTEM tags of the host, rebuilt when the hardware changes.
+
+    mxsysstatusd updates the catalog from what it samples, publishes only
+    the tags it lists and saves it as the serialized equipments response;
+    the status bundle serves that file (see TagCatalogFile). The
+    equipments response is built once per change of the catalog.
+    """
+
+    def __init__(self):
+        self.tags = []
+        self.names = frozenset()
+        self._key = None
+        self._equipments = None
+
+    def update(self, cpus=0, disks=(), interfaces=()):
+        """Rebuild the catalog if the cores, disks or interfaces changed.
+
+            Return:
+                changed (bool)
+        """
+        key = (cpus, tuple(sorted(disks)), tuple(sorted(interfaces)))
+        if key == self._key:
+            return False
+        self._key = key
+        self.tags = build_tags(*key)
+        self.names = frozenset([_["name"] for _ in self.tags])
+        self._equipments = None
+        return True
+
+    def equipments(self):
+        if self._equipments is None:
+            self._equipments = [
+                {"equipmentName": EQUIPMENT, "equipmentTags": self.tags}]
+        return self._equipments
+
+    def save(self, path=TAGS_PATH):
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        atomic_write(path, json.dumps(self.equipments(),
+                                      separators=(",", ":")))
+
+
+class TagCatalogFile(object):
+    """Equipments response saved by mxsysstatusd.
+
+    The file is parsed again only when it is replaced, every other load
+    returns the same response.
+    """
+
+    def __init__(self, path=TAGS_PATH):
+        self._path = path
+        self._stat = None
+        self._equipments = None
+
+    def load(self):
+        """Load the catalog.
+
+            Return:
+                equipments (list): None if there is no catalog
+        """
+        try:
+            st = os.stat(self._path)
+        except OSError:
+            return None
+        stat = (st.st_ino, st.st_mtime, st.st_size)
+        if stat != self._stat:
+            try:
+                with open(self._path, "r") as f:
+                    self._equipments = json.load(f)
+            except (IOError, ValueError) as e:
+                _logger.warning("Cannot load %s: %s" % (self._path, e))
+                return None
+            self._stat = stat
+        return self._equipments
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import copy
+import threading
+import time
+
+
+class VersionError(ValueError):
+    pass
+
+
+def parse_version(message):
+    """Get the version a client already has from a request.
+
+    The version is given by the "since" query parameter or, like an HTTP
+    conditional request, by an If-None-Match header with the ETag of a
+    previous response.
+
+        Return:
+            version (int): None if the request is not conditional
+    """
+    query = getattr(message, "query", None) or {}
+    headers = getattr(message, "headers", None) or {}
+    value = query.get("since")
+    if value is None:
+        value = headers.get("If-None-Match")
+        if value is not None:
+            value = value.strip()
+            if value.startswith("W/"):
+                value = value[2:]
+            value = value.strip('"')
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise VersionError("Invalid version: %s" % value)
+
+
+def etag(version):
+    return '"%d"' % version
+
+
+class VersionTracker(object):
+    """Version of each key of a resource.
+
+    update() compares the values of keys with the values seen before, the
+    version of the resource is increased on each change and each key
+    remembers the version of its last change, so changed(since) lists the
+    keys a client which has version "since" has to fetch again.
+
+    Versions start from the time in milliseconds, so they keep increasing
+    after a restart; a version from before the restart is older than every
+    key, which are all reported as changed.
+    """
+
+    def __init__(self, clock=time.time):
+        self.version = int(clock() * 1000)
+        self._values = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def update(self, values):
+        """Record the current values of keys.
+
+            Args:
+                values (dict): value by key
+
+            Return:
+                version (int): version of the resource
+        """
+        with self._lock:
+            for key, value in values.iteritems():
+                if key in self._values and self._values[key] == value:
+                    continue
+                self.version += 1
+                self._values[key] = copy.deepcopy(value)
+                self._versions[key] = self.version
+            return self.version
+
+    def changed(self, since, keys=None):
+        """Keys changed after version since.
+
+            Args:
+                since (int): version a client has
+                keys (list): only check these keys, default all keys
+        """
+        with self._lock:
+            if keys is None:
+                keys = self._versions.keys()
+            return [_ for _ in keys if self._versions.get(_, 0) > since]
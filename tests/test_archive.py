@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import cgi
+import gzip
+import json
+import shutil
+import tarfile
+import tempfile
+import threading
+import unittest
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from StringIO import StringIO
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.archive import walk, tar_stream, gzip_stream, upload
+    from status.archive import parallel_gzip_stream
+    from status.archive import SyslogArchive, SyslogState
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def _read_chunked(self):
+        body = []
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                break
+            body.append(self.rfile.read(size))
+            self.rfile.readline()
+        return "".join(body)
+
+    def do_POST(self):
+        self.server.headers = dict(self.headers.items())
+        body = self._read_chunked()
+        ctype, pdict = cgi.parse_header(self.headers["content-type"])
+        self.server.files = cgi.parse_multipart(StringIO(body), pdict)
+        payload = json.dumps({"url": "http://localhost/download/1"})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class TestArchiveClass(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.log = os.path.join(self.tmpdir, "log")
+        os.makedirs(os.path.join(self.log, "nginx"))
+        with open(os.path.join(self.log, "messages"), "w") as f:
+            f.write("boot\n" * 1000)
+        with open(os.path.join(self.log, "nginx", "access.log"), "w") as f:
+            f.write("GET /\n")
+        os.symlink("messages", os.path.join(self.log, "syslog"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def extract(self, data):
+        tar = tarfile.open(fileobj=StringIO(data), mode="r:gz")
+        return dict([(_.name, _) for _ in tar.getmembers()]), tar
+
+    def test__walk(self):
+        """
+        walk: arcname is relative to the parent of the path
+        """
+        self.assertEqual(
+            ["log", "log/nginx", "log/messages", "log/syslog",
+             "log/nginx/access.log"],
+            [_[1] for _ in walk([self.log, "/nonexistent"])])
+
+    def test__gzip_stream(self):
+        """
+        gzip_stream: tar.gz readable by tarfile
+        """
+        data = "".join(gzip_stream(
+            tar_stream(walk([self.log]), chunk_size=100), level=1))
+        members, tar = self.extract(data)
+        self.assertEqual("boot\n" * 1000,
+                         tar.extractfile(members["log/messages"]).read())
+        self.assertTrue(members["log/nginx"].isdir())
+        self.assertEqual("messages", members["log/syslog"].linkname)
+
+    def test__tar_stream__bounded(self):
+        """
+        tar_stream: no chunk larger than chunk_size
+        """
+        chunks = list(tar_stream(walk([self.log]), chunk_size=100))
+        self.assertTrue(max([len(_) for _ in chunks]) <= 1024)
+        self.assertEqual(0, sum([len(_) for _ in chunks]) % 512)
+
+    def test__tar_stream__truncated(self):
+        """
+        tar_stream: file truncated while packing keeps its header size
+        """
+        path = os.path.join(self.log, "messages")
+        stream = tar_stream([(path, "messages")], chunk_size=100)
+        header = next(stream)
+        first = next(stream)
+        open(path, "w").close()
+        data = header + first + "".join(stream)
+        tar = tarfile.open(fileobj=StringIO(data), mode="r:")
+        content = tar.extractfile("messages").read()
+        self.assertEqual(5000, len(content))
+        self.assertEqual("boot\n" * 20, content[:100])
+
+    def test__upload(self):
+        """
+        upload: chunked multipart upload to a local server
+        """
+        server = HTTPServer(("127.0.0.1", 0), UploadHandler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        r = upload("http://127.0.0.1:%d/upload" % server.server_port,
+                   "syslog.tar.gz", gzip_stream(tar_stream(walk([self.log]))),
+                   headers={"xxx": "yyy"})
+        thread.join()
+        server.server_close()
+
+        self.assertEqual(200, r.status_code)
+        self.assertEqual("http://localhost/download/1", r.json()["url"])
+        self.assertEqual("chunked", server.headers["transfer-encoding"])
+        self.assertEqual("yyy", server.headers["xxx"])
+        members, tar = self.extract(server.files["file"][0])
+        self.assertEqual("GET /\n", tar.extractfile(
+            members["log/nginx/access.log"]).read())
+
+    def test__parallel_gzip_stream(self):
+        """
+        parallel_gzip_stream: concatenated members are one gzip stream
+        """
+        chunks = ["%06d\n" % _ for _ in range(10000)]
+        data = "".join(parallel_gzip_stream(
+            iter(chunks), level=1, workers=3, block_size=1000))
+        self.assertEqual("".join(chunks),
+                         gzip.GzipFile(fileobj=StringIO(data)).read())
+        self.assertEqual(
+            "", gzip.GzipFile(fileobj=StringIO("".join(
+                parallel_gzip_stream(iter([]))))).read())
+
+    def test__archive__globs(self):
+        """
+        SyslogArchive: only files matching globs
+        """
+        archive = SyslogArchive([self.log], globs=["nginx/*"])
+        members, _ = self.extract("".join(archive.chunks()))
+        self.assertEqual(["log/nginx/access.log"], members.keys())
+        self.assertEqual(1, archive.stats()["files"])
+
+    def test__archive__time_range(self):
+        """
+        SyslogArchive: only files modified in the time range
+        """
+        os.utime(os.path.join(self.log, "messages"), (1000, 1000))
+        archive = SyslogArchive([self.log], start=2000)
+        members, _ = self.extract("".join(archive.chunks()))
+        self.assertEqual(["log/nginx/access.log"], members.keys())
+        archive = SyslogArchive([self.log], start=500, end=1500)
+        members, _ = self.extract("".join(archive.chunks()))
+        self.assertEqual(["log/messages"], members.keys())
+
+    def test__archive__since_last_upload(self):
+        """
+        SyslogArchive: only data appended since the last upload
+        """
+        state_path = os.path.join(self.tmpdir, "syslog.state")
+        messages = os.path.join(self.log, "messages")
+        archive = SyslogArchive([self.log], state=SyslogState(state_path))
+        self.assertEqual(2, len(self.extract("".join(archive.chunks()))[0]))
+
+        # not committed, everything is shipped again
+        archive = SyslogArchive([self.log], state=SyslogState(state_path))
+        "".join(archive.chunks())
+        archive.commit()
+
+        with open(messages, "a") as f:
+            f.write("login\n")
+        # rotated by rename, still the same inode
+        os.rename(messages, messages + ".1")
+        archive = SyslogArchive([self.log], state=SyslogState(state_path),
+                                workers=2)
+        members, tar = self.extract("".join(archive.chunks()))
+        self.assertEqual(["log/messages.1"], members.keys())
+        self.assertEqual("login\n", tar.extractfile("log/messages.1").read())
+        archive.commit()
+
+        archive = SyslogArchive([self.log], state=SyslogState(state_path))
+        "".join(archive.chunks())
+        self.assertEqual(0, archive.stats()["files"])
+
+    def test__archive__stats(self):
+        """
+        SyslogArchive: ratio and time
+        """
+        archive = SyslogArchive([self.log], level=9)
+        data = "".join(archive.chunks())
+        stats = archive.stats()
+        self.assertEqual(len(data), stats["compressedBytes"])
+        self.assertTrue(stats["ratio"] < 0.5)
+        self.assertTrue(stats["seconds"] >= 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import time
+import threading
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.batch import BatchReader
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestBatchReaderClass(unittest.TestCase):
+
+    def setUp(self):
+        self.reader = BatchReader(workers=3)
+
+    def tearDown(self):
+        self.reader.close()
+
+    def test__run(self):
+        """
+        run: results in order of the reads, run concurrently
+        """
+        started = []
+        running = threading.Event()
+
+        def read(index):
+            def _read():
+                started.append(index)
+                if len(started) == 3:
+                    running.set()
+                # all reads run at the same time, or they time out
+                running.wait(1)
+                return 200 if running.is_set() else 504, index
+            return _read
+
+        self.assertEqual([(200, 0), (200, 1), (200, 2)],
+                         self.reader.run([read(_) for _ in range(3)], 2))
+
+    def test__run__error(self):
+        """
+        run: failed read is reported with 500
+        """
+        def fail():
+            raise IOError("no such file")
+
+        results = self.reader.run([fail, lambda: (200, "ok")])
+        self.assertEqual(500, results[0][0])
+        self.assertEqual((200, "ok"), results[1])
+
+    def test__run__timeout(self):
+        """
+        run: read not answered before the timeout is reported with 504
+        """
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def hang():
+            release.wait(5)
+            return 200, "late"
+
+        start = time.time()
+        results = self.reader.run([hang, lambda: (200, "ok")], 0.2)
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(504, results[0][0])
+        self.assertEqual((200, "ok"), results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import threading
+import unittest
+from mock import Mock
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.cache import FieldCache
+    from helpers import FakeClock
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestFieldCacheClass(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = FieldCache(
+            ttls={"cpuUsage": 1, "memory": 60}, max_stale=10,
+            clock=self.clock)
+
+    def test__get__hit(self):
+        """
+        get: reuse value within ttl
+        """
+        loader = Mock(return_value=12.5)
+        self.assertEqual(12.5, self.cache.get("cpuUsage", loader))
+        self.clock.now += 0.5
+        self.assertEqual(12.5, self.cache.get("cpuUsage", loader))
+        self.assertEqual(1, loader.call_count)
+
+        stats = self.cache.stats()["cpuUsage"]
+        self.assertEqual(1, stats["miss"])
+        self.assertEqual(1, stats["hit"])
+        self.assertEqual(1, stats["ttl"])
+
+    def test__get__stale_while_revalidate(self):
+        """
+        get: serve stale value and refresh it in background
+        """
+        release = threading.Event()
+        values = [1.0, 2.0]
+
+        def loader():
+            value = values.pop(0)
+            if not values:
+                release.wait()
+            return value
+
+        self.assertEqual(1.0, self.cache.get("cpuUsage", loader))
+        self.clock.now += 2
+        self.assertEqual(1.0, self.cache.get("cpuUsage", loader))
+        self.assertEqual(1.0, self.cache.get("cpuUsage", loader))
+        release.set()
+
+        for _ in range(100):
+            if self.cache._entries["cpuUsage"].flight is None:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(2.0, self.cache.get("cpuUsage", loader))
+        self.assertEqual(2, self.cache.stats()["cpuUsage"]["stale"])
+
+    def test__get__expired(self):
+        """
+        get: value older than ttl + max_stale is collected again
+        """
+        loader = Mock(side_effect=[1.0, 2.0])
+        self.cache.get("cpuUsage", loader)
+        self.clock.now += 20
+        self.assertEqual(2.0, self.cache.get("cpuUsage", loader))
+        self.assertEqual(2, self.cache.stats()["cpuUsage"]["miss"])
+
+    def test__get__single_flight(self):
+        """
+        get: concurrent requests wait for one collection
+        """
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait()
+            return 42
+
+        results = []
+
+        def request():
+            results.append(self.cache.get("memory", loader))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for _ in range(100):
+            stats = self.cache.stats()["memory"]
+            if stats["miss"] + stats["wait"] == 5:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([42] * 5, results)
+        self.assertEqual(1, len(calls))
+        self.assertEqual(4, self.cache.stats()["memory"]["wait"])
+
+    def test__get__error(self):
+        """
+        get: collection error is raised and not cached
+        """
+        loader = Mock(side_effect=[IOError("busy"), 3])
+        with self.assertRaises(IOError):
+            self.cache.get("memory", loader)
+        self.assertEqual(3, self.cache.get("memory", loader))
+        self.assertEqual(1, self.cache.stats()["memory"]["error"])
+
+    def test__invalidate(self):
+        """
+        invalidate: collect again on next request
+        """
+        loader = Mock(side_effect=["moxa", "test"])
+        self.cache.get("hostname", loader)
+        self.cache.invalidate("hostname")
+        self.assertEqual("test", self.cache.get("hostname", loader))
+
+    def test__invalidate__key(self):
+        """
+        invalidate: also the filtered entries of the field
+        """
+        loader = Mock(side_effect=[[1], [2]])
+        self.cache.get("disks", loader, key="disks?mount=/")
+        self.cache.invalidate("disks")
+        self.assertEqual([2], self.cache.get(
+            "disks", loader, key="disks?mount=/"))
+        self.assertEqual(2, self.cache.stats()["disks"]["miss"])
+
+    def test__ttl__default(self):
+        """
+        ttl: field without ttl uses default_ttl
+        """
+        self.assertEqual(1.0, self.cache.ttl("disks"))
+        self.assertEqual(60, self.cache.ttl("memory"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from mock import Mock
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.collectd import Collectd
+    from status.collectd import CollectdError
+    from status.collectd import parse_values
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+FAKE_VALUES = {
+    "moxa/cpu-0/cpu-user": 10.0,
+    "moxa/cpu-0/cpu-system": 5.0,
+    "moxa/cpu-1/cpu-user": 30.0,
+    "moxa/cpu-1/cpu-system": 15.0,
+    "moxa/memory/memory-used": 256.0
+}
+
+
+class FakeCollectd(object):
+    """Fake collectd unixsock server."""
+
+    def __init__(self, path, values):
+        self.path = path
+        self.values = values
+        self.commands = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(1)
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        conn, _ = self.server.accept()
+        buf = ""
+        try:
+            while True:
+                data = conn.recv(4096)
+                if not data:
+                    break
+                buf += data
+                reply = []
+                while "\n" in buf:
+                    command, buf = buf.split("\n", 1)
+                    self.commands.append(command)
+                    reply.append(self.handle(command))
+                conn.sendall("".join(reply))
+        except socket.error:
+            pass
+        conn.close()
+
+    def handle(self, command):
+        if command == "LISTVAL":
+            lines = ["1517000000.000 %s" % _ for _ in sorted(self.values)]
+            return "%d Values found\n%s\n" % (len(lines), "\n".join(lines))
+        if command.startswith("GETVAL"):
+            key = command.split("\"")[1]
+            if key not in self.values:
+                return "-1 No such value\n"
+            return "1 Value found\nvalue=%e\n" % self.values[key]
+        if command.startswith("FLUSH"):
+            return "0 Done: 1 successful, 0 errors\n"
+        return "-1 Unknown command: %s\n" % command
+
+    def close(self):
+        self.server.close()
+
+
+class TestCollectdClass(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "collectd.sock")
+        self.server = FakeCollectd(self.path, FAKE_VALUES)
+        self.clt = Collectd(path=self.path, timeout=5)
+
+    def tearDown(self):
+        self.clt.close()
+        self.server.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test__parse_values(self):
+        """
+        parse_values
+        """
+        self.assertEqual(
+            {"value": 1.0, "other": 0.0},
+            parse_values(["value=1.000000e+00", "other=nan?", "junk"]))
+
+    def test__connect(self):
+        """
+        connect: discover host name and cpu cores
+        """
+        self.assertEqual("moxa", self.clt.host)
+        self.assertEqual(["cpu-0", "cpu-1"], self.clt.cpus)
+
+    def test__get(self):
+        """
+        get: single identifier
+        """
+        self.assertEqual(
+            {"value": 256.0}, self.clt.get("moxa/memory/memory-used"))
+        self.assertEqual({}, self.clt.get("moxa/memory/memory-free"))
+
+    def test__get_usage(self):
+        """
+        get_usage: cpu and memory usage in one round trip
+        """
+        self.clt._sock = Mock(wraps=self.clt._sock)
+        cpu_usage, mem_usage = self.clt.get_usage(total=1024)
+        self.assertEqual(30.0, cpu_usage)
+        self.assertEqual(25.0, mem_usage)
+        self.assertEqual(1, self.clt._sock.sendall.call_count)
+        self.assertTrue(self.clt._sock.recv.call_count <= 2)
+
+        # one GETVAL per identifier and a single FLUSH
+        flush = [_ for _ in self.server.commands if _.startswith("FLUSH")]
+        self.assertEqual(1, len(flush))
+        self.assertEqual(5, flush[0].count("identifier="))
+
+    def test__get_cpu_usage(self):
+        """
+        get_cpu_usage
+        """
+        self.assertEqual(30.0, self.clt.get_cpu_usage())
+
+    def test__get_mem_usage(self):
+        """
+        get_mem_usage
+        """
+        self.assertEqual(50.0, self.clt.get_mem_usage(total=512))
+
+    def test__pipeline__invalid_reply(self):
+        """
+        pipeline: invalid reply
+        """
+        self.clt._buf = "garbage\n"
+        with self.assertRaises(CollectdError):
+            self.clt.pipeline(["FLUSH"])
+
+    def test__pipeline__not_connected(self):
+        """
+        pipeline: not connected
+        """
+        self.clt.close()
+        with self.assertRaises(CollectdError):
+            self.clt.pipeline(["LISTVAL"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import threading
+import unittest
+from collections import namedtuple
+from mock import patch
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.disks import DiskCollector
+    from status.disks import disk_get_alias, disk_usages
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+Partition = namedtuple("Partition", "device mountpoint fstype opts")
+Usage = namedtuple("Usage", "total used free percent")
+
+PARTITIONS = [
+    Partition("/dev/root", "/", "ext4", "rw"),
+    Partition("/dev/sda1", "/mnt/usb0", "vfat", "rw")
+]
+
+
+class TestDisksClass(unittest.TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.blocked = set()
+        self.queries = []
+        patcher = patch("status.disks.psutil")
+        self.mock_psutil = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_psutil.disk_partitions.return_value = PARTITIONS
+        self.mock_psutil.disk_usage.side_effect = self.disk_usage
+        self.collector = DiskCollector(timeout=0.2)
+
+    def tearDown(self):
+        self.release.set()
+        self.collector.close()
+
+    def disk_usage(self, mount):
+        self.queries.append(mount)
+        if mount in self.blocked:
+            self.release.wait()
+        return Usage(1000, 250, 750, 25.0)
+
+    def test__disk_get_alias(self):
+        """
+        disk_get_alias
+        """
+        self.assertEqual("System", disk_get_alias("/dev/root"))
+        self.assertEqual("SD1", disk_get_alias("/dev/mmcblk0"))
+        self.assertEqual("SD1-1", disk_get_alias("/dev/mmcblk0p1"))
+        self.assertEqual("USB1", disk_get_alias("/dev/sda"))
+        self.assertEqual("USB1-1", disk_get_alias("/dev/sda1"))
+        self.assertEqual("UNKNOWN", disk_get_alias("tmpfs"))
+
+    def test__disk_usages(self):
+        """
+        disk_usages: unique keys when disks share an alias
+        """
+        disks = [
+            {"name": "System", "mount": "/", "usage": {"percent": 20.0}},
+            {"name": "UNKNOWN", "mount": "/mnt/a", "usage": {"percent": 1.0}},
+            {"name": "UNKNOWN", "mount": "/mnt/b", "usage": {"percent": 2.0}},
+            {"name": "USB1-1", "mount": "/mnt/usb0", "usage": {}}
+        ]
+        self.assertEqual(
+            [("System", 20.0), ("UNKNOWN:/mnt/a", 1.0),
+             ("UNKNOWN:/mnt/b", 2.0)], disk_usages(disks))
+
+    def test__collect(self):
+        """
+        collect: usage of every mount
+        """
+        disks = self.collector.collect()
+        self.assertEqual([{
+            "name": "System",
+            "mount": "/",
+            "device": "/dev/root",
+            "usage": {"total": 1000, "used": 250, "free": 750,
+                      "percent": 25.0}
+        }, {
+            "name": "USB1-1",
+            "mount": "/mnt/usb0",
+            "device": "/dev/sda1",
+            "usage": {"total": 1000, "used": 250, "free": 750,
+                      "percent": 25.0}
+        }], disks)
+
+    def test__collect__mounts(self):
+        """
+        collect: only selected mounts
+        """
+        disks = self.collector.collect(mounts=["/"])
+        self.assertEqual(["/"], [_["mount"] for _ in disks])
+        self.assertEqual(["/"], self.queries)
+
+    def test__collect__stale(self):
+        """
+        collect: slow mount is marked as stale instead of blocking
+        """
+        self.collector.collect()
+        self.blocked.add("/mnt/usb0")
+        disks = self.collector.collect()
+        self.assertNotIn("stale", disks[0])
+        self.assertTrue(disks[1]["stale"])
+        self.assertEqual(25.0, disks[1]["usage"]["percent"])
+
+        # the pending query is not submitted again
+        self.collector.collect()
+        self.assertEqual(2, self.queries.count("/mnt/usb0"))
+
+        self.release.set()
+        disks = self.collector.collect()
+        self.assertNotIn("stale", disks[1])
+
+    def test__partitions__cached(self):
+        """
+        partitions: refreshed only when the mount table changes
+        """
+        with patch.object(self.collector, "mounts_changed") as mock_changed:
+            mock_changed.return_value = False
+            self.collector.collect()
+            self.collector.collect()
+            self.assertEqual(1, self.mock_psutil.disk_partitions.call_count)
+
+            mock_changed.return_value = True
+            self.mock_psutil.disk_partitions.return_value = PARTITIONS[:1]
+            self.assertEqual(1, len(self.collector.collect()))
+            self.assertEqual(2, self.mock_psutil.disk_partitions.call_count)
+
+    def test__mounts_changed__no_mountinfo(self):
+        """
+        mounts_changed: always refresh if mountinfo cannot be watched
+        """
+        collector = DiskCollector(mountinfo="/nonexistent/mountinfo")
+        self.assertTrue(collector.mounts_changed())
+        collector.close()
+
+    def test__mounts_changed(self):
+        """
+        mounts_changed: no change
+        """
+        self.assertFalse(self.collector.mounts_changed())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import json
+import base64
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.encoding import cbor_dumps, cbor_loads, pack, unpack
+    from status.encoding import encode, parse_encoding, dumps
+    from status.encoding import EncodedCache, EncodingError
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+DISKS = [
+    {"name": "System", "mount": "/", "device": "/dev/root",
+     "usage": {"total": 7772905472, "used": 1604681728,
+               "free": 5774041088, "percent": 21.7}},
+    {"name": "USB1-1", "mount": "/mnt/usb0", "device": "/dev/sda1",
+     "usage": {"total": 15989493760, "used": 4096,
+               "free": 15989489664, "percent": 0.0}}
+]
+
+
+STATUS = {
+    "hostname": "Moxa",
+    "version": "1.1.0-1",
+    "uptimeSec": 312956,
+    "cpuUsage": 5.7,
+    "memoryUsage": 63.8,
+    "memory": 257286144,
+    "disks": [
+        {"name": "system", "mount": "/", "device": "rootfs",
+         "usage": {"total": 770695168, "used": 497655808,
+                   "free": 217038848, "percent": 64.6}},
+        {"name": "sd1", "mount": "/media/sd-mmcblk1p1",
+         "device": "/dev/mmcblk1p1",
+         "usage": {"total": 7948206080, "used": 4096,
+                   "free": 7948201984, "percent": 0.0}}
+    ]
+}
+
+
+class MockMessage(object):
+    pass
+
+
+class TestEncodingClass(unittest.TestCase):
+
+    def test__cbor(self):
+        """
+        cbor_dumps: RFC 7049 encoding
+        """
+        self.assertEqual("\x00", cbor_dumps(0))
+        self.assertEqual("\x18\x18", cbor_dumps(24))
+        self.assertEqual("\x19\x03\xe8", cbor_dumps(1000))
+        self.assertEqual("\x20", cbor_dumps(-1))
+        self.assertEqual("\xfa\x41\x48\x00\x00", cbor_dumps(12.5))
+        self.assertEqual("\x63abc", cbor_dumps(u"abc"))
+        self.assertEqual("\x82\xf5\xf6", cbor_dumps([True, None]))
+        self.assertEqual("\xa1\x61a\x01", cbor_dumps({"a": 1}))
+
+    def test__cbor__roundtrip(self):
+        """
+        cbor_loads: decode what cbor_dumps encodes
+        """
+        data = {u"disks": DISKS, u"cpuUsage": 0.1, u"uptimeSec": 2 ** 40,
+                u"offset": -300, u"name": u"\u9583", u"ok": False}
+        self.assertEqual(json.loads(json.dumps(data)),
+                         cbor_loads(cbor_dumps(data)))
+
+    def test__cbor__invalid(self):
+        """
+        cbor_dumps: unsupported types and integers
+        """
+        with self.assertRaises(EncodingError):
+            cbor_dumps(object())
+        with self.assertRaises(EncodingError):
+            cbor_dumps(2 ** 64)
+
+    def test__pack(self):
+        """
+        pack: key dictionary for lists of objects with the same keys
+        """
+        packed = pack({"disks": DISKS, "cpuUsages": [1, 2]})
+        self.assertEqual(["device", "mount", "name",
+                          {"usage": ["free", "percent", "total", "used"]}],
+                         packed["disks"]["$keys"])
+        self.assertEqual("USB1-1", packed["disks"]["$rows"][1][2])
+        self.assertEqual([1, 2], packed["cpuUsages"])
+        self.assertEqual({"disks": DISKS, "cpuUsages": [1, 2]},
+                         unpack(packed))
+        # nested objects are flattened into the rows
+        self.assertEqual(["/dev/root", "/", "System", 5774041088, 21.7,
+                          7772905472, 1604681728],
+                         packed["disks"]["$rows"][0])
+        # keys differ, not packed
+        self.assertEqual([{"a": 1}, {"b": 1}], pack([{"a": 1}, {"b": 1}]))
+
+    def test__encode(self):
+        """
+        encode: base64 CBOR in a JSON message, smaller than JSON
+        """
+        encoded = encode({"disks": DISKS}, "cbor", True)
+        self.assertEqual("cbor", encoded["encoding"])
+        payload = base64.b64decode(encoded["payload"])
+        self.assertEqual({"disks": DISKS}, unpack(cbor_loads(payload)))
+        size = len(json.dumps({"disks": DISKS}))
+        self.assertLess(len(payload), size)
+        packed = encode({"disks": DISKS}, "json", True)
+        self.assertLess(len(json.dumps(packed)), size)
+
+    def test__encode__size(self):
+        """
+        encode: smaller than the JSON of a status
+        """
+        size = len(json.dumps(STATUS))
+        for encoding in ("json", "cbor"):
+            encoded = encode(STATUS, encoding, True)
+            self.assertLess(len(dumps(encoded)), size * 0.95)
+        self.assertLess(len(dumps(encode(STATUS, "json", True))),
+                        len(dumps(STATUS)) * 0.9)
+
+    def test__parse_encoding(self):
+        """
+        parse_encoding: query or Accept header, JSON by default
+        """
+        message = MockMessage()
+        self.assertEqual(("json", False), parse_encoding(message))
+        message.query = {"encoding": "cbor", "pack": "true"}
+        self.assertEqual(("cbor", True), parse_encoding(message))
+        message.query = {}
+        message.headers = {"Accept": "application/cbor"}
+        self.assertEqual(("cbor", False), parse_encoding(message))
+        message.query = {"encoding": "xml"}
+        with self.assertRaises(EncodingError):
+            parse_encoding(message)
+
+    def test__encoded_cache(self):
+        """
+        get: encode once for each version
+        """
+        cache = EncodedCache(max_entries=1)
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {"a": 1}
+
+        first = cache.get("status", 1, "cbor", False, build)
+        self.assertIs(first, cache.get("status", 1, "cbor", False, build))
+        self.assertEqual(1, len(builds))
+        cache.get("status", 2, "cbor", False, build)
+        cache.get("properties", 1, "cbor", False, build)
+        cache.get("status", 2, "cbor", False, build)
+        self.assertEqual(4, len(builds))
+        self.assertEqual(1, cache.hits)
+
+
+if __name__ == "__main__":
+    unittest.main()
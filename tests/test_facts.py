@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from mock import Mock
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.facts import StaticFacts
+    from status.facts import which
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestStaticFactsClass(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, "pversion")
+        with open(self.source, "w") as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(self.source, 0755)
+        self.facts = StaticFacts()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__which(self):
+        """
+        which: search executable in path
+        """
+        self.assertEqual(self.source, which("pversion", path=self.tmpdir))
+        self.assertIsNone(which("nonexistent", path=self.tmpdir))
+
+    def test__get__once(self):
+        """
+        get: fact without sources is loaded once
+        """
+        loader = Mock(return_value=4)
+        self.facts.register("cpus", loader)
+        self.assertEqual(4, self.facts.get("cpus"))
+        self.assertEqual(4, self.facts.get("cpus"))
+        self.assertEqual(1, loader.call_count)
+
+    def test__get__mtime(self):
+        """
+        get: reload when the source file is modified
+        """
+        loader = Mock(side_effect=["1.0", "1.1"])
+        self.facts.register("pversion", loader, lambda: [self.source])
+        self.assertEqual("1.0", self.facts.get("pversion"))
+        self.assertEqual("1.0", self.facts.get("pversion"))
+        os.utime(self.source, (1, 1))
+        self.assertEqual("1.1", self.facts.get("pversion"))
+        self.assertEqual(2, loader.call_count)
+
+    def test__get__failed(self):
+        """
+        get: failed load is cached as None
+        """
+        loader = Mock(side_effect=OSError)
+        self.facts.register("pversion", loader, lambda: [self.source])
+        self.assertIsNone(self.facts.get("pversion"))
+        self.assertIsNone(self.facts.get("pversion"))
+        self.assertEqual(1, loader.call_count)
+
+    def test__invalidate(self):
+        """
+        invalidate: force reload
+        """
+        loader = Mock(return_value=4)
+        self.facts.register("cpus", loader)
+        self.facts.get("cpus")
+        self.facts.invalidate("cpus")
+        self.facts.get("cpus")
+        self.facts.invalidate()
+        self.facts.get("cpus")
+        self.assertEqual(3, loader.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
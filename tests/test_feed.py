@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.feed import StatusFeed, Threshold
+    from helpers import FakeClock
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestThresholdClass(unittest.TestCase):
+
+    def test__check(self):
+        """
+        check: hysteresis between low and high
+        """
+        threshold = Threshold(high=80, low=70)
+        states = []
+        above = False
+        for value in (75, 80, 75, 71, 70, 79):
+            above = threshold.check(above, value)
+            states.append(above)
+        self.assertEqual([False, True, True, True, False, False], states)
+
+    def test__init__invalid(self):
+        """
+        init: low above high
+        """
+        with self.assertRaises(ValueError):
+            Threshold(high=70, low=80)
+
+
+class TestStatusFeedClass(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.feed = StatusFeed(
+            enable=True, interval=10, min_interval=1, clock=self.clock,
+            thresholds={"cpuUsage": {"high": 80, "low": 70},
+                        "diskUsage.*": {"high": 90}})
+
+    def tick(self, seconds, **metrics):
+        events = []
+        for _ in range(seconds):
+            events.append(self.feed.check(metrics))
+            self.clock.now += 1
+        return [_ for _ in events if _ is not None]
+
+    def test__check__interval(self):
+        """
+        check: periodic events
+        """
+        events = self.tick(25, cpuUsage=10)
+        self.assertEqual(["interval"] * 3, [_["reason"] for _ in events])
+
+    def test__check__threshold(self):
+        """
+        check: crossing a threshold is published at once and only once
+        """
+        self.tick(1, cpuUsage=10)
+        events = self.tick(3, cpuUsage=85)
+        self.assertEqual(1, len(events))
+        self.assertEqual("threshold", events[0]["reason"])
+        self.assertEqual(
+            [{"metric": "cpuUsage", "value": 85, "state": "high",
+              "high": 80, "low": 70}], events[0]["alerts"])
+        # no flapping inside the band
+        self.assertEqual([], self.tick(3, cpuUsage=75))
+        events = self.tick(1, cpuUsage=60)
+        self.assertEqual("normal", events[0]["alerts"][0]["state"])
+
+    def test__check__min_interval(self):
+        """
+        check: crossings within min_interval are sent with the next event
+        """
+        self.feed.configure(min_interval=5)
+        self.tick(1, cpuUsage=10)
+        self.assertEqual([], self.tick(1, **{"diskUsage.System": 95}))
+        events = self.tick(5, **{"diskUsage.System": 95})
+        self.assertEqual(1, len(events))
+        self.assertEqual("diskUsage.System", events[0]["alerts"][0]["metric"])
+
+    def test__to_dict(self):
+        """
+        to_dict: configuration and metrics which are high
+        """
+        self.tick(1, cpuUsage=90)
+        data = self.feed.to_dict()
+        self.assertEqual(["cpuUsage"], data["high"])
+        self.assertEqual({"high": 90, "low": 90},
+                         data["thresholds"]["diskUsage.*"])
+
+
+if __name__ == "__main__":
+    unittest.main()
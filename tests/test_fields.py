@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import unittest
+from mock import Mock
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.fields import STATUS_FIELDS
+    from status.fields import FieldError
+    from status.fields import project
+    from status.fields import update_schema
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+DISKS = [{
+    "name": "System",
+    "mount": "/",
+    "device": "/dev/root",
+    "usage": {"total": 1000, "used": 250, "free": 750, "percent": 25.0}
+}, {
+    "name": "USB1-1",
+    "mount": "/mnt/usb0",
+    "device": "/dev/sda1",
+    "usage": {"total": 2000, "used": 200, "free": 1800, "percent": 10.0}
+}]
+
+
+class TestFieldsClass(unittest.TestCase):
+
+    def test__parse__all(self):
+        """
+        parse: all fields without "fields"
+        """
+        fields, filters = STATUS_FIELDS.parse({})
+        self.assertEqual(STATUS_FIELDS.names(), fields.keys())
+        self.assertEqual({}, filters)
+
+    def test__parse__nested(self):
+        """
+        parse: nested paths and filters
+        """
+        fields, filters = STATUS_FIELDS.parse({
+            "fields": "cpuUsage, disks.usage.percent,disks.mount",
+            "mount": "/,/mnt/usb0"
+        })
+        self.assertEqual(
+            {"cpuUsage": [()],
+             "disks": [("usage", "percent"), ("mount",)]}, fields)
+        self.assertEqual({"disks": {"mount": ["/", "/mnt/usb0"]}}, filters)
+
+    def test__parse__unknown(self):
+        """
+        parse: unknown fields
+        """
+        with self.assertRaises(FieldError):
+            STATUS_FIELDS.parse({"fields": "cpu"})
+        with self.assertRaises(FieldError):
+            STATUS_FIELDS.parse({"fields": "disks.usage.size"})
+        with self.assertRaises(FieldError):
+            STATUS_FIELDS.parse({"fields": "cpuUsage.value"})
+
+    def test__loader(self):
+        """
+        loader: pass filters to the collector and filter items
+        """
+        target = Mock()
+        target.get_disks.return_value = DISKS
+        load = STATUS_FIELDS.loader(
+            "disks", target, {"mount": ["/", "/mnt/usb0"],
+                              "name": ["System"]})
+        self.assertEqual([DISKS[0]], load())
+        target.get_disks.assert_called_once_with(mounts=["/", "/mnt/usb0"])
+
+    def test__key(self):
+        """
+        key: cache key of filtered field
+        """
+        self.assertEqual("disks", STATUS_FIELDS.key("disks"))
+        self.assertEqual(
+            "disks?device=/dev/sda1&mount=/,/mnt/usb0",
+            STATUS_FIELDS.key("disks", {"mount": ["/mnt/usb0", "/"],
+                                        "device": ["/dev/sda1"]}))
+
+    def test__project(self):
+        """
+        project: select nested paths of array items
+        """
+        self.assertEqual(
+            [{"mount": "/", "usage": {"percent": 25.0}},
+             {"mount": "/mnt/usb0", "usage": {"percent": 10.0}}],
+            project(DISKS, [("usage", "percent"), ("mount",)]))
+        self.assertEqual(DISKS, project(DISKS, [()]))
+        self.assertEqual(12.5, project(12.5, [()]))
+
+    def test__schema(self):
+        """
+        schema: schema/index.yaml is generated from the registry
+        """
+        path = os.path.join(
+            os.path.dirname(os.path.realpath(__file__)),
+            "../schema/index.yaml")
+        with open(path, "r") as f:
+            text = f.read()
+        self.assertEqual(text, update_schema(text, STATUS_FIELDS))
+
+
+if __name__ == "__main__":
+    unittest.main()
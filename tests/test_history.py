@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import unittest
+from mock import patch
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.history import History
+    from status.history import Tier
+    from helpers import FakeClock
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestTierClass(unittest.TestCase):
+
+    def test__push(self):
+        """
+        push: aggregate values of the same bucket
+        """
+        tier = Tier(60, 10)
+        tier.push(10, 60)
+        tier.push(30, 90)
+        tier.push(50, 120)
+        self.assertEqual(
+            [(60, 2, 40.0, 10.0, 30.0), (120, 1, 50.0, 50.0, 50.0)],
+            list(tier.buckets(0, 120)))
+
+    def test__push__wrap(self):
+        """
+        push: overwrite the oldest bucket, memory is bounded
+        """
+        tier = Tier(1, 5)
+        for timestamp in range(12):
+            tier.push(timestamp, timestamp)
+        self.assertEqual([7, 8, 9, 10, 11],
+                         [_[0] for _ in tier.buckets(0, 11)])
+        self.assertEqual(5, len(tier._sum))
+
+
+class TestHistoryClass(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(36000.0)
+        self.history = History(
+            tiers=[(1, 60), (60, 60), (3600, 24)], max_metrics=3,
+            clock=self.clock)
+
+    def fill(self, seconds):
+        for _ in range(seconds):
+            self.history.update({"cpuUsage": _ % 10, "diskUsage.System": 20,
+                                 "diskUsage.USB1-1": 5})
+            self.clock.now += 1
+
+    def test__query__fine(self):
+        """
+        query: recent range from the 1s tier
+        """
+        self.fill(30)
+        history = self.history.query(["cpuUsage"], self.clock.now - 10)
+        self.assertEqual(1, history["step"])
+        points = history["metrics"]["cpuUsage"]
+        self.assertEqual(10, len(points))
+        self.assertEqual({"time": 36020.0, "min": 0, "avg": 0, "max": 0},
+                         points[0])
+
+    def test__query__step(self):
+        """
+        query: downsample into requested step
+        """
+        self.fill(30)
+        history = self.history.query(
+            ["cpuUsage"], self.clock.now - 30, step=10)
+        self.assertEqual(10, history["step"])
+        self.assertEqual(
+            [{"time": _, "min": 0, "avg": 4.5, "max": 9}
+             for _ in (36000, 36010, 36020)],
+            history["metrics"]["cpuUsage"])
+
+    def test__query__coarse(self):
+        """
+        query: older range from the 1m tier
+        """
+        self.fill(300)
+        history = self.history.query(["cpuUsage"], self.clock.now - 300)
+        self.assertEqual(60, history["step"])
+        self.assertEqual(5, len(history["metrics"]["cpuUsage"]))
+        self.assertEqual(4.5, history["metrics"]["cpuUsage"][0]["avg"])
+
+    def test__query__prefix(self):
+        """
+        query: prefix selects nested metrics
+        """
+        self.fill(5)
+        history = self.history.query(["diskUsage"])
+        self.assertEqual(["diskUsage.System", "diskUsage.USB1-1"],
+                         sorted(history["metrics"].keys()))
+
+    def test__push__max_metrics(self):
+        """
+        push: metrics over max_metrics are not recorded
+        """
+        self.fill(1)
+        with patch("status.history._logger") as mock_logger:
+            for _ in range(3):
+                self.history.push("memoryUsage", 10)
+                self.history.push("rxRate.eth0", 10)
+        self.assertEqual(
+            ["cpuUsage", "diskUsage.System", "diskUsage.USB1-1"],
+            self.history.metrics())
+        # warned once for each metric
+        self.assertEqual(2, mock_logger.warning.call_count)
+        self.assertEqual(set(["memoryUsage", "rxRate.eth0"]),
+                         self.history.rejected)
+
+    def test__push__evict(self):
+        """
+        push: metrics out of the longest tier make room for new ones
+        """
+        self.fill(1)
+        self.history.push("memoryUsage", 10)
+        self.assertEqual(set(["memoryUsage"]), self.history.rejected)
+
+        # the disks were last pushed in the 1h bucket 10, which leaves the
+        # 24h tier at (10 + 24) * 3600
+        self.clock.now = 34 * 3600 - 1
+        self.history.push("cpuUsage", 1)
+        self.history.push("memoryUsage", 10)
+        self.assertEqual(set(["memoryUsage"]), self.history.rejected)
+        self.clock.now += 1
+        self.history.push("memoryUsage", 10)
+        self.history.push("rxRate.eth0", 10)
+        self.assertEqual(["cpuUsage", "memoryUsage", "rxRate.eth0"],
+                         self.history.metrics())
+        self.assertEqual(set(), self.history.rejected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,10 @@
 # -*- coding: UTF-8 -*-
 import os
 import sys
+import json
+import base64
+import shutil
+import tempfile
 import unittest
 import glob
 import requests
@@ -13,8 +17,10 @@ from sanji.message import Message
 
 try:
     sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
-    from index import Index
+    from index import Index, CompactMqtt
     from status import Status as status
+    from status.tags import TagCatalog, TagCatalogFile
+    from status.encoding import cbor_loads, unpack
 except ImportError as e:
     print "Please check the python PATH for import test module. (%s)" \
         % __file__
@@ -122,6 +128,171 @@ class TestIndexClass(unittest.TestCase):
         self.assertFalse(mock_memory_usage.called)
         self.assertFalse(mock_memory.called)
 
+    @patch.object(status, "get_disks")
+    def test__get_status__nested(self, mock_disks):
+        """test__get_status: Get nested fields of selected disks"""
+        mock_disks.return_value = [{
+            "name": "System",
+            "mount": "/",
+            "device": "/dev/root",
+            "usage": {"total": 1000, "used": 250, "free": 750,
+                      "percent": 25.0}
+        }]
+        resp = Mock()
+        mock_message = MockMessage()
+        mock_message.query = {"fields": "disks.usage.percent", "mount": "/"}
+        self.index.get_status(message=mock_message, response=resp, test=True)
+        resp.assert_called_once_with(
+            data={"disks": [{"usage": {"percent": 25.0}}]})
+        mock_disks.assert_called_once_with(mounts=["/"])
+
+    def test__get_status__unknown_field(self):
+        """test__get_status: Get unknown field"""
+        resp = Mock()
+        mock_message = MockMessage()
+        mock_message.query = {"fields": "cpuUsage,disks.size"}
+        self.index.get_status(message=mock_message, response=resp, test=True)
+        resp.assert_called_once_with(
+            code=400, data={"message": "Unknown field: disks.size"})
+
+    @patch.object(status, "get_cpu_usage")
+    def test__get_status__since(self, mock_cpu_usage):
+        """test__get_status: Get fields changed since a version"""
+        mock_cpu_usage.side_effect = [10.0, 20.0]
+        resp = Mock()
+        message = Message({"query": {"fields": "cpuUsage,hostname",
+                                     "since": "0"}})
+        with patch.object(status, "get_hostname", return_value="moxa"):
+            self.index.get_status(message=message, response=resp, test=True)
+            version = resp.call_args[1]["data"]["version"]
+            self.assertEqual({"cpuUsage": 10.0, "hostname": "moxa"},
+                             resp.call_args[1]["data"]["data"])
+            self.index.status_cache.invalidate("hostname")
+            self.index.status_cache.invalidate("cpuUsage")
+
+            message.query["since"] = str(version)
+            self.index.get_status(message=message, response=resp, test=True)
+        self.assertEqual({"cpuUsage": 20.0},
+                         resp.call_args[1]["data"]["data"])
+
+    @patch.object(status, "get_disks")
+    def test__get_status__cbor(self, mock_disks):
+        """test__get_status: Get status in packed CBOR"""
+        mock_disks.return_value = [
+            {"name": "System", "mount": "/", "usage": {"percent": 20.0}},
+            {"name": "SD-1", "mount": "/mnt/sd", "usage": {"percent": 5.0}}]
+        resp = Mock()
+        message = Message({"query": {"fields": "disks", "encoding": "cbor",
+                                     "pack": "1"}})
+        self.index.get_status(message=message, response=resp, test=True)
+        data = resp.call_args[1]["data"]
+        self.assertEqual("cbor", data["encoding"])
+        self.assertEqual(
+            {"disks": mock_disks.return_value},
+            unpack(cbor_loads(base64.b64decode(data["payload"]))))
+
+        self.index.get_status(message=message, response=resp, test=True)
+        self.assertIs(data, resp.call_args[1]["data"])
+        self.assertEqual(1, self.index.encoded.hits)
+
+    @patch.object(status, "get_cpu_usage")
+    def test__get_status__cached(self, mock_cpu_usage):
+        """test__get_status: reuse collected field within its ttl"""
+        mock_cpu_usage.return_value = 98.7
+        mock_message = MockMessage()
+        mock_message.query = {"fields": "cpuUsage"}
+        self.index.get_status(message=mock_message, response=Mock(),
+                              test=True)
+        self.index.get_status(message=mock_message, response=Mock(),
+                              test=True)
+        self.assertEqual(1, mock_cpu_usage.call_count)
+
+        resp = Mock()
+        self.index.get_status_cache(message=None, response=resp, test=True)
+        stats = resp.call_args[1]["data"]
+        self.assertEqual(1, stats["cpuUsage"]["hit"])
+        self.assertEqual(1, stats["cpuUsage"]["miss"])
+
+    def test__put_status_cache(self):
+        """test__put_status_cache: Update ttl of fields"""
+        resp = Mock()
+        message = Message({"data": {"ttls": {"cpuUsage": 3}}})
+        self.index.put_status_cache(message=message, response=resp,
+                                    test=True)
+        self.assertEqual(3, self.index.status_cache.ttl("cpuUsage"))
+
+    @patch.object(status, "get_metrics")
+    def test__get_status_history(self, mock_metrics):
+        """test__get_status_history: Get history of selected metrics"""
+        mock_metrics.return_value = {"cpuUsage": 12.5, "memoryUsage": 30}
+        self.index.sample_status()
+
+        resp = Mock()
+        mock_message = MockMessage()
+        mock_message.query = {"fields": "cpuUsage", "step": "60"}
+        self.index.get_status_history(
+            message=mock_message, response=resp, test=True)
+        data = resp.call_args[1]["data"]
+        self.assertEqual(60, data["step"])
+        self.assertEqual(["cpuUsage"], data["metrics"].keys())
+        self.assertEqual(12.5, data["metrics"]["cpuUsage"][0]["avg"])
+
+    def test__put_status_feed(self):
+        """test__put_status_feed: Enable the status feed"""
+        resp = Mock()
+        message = Message({"data": {
+            "enable": True, "interval": 30,
+            "thresholds": {"cpuUsage": {"high": 80, "low": 70}}}})
+        self.index.put_status_feed(message=message, response=resp, test=True)
+        data = resp.call_args[1]["data"]
+        self.assertTrue(data["enable"])
+        self.assertEqual({"cpuUsage": {"high": 80, "low": 70}},
+                         data["thresholds"])
+
+        message = Message({"data": {
+            "thresholds": {"cpuUsage": {"high": 70, "low": 80}}}})
+        self.index.put_status_feed(message=message, response=resp, test=True)
+        self.assertEqual(400, resp.call_args[1]["code"])
+
+    @patch.object(status, "get_hostname")
+    def test__publish_status(self, mock_hostname):
+        """test__publish_status: Publish an event on threshold crossing"""
+        mock_hostname.return_value = "moxa"
+        self.index.status_feed.configure(
+            enable=True, interval=0,
+            thresholds={"cpuUsage": {"high": 80, "low": 70}})
+        with patch.object(self.index.publish.event, "put") as mock_put:
+            self.index.publish_status({"cpuUsage": 50})
+            self.assertFalse(mock_put.called)
+            self.index.publish_status({"cpuUsage": 90})
+            mock_put.assert_called_once_with("/system/status", data=ANY)
+            event = mock_put.call_args[1]["data"]
+        self.assertEqual("threshold", event["reason"])
+        self.assertEqual("moxa", event["status"]["hostname"])
+
+    def test__get_status_history__invalid(self):
+        """test__get_status_history: Get history with invalid step"""
+        resp = Mock()
+        mock_message = MockMessage()
+        mock_message.query = {"step": "0"}
+        self.index.get_status_history(
+            message=mock_message, response=resp, test=True)
+        self.assertEqual(400, resp.call_args[1]["code"])
+        mock_message.query = {"encoding": "xml"}
+        self.index.get_status_history(
+            message=mock_message, response=resp, test=True)
+        self.assertEqual(400, resp.call_args[1]["code"])
+
+    @patch("index.parse_encoding")
+    def test__get_status_history__error(self, mock_parse_encoding):
+        """test__get_status_history: Bugs are not reported as 400"""
+        mock_parse_encoding.side_effect = TypeError("bug")
+        mock_message = MockMessage()
+        mock_message.query = {}
+        with self.assertRaises(TypeError):
+            self.index.get_status_history(
+                message=mock_message, response=Mock(), test=True)
+
     @patch.object(status, "set_hostname")
     def test__put_status(self, mock_set_hostname):
         """test__put_status: Update hostname"""
@@ -143,11 +314,148 @@ class TestIndexClass(unittest.TestCase):
         self.index.get_net_interface(message=None, response=resp, test=True)
         resp.assert_called_once_with(data=mock_netifaces.return_value)
 
-    @patch("status.tar_syslog_files")
-    @patch("index.requests.post")
-    @patch("index.sh")
-    def test_post_syslog(
-            self, mock_sh, mock_post_requests, mock_tar_syslog_files):
+    @patch.object(status, "get_net_counters")
+    def test__get_net_interfaces__counters(self, mock_counters):
+        """test__get_net_interfaces: Get traffic counters of interfaces"""
+        mock_counters.return_value = [{"name": "eth0", "rxBytes": 10}]
+        resp = Mock()
+        message = Message({"query": {"counters": "true"}})
+        self.index.get_net_interface(message=message, response=resp,
+                                     test=True)
+        resp.assert_called_once_with(data=mock_counters.return_value)
+
+    @patch.object(status, "get_processes")
+    def test__get_processes(self, mock_processes):
+        """test__get_processes: Get top processes by memory"""
+        mock_processes.return_value = {"processes": [], "scan": {}}
+        resp = Mock()
+        message = Message({"query": {"sort": "rss", "limit": "5"}})
+        self.index.get_processes(message=message, response=resp, test=True)
+        mock_processes.assert_called_once_with("rss", 5)
+        resp.assert_called_once_with(data=mock_processes.return_value)
+
+    def test__get_processes__invalid(self):
+        """test__get_processes: Unknown sort key"""
+        resp = Mock()
+        message = Message({"query": {"sort": "name"}})
+        self.index.get_processes(message=message, response=resp, test=True)
+        self.assertEqual(400, resp.call_args[1]["code"])
+
+    @patch.object(status, "get_net_interfaces")
+    def test__post_batch(self, mock_netifaces):
+        """test__post_batch: Read many resources in one request"""
+        mock_netifaces.return_value = ["eth0"]
+        resp = Mock()
+        message = Message({"data": {"requests": [
+            {"resource": "/network/interfaces"},
+            {"resource": "/system/properties", "query": {"since": "abc"}},
+            {"resource": "/system/properties/aliasName"},
+            {"resource": "/system/nothing"}
+        ]}})
+        self.index.post_batch(message=message, response=resp, test=True)
+        responses = resp.call_args[1]["data"]["responses"]
+        self.assertEqual([200, 400, 200, 404],
+                         [_["code"] for _ in responses])
+        self.assertEqual("/network/interfaces", responses[0]["resource"])
+        self.assertEqual(["eth0"], responses[0]["data"])
+        self.assertEqual(self.index.properties.db["aliasName"],
+                         responses[2]["data"])
+
+    def test__compact_mqtt(self):
+        """test__compact_mqtt: Publish JSON without spaces"""
+        connection = CompactMqtt()
+        connection.client = Mock()
+        connection.client.publish.return_value = (0, 7)
+        self.assertEqual(7, connection.publish(payload={"a": [1, 2]}))
+        connection.client.publish.assert_called_once_with(
+            "/controller", payload='{"a":[1,2]}', qos=2)
+
+    def test__read(self):
+        """test__read: Get request answered in process"""
+        code, data = self.index.read(
+            "/system/properties", headers={"If-None-Match": "abc"})
+        self.assertEqual(400, code)
+        code, data = self.index.read("/system/properties?since=0")
+        self.assertEqual(200, code)
+        version = data["version"]
+        code, data = self.index.read(
+            "/system/properties", query={"since": version})
+        self.assertEqual((304, version), (code, data["version"]))
+
+    @patch.object(status, "get_disks")
+    @patch.object(status, "get_cpu_count")
+    @patch.object(status, "get_net_interfaces")
+    def test__get_system_equipments(self, mock_netifaces, mock_cpus,
+                                    mock_disks):
+        """test__get_system_equipments: Tags of this host"""
+        self.index.tag_file = TagCatalogFile("/nonexistent/tags.json")
+        mock_netifaces.return_value = ["eth0"]
+        mock_cpus.return_value = 2
+        mock_disks.return_value = [
+            {"name": "System", "mount": "/", "usage": {"percent": 20.0}},
+            {"name": "USB1-1", "mount": "/mnt/usb0",
+             "usage": {"percent": 50.0}},
+            {"name": "UNKNOWN", "mount": "/mnt/vda",
+             "usage": {"percent": 1.0}},
+            {"name": "UNKNOWN", "mount": "/mnt/vdb",
+             "usage": {"percent": 2.0}}]
+        resp = Mock()
+        self.index.get_system_equipments(message=None, response=resp,
+                                         test=True)
+        tags = dict([(_["name"], _) for _ in
+                     resp.call_args[1]["data"][0]["equipmentTags"]])
+        for name in ("cpu_usage", "cpu_usage_avg_1m", "cpu_1_usage",
+                     "disk_usb1_1_usage", "disk_unknown_mnt_vda_usage",
+                     "disk_unknown_mnt_vdb_usage", "net_eth0_rx_bytes"):
+            self.assertIn(name, tags)
+        self.assertEqual("uint64", tags["net_eth0_rx_bytes"]["dataType"])
+
+    @patch.object(status, "get_cpu_count")
+    @patch.object(status, "get_net_interfaces")
+    def test__get_system_equipments__cached(self, mock_netifaces,
+                                            mock_cpus):
+        """test__get_system_equipments: Rebuilt only when the tags change"""
+        self.index.tag_file = TagCatalogFile("/nonexistent/tags.json")
+        mock_netifaces.return_value = ["eth0"]
+        mock_cpus.return_value = 2
+        resp = Mock()
+        with patch("status.tags.build_tags") as mock_build:
+            mock_build.return_value = []
+            for _ in range(3):
+                self.index.get_system_equipments(message=None, response=resp,
+                                                 test=True)
+            equipments = [_[1]["data"] for _ in resp.call_args_list]
+            self.assertIs(equipments[0], equipments[1])
+            self.assertIs(equipments[0], equipments[2])
+            self.assertEqual(1, mock_build.call_count)
+
+            mock_netifaces.return_value = ["eth0", "eth1"]
+            self.index.get_system_equipments(message=None, response=resp,
+                                             test=True)
+            self.assertEqual(2, mock_build.call_count)
+
+    def test__get_system_equipments__daemon(self):
+        """test__get_system_equipments: Catalog saved by mxsysstatusd"""
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        catalog = TagCatalog()
+        catalog.update(cpus=4)
+        catalog.save(os.path.join(root, "tags.json"))
+        self.index.tag_file = TagCatalogFile(os.path.join(root, "tags.json"))
+        resp = Mock()
+        self.index.get_system_equipments(message=None, response=resp,
+                                         test=True)
+        resp.assert_called_once_with(data=catalog.equipments())
+
+    def run_job(self, resp):
+        self.assertEqual(202, resp.call_args[1]["code"])
+        job = self.index.jobs.get(resp.call_args[1]["data"]["id"])
+        self.assertTrue(job.wait(5))
+        return job
+
+    @patch("index.SyslogArchive")
+    @patch("index.upload")
+    def test_post_syslog(self, mock_upload, mock_archive):
         """
         post
         "data": {
@@ -162,29 +470,162 @@ class TestIndexClass(unittest.TestCase):
                 "url": "https://localhost"
             }, "query": {}, "param": {}})
         download_url = "https://localhost/api/v1/download/123456789"
-        filename = "xxx.tar.gz"
-        mock_tar_syslog_files.return_value = filename
+        mock_archive.return_value.chunks.return_value = iter(["xxx"])
+        mock_archive.return_value.stats.return_value = {
+            "files": 1, "bytes": 1024, "compressedBytes": 3, "ratio": 0.003,
+            "seconds": 0.1}
         mock_post_result = Mock()
-        mock_post_requests.return_value = mock_post_result
+        mock_upload.return_value = mock_post_result
         mock_post_result.status_code = requests.codes.ok
         mock_post_result.json.return_value = {
             "url": download_url
         }
 
-        def resp(code=200, data=None):
-            self.assertEqual(200, code)
-            self.assertEqual(download_url, data["url"])
+        resp = Mock()
+        self.index.post_syslog(message=message, response=resp, test=True)
+        job = self.run_job(resp)
+        self.assertEqual("done", job.state)
+        self.assertEqual(download_url, job.result["url"])
+        self.assertEqual(0.003, job.result["ratio"])
 
-        with patch("__builtin__.open"):
-            self.index.post_syslog(message=message, response=resp, test=True)
-        mock_tar_syslog_files.assert_called_once_with(ANY)
-        self.assertTrue(mock_sh.rm.called)
-        mock_post_requests.assert_called_once_with(
+        mock_upload.assert_called_once_with(
             message.data["url"],
-            files={filename: ANY},
-            headers=message.data["headers"],
-            verify=False
+            ANY,
+            ANY,
+            headers=message.data["headers"]
         )
+        self.assertRegexpMatches(
+            mock_upload.call_args[0][1], r"^syslog-\d{12}\.tar\.gz$")
+        mock_archive.assert_called_once_with(
+            ["/var/log"], globs=None, start=None, end=None, state=None,
+            level=6, workers=1)
+        self.assertTrue(mock_archive.return_value.commit.called)
+
+    @patch("index.SyslogArchive")
+    @patch("index.upload")
+    def test_post_syslog__since_last_upload(self, mock_upload, mock_archive):
+        """
+        post: failed upload does not move the uploaded offsets
+        """
+        message = Message({"data": {
+            "url": "https://localhost", "sinceLastUpload": True,
+            "files": ["messages*"], "level": 1}})
+        mock_upload.return_value.status_code = 404
+        resp = Mock()
+        self.index.post_syslog(message=message, response=resp, test=True)
+        job = self.run_job(resp)
+        self.assertEqual("failed", job.state)
+        self.assertEqual(
+            {"code": 404, "message": "Can't upload config."}, job.error)
+        self.assertIsNotNone(mock_archive.call_args[1]["state"])
+        self.assertEqual(["messages*"], mock_archive.call_args[1]["globs"])
+        self.assertFalse(mock_archive.return_value.commit.called)
+
+    @patch("index.upload")
+    def test_post_syslog__unreachable(self, mock_upload):
+        """
+        post: upload target is unreachable
+        """
+        message = Message({"data": {"url": "https://localhost"}})
+        mock_upload.side_effect = requests.exceptions.ConnectionError
+        resp = Mock()
+        self.index.post_syslog(message=message, response=resp, test=True)
+        job = self.run_job(resp)
+        self.assertEqual(
+            {"code": 500, "message": "Can't upload config."}, job.error)
+
+    @patch.object(status, "reboot")
+    def test__post_reboot(self, mock_reboot):
+        """test__post_reboot: reboot in background and cancel it"""
+        resp = Mock()
+        self.index.post_reboot(message=None, response=resp, test=True)
+        job_id = resp.call_args[1]["data"]["id"]
+
+        resp = Mock()
+        message = Message({"param": {"id": str(job_id)}})
+        self.index.delete_job(message=message, response=resp, test=True)
+        self.assertTrue(self.index.jobs.get(job_id).wait(5))
+        self.assertEqual("cancelled", self.index.jobs.get(job_id).state)
+        self.assertFalse(mock_reboot.called)
+
+    @patch("index.set_password")
+    def test__post_passwd(self, mock_set_password):
+        """test__post_passwd: change password in background"""
+        resp = Mock()
+        message = Message({"data": {"password": "moxamoxa"}})
+        self.index.post_passwd(message=message, response=resp, test=True)
+        job = self.run_job(resp)
+        self.assertEqual("done", job.state)
+        mock_set_password.assert_called_once_with("moxamoxa")
+
+        resp = Mock()
+        message = Message({"param": {"id": str(job.id)}})
+        self.index.get_job(message=message, response=resp, test=True)
+        self.assertEqual("done", resp.call_args[1]["data"]["state"])
+
+        resp = Mock()
+        self.index.get_jobs(message=None, response=resp, test=True)
+        self.assertEqual([job.id], [_["id"] for _ in
+                                    resp.call_args[1]["data"]])
+
+    def test__get_job__not_found(self):
+        """test__get_job: no such job"""
+        resp = Mock()
+        message = Message({"param": {"id": "999"}})
+        self.index.get_job(message=message, response=resp, test=True)
+        self.assertEqual(404, resp.call_args[1]["code"])
+
+    def test__put_properties(self):
+        """test__put_properties: Update many properties with one write"""
+        store = self.index.properties_store
+        store.flush()
+        writes = store.writes
+        resp = Mock()
+        message = Message({"data": {"aliasName": "gw-1",
+                                    "gps": {"lat": 25.0, "lng": 121.5},
+                                    "defaultRoute": "eth0"}})
+        self.index.put_properties(message=message, response=resp, test=True)
+        self.assertEqual("gw-1", resp.call_args[1]["data"]["aliasName"])
+
+        message = Message({"data": {"data": "gw-2"},
+                           "param": {"key": "aliasName"}})
+        self.index.put_property(message=message, response=resp, test=True)
+        resp = Mock()
+        self.index.get_properties(message=None, response=resp, test=True)
+        self.assertEqual("gw-2", resp.call_args[1]["data"]["aliasName"])
+
+        self.assertTrue(store.flush())
+        self.assertEqual(writes + 1, store.writes)
+        with open(self.index.properties.json_db_path) as f:
+            self.assertEqual("gw-2", json.load(f)["aliasName"])
+
+    def test__get_properties__since(self):
+        """test__get_properties: 304 or changed properties since version"""
+        resp = Mock()
+        self.index.get_properties(message=None, response=resp, test=True)
+        version = self.index.properties_versions.version
+
+        message = Message({"query": {"since": str(version)}})
+        self.index.get_properties(message=message, response=resp, test=True)
+        self.assertEqual(304, resp.call_args[1]["code"])
+
+        self.index.properties_store.update({"aliasName": "gw-1"})
+        message = Message({"headers": {"If-None-Match": '"%d"' % version}})
+        self.index.get_properties(message=message, response=resp, test=True)
+        data = resp.call_args[1]["data"]
+        self.assertEqual({"aliasName": "gw-1"}, data["data"])
+        self.assertEqual('"%d"' % data["version"], data["etag"])
+        self.assertGreater(data["version"], version)
+
+    def test__put_properties__invalid(self):
+        """test__put_properties: Unknown key or invalid value"""
+        for data in ({"unknown": 1}, {"aliasName": "x" * 256}):
+            resp = Mock()
+            message = Message({"data": data})
+            self.index.put_properties(
+                message=message, response=resp, test=True)
+            self.assertEqual(400, resp.call_args[1]["code"])
+        self.assertNotIn("unknown", self.index.properties.db)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import threading
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.jobs import JobQueue, JobError
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestJobQueueClass(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = JobQueue(workers=1, max_jobs=3)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.jobs.close()
+
+    def block(self, job):
+        self.release.wait(5)
+        return "released"
+
+    def test__submit(self):
+        """
+        submit: job runs in a worker and keeps its result
+        """
+        job = self.jobs.submit("test", lambda job: 42)
+        self.assertTrue(job.wait(5))
+        self.assertEqual("done", job.state)
+        self.assertEqual(42, job.to_dict()["result"])
+        self.assertIs(job, self.jobs.get(job.id))
+
+    def test__submit__failed(self):
+        """
+        submit: error of a job
+        """
+        def fail(job):
+            raise JobError("Can't upload config.", 404)
+
+        def crash(job):
+            raise ValueError("crash")
+
+        job = self.jobs.submit("test", fail)
+        job.wait(5)
+        self.assertEqual("failed", job.state)
+        self.assertEqual({"code": 404, "message": "Can't upload config."},
+                         job.error)
+        job = self.jobs.submit("test", crash)
+        job.wait(5)
+        self.assertEqual({"code": 500, "message": "crash"}, job.error)
+
+    def test__submit__lanes(self):
+        """
+        submit: jobs of a busy lane do not hold back other lanes
+        """
+        jobs = JobQueue(workers=1, lanes={"upload": 1})
+        self.addCleanup(jobs.close)
+        uploads = [jobs.submit("syslog", self.block, lane="upload")
+                   for _ in range(2)]
+        job = jobs.submit("reboot", lambda job: 42)
+        self.assertTrue(job.wait(5))
+        self.assertIn(uploads[0].state, ("queued", "running"))
+        self.assertEqual("queued", uploads[1].state)
+        self.assertEqual([1, 2, 3], sorted([_.id for _ in jobs.list()]))
+
+    def test__cancel__queued(self):
+        """
+        cancel: queued job never runs
+        """
+        blocker = self.jobs.submit("test", self.block)
+        calls = []
+        job = self.jobs.submit("test", lambda job: calls.append(1))
+        self.assertEqual("cancelled", self.jobs.cancel(job.id).state)
+        self.release.set()
+        self.assertTrue(job.wait(5))
+        self.assertTrue(blocker.wait(5))
+        self.assertEqual("cancelled", job.state)
+        self.assertEqual([], calls)
+
+    def test__cancel__running(self):
+        """
+        cancel: running job stops at its next check
+        """
+        started = threading.Event()
+
+        def wait(job):
+            started.set()
+            job.sleep(5)
+
+        job = self.jobs.submit("test", wait)
+        started.wait(5)
+        self.jobs.cancel(job.id)
+        self.assertTrue(job.wait(5))
+        self.assertEqual("cancelled", job.state)
+        self.assertIsNone(self.jobs.cancel(999))
+
+    def test__prune(self):
+        """
+        submit: oldest finished jobs are dropped over max_jobs
+        """
+        jobs = [self.jobs.submit("test", lambda job: None) for _ in range(3)]
+        for job in jobs:
+            job.wait(5)
+        job = self.jobs.submit("test", lambda job: None)
+        job.wait(5)
+        self.assertIsNone(self.jobs.get(jobs[0].id))
+        self.assertEqual(3, len(self.jobs.list()))
+
+
+if __name__ == "__main__":
+    unittest.main()
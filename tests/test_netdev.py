@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.netdev import NetDevSampler, parse_net_dev
+    from status.netdev import interface_tag_names, rate_metrics
+    from helpers import FakeClock
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+NET_DEV = """\
+Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0       0          0
+  eth0:%8d    %4d    1    2    0     0          0         0 %8d    %4d    3    4    0     0       0          0
+wwan0:     500       5    0    0    0     0          0         0      600       6    0    0    0     0       0          0
+"""  # noqa
+
+
+class TestNetDevClass(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "dev")
+        self.clock = FakeClock()
+        self.sampler = NetDevSampler(self.path, clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, rx_bytes, rx_packets, tx_bytes, tx_packets):
+        with open(self.path, "w") as f:
+            f.write(NET_DEV % (rx_bytes, rx_packets, tx_bytes, tx_packets))
+
+    def test__parse_net_dev(self):
+        """
+        parse_net_dev: counters of interfaces except loopback
+        """
+        counters = parse_net_dev(NET_DEV % (2000, 20, 3000, 30))
+        self.assertEqual(["eth0", "wwan0"], sorted(counters))
+        self.assertEqual(
+            {"rxBytes": 2000, "rxPackets": 20, "rxErrors": 1, "rxDropped": 2,
+             "txBytes": 3000, "txPackets": 30, "txErrors": 3, "txDropped": 4},
+            counters["eth0"])
+
+    def test__sample(self):
+        """
+        sample: rates since the previous sample
+        """
+        self.write(2000, 20, 3000, 30)
+        self.assertNotIn("rxBytesRate", self.sampler.sample()["eth0"])
+        self.clock.now += 2
+        self.write(4000, 30, 3000, 40)
+        interfaces = self.sampler.sample()
+        eth0 = interfaces["eth0"]
+        self.assertEqual(4000, eth0["rxBytes"])
+        self.assertEqual(1000.0, eth0["rxBytesRate"])
+        self.assertEqual(5.0, eth0["rxPacketsRate"])
+        self.assertEqual(0.0, eth0["txBytesRate"])
+        self.assertEqual({"rxRate.eth0": 1000.0, "txRate.eth0": 0.0,
+                          "rxRate.wwan0": 0.0, "txRate.wwan0": 0.0},
+                         rate_metrics(interfaces))
+
+    def test__sample__wrap(self):
+        """
+        sample: 32-bit counter wrapped
+        """
+        self.write(2 ** 32 - 1000, 30, 3000, 40)
+        self.sampler.sample()
+        self.clock.now += 2
+        self.write(500, 31, 3000, 40)
+        self.assertEqual(750.0, self.sampler.sample()["eth0"]["rxBytesRate"])
+
+    def test__sample__reset(self):
+        """
+        sample: 64-bit counter going back was reset, counts from 0
+        """
+        self.write(2 ** 40, 30, 3000, 40)
+        self.sampler.sample()
+        self.clock.now += 1
+        self.write(100, 1, 3000, 40)
+        self.assertEqual(100.0, self.sampler.sample()["eth0"]["rxBytesRate"])
+
+    def test__sample__missing(self):
+        """
+        sample: no interfaces without /proc/net/dev
+        """
+        self.assertEqual({}, self.sampler.sample())
+
+    def test__interface_tag_names(self):
+        """
+        interface_tag_names: counter and rate tags
+        """
+        names = interface_tag_names("eth0")
+        self.assertEqual(16, len(names))
+        self.assertIn(("net_eth0_rx_bytes_rate", "rxBytesRate",
+                       "eth0 received bytes per second"), names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import threading
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.probes import Backoff, ProbeRuntime
+    from helpers import FakeClock
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestBackoffClass(unittest.TestCase):
+
+    def test__failure(self):
+        """
+        failure: delay doubles up to the maximum
+        """
+        clock = FakeClock()
+        backoff = Backoff(initial=1, maximum=5, clock=clock)
+        self.assertTrue(backoff.ready())
+        delays = []
+        for _ in range(5):
+            backoff.failure()
+            delays.append(backoff.delay)
+        self.assertEqual([1, 2, 4, 5, 5], delays)
+        self.assertFalse(backoff.ready())
+        clock.now += 5
+        self.assertTrue(backoff.ready())
+        backoff.success()
+        self.assertEqual(0, backoff.failures)
+
+
+class TestProbeRuntimeClass(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = ProbeRuntime()
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.runtime.close()
+
+    def run_for(self, seconds):
+        timer = threading.Timer(seconds, self.runtime.stop)
+        timer.start()
+        self.runtime.run()
+        timer.join()
+
+    def test__run__slow_probe(self):
+        """
+        run: a hung probe does not delay the others
+        """
+        fast = []
+        slow = []
+        self.runtime.add_probe("slow", 0.02, self.release.wait, slow.append)
+        self.runtime.add_probe("fast", 0.02, lambda: 1, fast.append)
+        self.run_for(0.3)
+        stats = self.runtime.stats()
+        self.assertGreater(len(fast), 5)
+        self.assertEqual([], slow)
+        self.assertGreater(stats["slow"]["overruns"], 5)
+        self.assertEqual(len(fast), stats["fast"]["runs"])
+
+    def test__process__timeout(self):
+        """
+        process: a late result is dropped
+        """
+        clock = FakeClock()
+        runtime = ProbeRuntime(clock=clock)
+        self.addCleanup(runtime.close)
+        results = []
+        done = threading.Event()
+
+        def collect():
+            clock.now += 2
+            done.set()
+            return 1
+
+        probe = runtime.add_probe("late", 1, collect, results.append)
+        probe.dispatch()
+        done.wait(1)
+        while not runtime.process():
+            pass
+        self.assertEqual([], results)
+        self.assertEqual(1, probe.stats()["timeouts"])
+
+    def test__process__error(self):
+        """
+        process: errors of collect are counted, apply is not called
+        """
+        after_tick = []
+        runtime = ProbeRuntime(after_tick=lambda: after_tick.append(1))
+        self.addCleanup(runtime.close)
+        results = []
+
+        def collect():
+            raise IOError("no such file")
+
+        probe = runtime.add_probe("error", 1, collect, results.append)
+        probe.dispatch()
+        while not runtime.process():
+            pass
+        self.assertEqual([], results)
+        self.assertEqual(1, probe.stats()["errors"])
+        self.assertEqual([1], after_tick)
+        self.assertFalse(probe.busy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.processes import ProcessScanner, parse_stat, top_processes
+    from status.processes import CLK_TCK, PAGE_SIZE
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+def write_process(proc, pid, name, ticks, rss=100, start=1000,
+                  cmdline="/usr/bin/%s\0--verbose\0"):
+    path = os.path.join(proc, str(pid))
+    if not os.path.isdir(path):
+        os.mkdir(path)
+    fields = ["S", "1"] + ["0"] * 9 + [str(ticks), "0"] + ["0"] * 6 + \
+        [str(start), "0", str(rss)] + ["0"] * 20
+    with open(os.path.join(path, "stat"), "w") as f:
+        f.write("%d (%s) %s\n" % (pid, name, " ".join(fields)))
+    with open(os.path.join(path, "cmdline"), "w") as f:
+        f.write(cmdline.replace("%s", name) if cmdline else "")
+
+
+class TestProcessesClass(unittest.TestCase):
+
+    def setUp(self):
+        self.proc = tempfile.mkdtemp()
+        self.now = [0.0]
+        self.scanner = ProcessScanner(self.proc, clock=lambda: self.now[0])
+        os.mkdir(os.path.join(self.proc, "net"))
+
+    def tearDown(self):
+        shutil.rmtree(self.proc)
+
+    def test__parse_stat(self):
+        """
+        parse_stat: name with spaces and parentheses
+        """
+        self.assertEqual(
+            ("a (b) c", "R", 7, 30, 500, 12),
+            parse_stat("42 (a (b) c) R 7 0 0 0 0 0 0 0 0 0 10 20 0 0 0 0 0 "
+                       "0 500 0 12 0 0\n"))
+
+    def test__scan(self):
+        """
+        scan: cpu usage from the ticks of the previous scan
+        """
+        write_process(self.proc, 1, "init", 100)
+        write_process(self.proc, 2, "kthreadd", 0, rss=0, cmdline="")
+        processes = self.scanner.scan()
+        self.assertEqual(2, len(processes))
+        self.assertNotIn("cpuUsage", processes[0])
+
+        self.now[0] = 2.0
+        write_process(self.proc, 1, "init", 100 + CLK_TCK)
+        processes = dict([(_["pid"], _) for _ in self.scanner.scan()])
+        self.assertAlmostEqual(50.0, processes[1]["cpuUsage"])
+        self.assertEqual(0.0, processes[2]["cpuUsage"])
+        self.assertEqual("/usr/bin/init --verbose", processes[1]["cmdline"])
+        self.assertEqual("[kthreadd]", processes[2]["cmdline"])
+        self.assertEqual(100 * PAGE_SIZE, processes[1]["rss"])
+        self.assertEqual(1, processes[1]["ppid"])
+        self.assertTrue(processes[1]["user"])
+
+    def test__scan__incremental(self):
+        """
+        scan: command line and user are read once for each process
+        """
+        for pid in range(100, 400):
+            write_process(self.proc, pid, "worker", pid)
+        self.scanner.scan()
+        self.now[0] = 1.0
+        self.scanner.scan()
+        stats = self.scanner.stats()
+        self.assertEqual(300, stats["processes"])
+        self.assertEqual(300, stats["staticReads"])
+        self.assertEqual(2, stats["scans"])
+        self.assertGreater(stats["scanTimeMax"], 0)
+
+    def test__scan__pid_reused(self):
+        """
+        scan: a new process with the pid of an exited one
+        """
+        write_process(self.proc, 5, "old", 1000)
+        self.scanner.scan()
+        write_process(self.proc, 5, "new", 10, start=2000)
+        self.now[0] = 1.0
+        processes = self.scanner.scan()
+        self.assertEqual("/usr/bin/new --verbose", processes[0]["cmdline"])
+        self.assertNotIn("cpuUsage", processes[0])
+
+    def test__top_processes(self):
+        """
+        top_processes: the processes using the most cpu or memory
+        """
+        processes = [
+            {"pid": 1, "cpuUsage": 1.0, "rss": 300},
+            {"pid": 2, "cpuUsage": 30.0, "rss": 100},
+            {"pid": 3, "rss": 200}
+        ]
+        self.assertEqual([2, 1], [_["pid"] for _ in top_processes(
+            processes, "cpu", 2)])
+        self.assertEqual([1, 3, 2], [_["pid"] for _ in top_processes(
+            processes, "rss")])
+
+
+if __name__ == "__main__":
+    unittest.main()
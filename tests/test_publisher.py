@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from mock import Mock
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.publisher import PublishRule
+    from status.publisher import DEFAULT_RULES
+    from status.publisher import TagPublisher
+    from status.publisher import load_rules
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestPublishRuleClass(unittest.TestCase):
+
+    def test__first(self):
+        """
+        should_publish: never published
+        """
+        self.assertTrue(PublishRule(deadband=10).should_publish(None, 1, 0))
+
+    def test__deadband(self):
+        """
+        should_publish: absolute deadband
+        """
+        rule = PublishRule(deadband=1.0)
+        self.assertFalse(rule.should_publish(50.0, 50.0, 10))
+        self.assertFalse(rule.should_publish(50.0, 51.0, 10))
+        self.assertTrue(rule.should_publish(50.0, 51.5, 10))
+
+    def test__percent(self):
+        """
+        should_publish: percent deadband
+        """
+        rule = PublishRule(percent=10)
+        self.assertFalse(rule.should_publish(50.0, 54.0, 10))
+        self.assertTrue(rule.should_publish(50.0, 44.0, 10))
+
+    def test__intervals(self):
+        """
+        should_publish: min interval and heartbeat
+        """
+        rule = PublishRule(deadband=1.0, min_interval=5, max_interval=60)
+        self.assertFalse(rule.should_publish(50.0, 90.0, 1))
+        self.assertTrue(rule.should_publish(50.0, 90.0, 5))
+        self.assertFalse(rule.should_publish(50.0, 50.0, 59))
+        self.assertTrue(rule.should_publish(50.0, 50.0, 60))
+
+    def test__load_rules(self):
+        """
+        load_rules: from json file
+        """
+        with tempfile.NamedTemporaryFile() as temp:
+            json.dump([{"tag": "cpu_*", "deadband": 2, "maxInterval": 30}],
+                      temp)
+            temp.flush()
+            rules = load_rules(temp.name)
+        self.assertEqual("cpu_*", rules[0][0])
+        self.assertEqual(2, rules[0][1].deadband)
+        self.assertEqual(0, rules[0][1].min_interval)
+        self.assertEqual(30, rules[0][1].max_interval)
+
+
+class TestTagPublisherClass(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.tagv2 = Mock()
+        self.timestamp = Mock(side_effect=range(100))
+        self.publisher = TagPublisher(
+            self.tagv2, lambda v, t: (v, t), self.timestamp,
+            rules=[("cpu_*", PublishRule(deadband=1.0, max_interval=10)),
+                   ("*", PublishRule())],
+            clock=lambda: self.now)
+
+    def test__flush(self):
+        """
+        flush: updates in one tick share one timestamp
+        """
+        self.publisher.update("cpu_usage", 10.0)
+        self.publisher.update("memory_usage", 20.0)
+        self.assertFalse(self.tagv2.publish.called)
+        self.assertEqual(2, self.publisher.flush())
+        self.tagv2.publish.assert_any_call("SYSTEM", "cpu_usage", (10.0, 0))
+        self.tagv2.publish.assert_any_call(
+            "SYSTEM", "memory_usage", (20.0, 0))
+        self.assertEqual(1, self.timestamp.call_count)
+        self.assertEqual(0, self.publisher.flush())
+
+    def test__suppressed(self):
+        """
+        update: values in the deadband are suppressed until heartbeat
+        """
+        for tick in range(12):
+            self.now = float(tick)
+            self.publisher.update("cpu_usage", 10.0 + (tick % 2) * 0.5)
+            self.publisher.flush()
+        self.assertEqual(2, self.publisher.stats()["published"])
+        self.assertEqual(10, self.publisher.stats()["suppressed"])
+        self.tagv2.publish.assert_called_with("SYSTEM", "cpu_usage", (10.0, 1))
+
+    def test__tags(self):
+        """
+        update: only listed tags are published
+        """
+        self.publisher.tags = frozenset(["cpu_usage"])
+        self.assertTrue(self.publisher.update("cpu_usage", 10.0))
+        self.assertFalse(self.publisher.update("disk_sda_usage", 10.0))
+        self.assertEqual(1, self.publisher.flush())
+
+    def test__rule(self):
+        """
+        rule: first matched pattern
+        """
+        self.assertEqual(1.0, self.publisher.rule("cpu_usage").deadband)
+        self.assertEqual(0.0, self.publisher.rule("disk_usage").deadband)
+
+    def test__default_rules__counters(self):
+        """
+        update: interface counters are only sent on the heartbeat
+        """
+        publisher = TagPublisher(
+            self.tagv2, lambda v, t: (v, t), self.timestamp,
+            rules=DEFAULT_RULES, clock=lambda: self.now)
+        published = []
+        for second in range(0, 300, 5):
+            self.now = second
+            published.append((
+                publisher.update("net_eth0_rx_bytes", second * 1000.0),
+                publisher.update("net_eth0_rx_bytes_rate", second % 10)))
+        self.assertEqual([True], [_[0] for _ in published if _[0]])
+        self.assertEqual(60, len([_ for _ in published if _[1]]))
+        self.now = 300
+        self.assertTrue(publisher.update("net_eth0_rx_bytes", 300000.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.rollstat import RollingStats
+    from status.rollstat import MultiWindowStats
+    from status.rollstat import stat_tag_names
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestRollingStatsClass(unittest.TestCase):
+
+    def test__empty(self):
+        """
+        empty window
+        """
+        stats = RollingStats(5)
+        self.assertEqual(0, len(stats))
+        self.assertEqual(0.0, stats.mean())
+        self.assertEqual(0.0, stats.ewma())
+        self.assertEqual(0.0, stats.min())
+        self.assertEqual(0.0, stats.max())
+        self.assertEqual(0.0, stats.percentile(95))
+
+    def test__mean(self):
+        """
+        mean: samples older than the window are evicted
+        """
+        stats = RollingStats(5)
+        for now, value in enumerate([10.0, 20.0, 30.0, 40.0, 50.0, 60.0]):
+            stats.push(value, now)
+        self.assertEqual(5, len(stats))
+        self.assertEqual(40.0, stats.mean())
+
+        # gap longer than the window
+        stats.push(5.0, 100)
+        self.assertEqual(1, len(stats))
+        self.assertEqual(5.0, stats.mean())
+
+    def test__min_max(self):
+        """
+        min/max: follow the window
+        """
+        stats = RollingStats(3)
+        values = [50.0, 10.0, 30.0, 20.0, 40.0, 35.0]
+        expected = [
+            (50, 50), (10, 50), (10, 50), (10, 30), (20, 40), (20, 40)]
+        for now, value in enumerate(values):
+            stats.push(value, now)
+            self.assertEqual(expected[now], (stats.min(), stats.max()))
+
+    def test__ewma(self):
+        """
+        ewma: moves toward new samples
+        """
+        stats = RollingStats(60)
+        stats.push(0.0, 0)
+        stats.push(100.0, 60)
+        self.assertAlmostEqual(100.0 * (1 - 1 / 2.718281828), stats.ewma(),
+                               places=5)
+
+    def test__percentile(self):
+        """
+        percentile: approximated by histogram bins
+        """
+        stats = RollingStats(1000)
+        for value in range(100):
+            stats.push(float(value), value)
+        self.assertAlmostEqual(95.0, stats.percentile(95), delta=1.0)
+        self.assertAlmostEqual(50.0, stats.percentile(50), delta=1.0)
+        self.assertEqual(0.0, stats.percentile(0))
+        self.assertEqual(99.0, stats.percentile(100))
+
+    def test__stat(self):
+        """
+        stat: by name
+        """
+        stats = RollingStats(5)
+        stats.push(10.0, 0)
+        stats.push(30.0, 1)
+        self.assertEqual(20.0, stats.stat("avg"))
+        self.assertEqual(30.0, stats.stat("max"))
+        with self.assertRaises(ValueError):
+            stats.stat("median")
+
+    def test__resync(self):
+        """
+        push: running sum is resynchronized
+        """
+        stats = RollingStats(10)
+        stats.RESYNC = 4
+        for now in range(9):
+            stats.push(0.1, now)
+        self.assertAlmostEqual(0.1, stats.mean())
+
+
+class TestMultiWindowStatsClass(unittest.TestCase):
+
+    def test__summary(self):
+        """
+        summary: statistics of every window
+        """
+        stats = MultiWindowStats(windows=[("5s", 5), ("1m", 60)])
+        for now in range(60):
+            stats.push(float(now), now)
+        summary = stats.summary(stats=["avg", "min", "max"])
+        self.assertEqual({"avg": 57.0, "min": 55.0, "max": 59.0},
+                         summary["5s"])
+        self.assertEqual({"avg": 29.5, "min": 0.0, "max": 59.0},
+                         summary["1m"])
+        self.assertEqual(5, len(stats["5s"]))
+
+    def test__stat_tag_names(self):
+        """
+        stat_tag_names
+        """
+        names = stat_tag_names("cpu_usage", windows=[("1m", 60)],
+                               stats=["avg", "p95"])
+        self.assertEqual([("cpu_usage_avg_1m", "avg", "1m"),
+                          ("cpu_usage_p95_1m", "p95", "1m")], names)
+
+
+if __name__ == "__main__":
+    unittest.main()
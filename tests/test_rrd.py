@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.history import History
+    from status.rrd import RRDStore
+    from status.rrd import RRDError
+    from helpers import FakeClock
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+TIERS = [(1, 60), (60, 60)]
+
+
+class TestRRDStoreClass(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "run/history.rrd")
+        self.backup = os.path.join(self.tmpdir, "lib/history.rrd")
+        self.clock = FakeClock(36000.0)
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        shutil.rmtree(self.tmpdir)
+
+    def store(self, **kwargs):
+        store = RRDStore(self.path, tiers=TIERS, max_metrics=2, **kwargs)
+        self.stores.append(store)
+        return store
+
+    def history(self, store):
+        return History(store=store, clock=self.clock)
+
+    def fill(self, history, seconds):
+        for _ in range(seconds):
+            history.update({"cpuUsage": _ % 10})
+            self.clock.now += 1
+
+    def test__query__reader(self):
+        """
+        query: reader sees what the writer pushed
+        """
+        writer = self.history(self.store(writable=True))
+        self.fill(writer, 10)
+        reader = self.history(self.store())
+        points = reader.query(["cpuUsage"], self.clock.now - 10)
+        self.assertEqual(range(10), [_["avg"] for _ in points["metrics"][
+            "cpuUsage"]])
+        self.assertEqual(writer.query(), reader.query())
+
+    def test__create__full(self):
+        """
+        create: metrics over max_metrics are not recorded
+        """
+        writer = self.history(self.store(writable=True))
+        writer.update({"cpuUsage": 1, "memoryUsage": 2, "diskUsage.System": 3})
+        self.assertEqual(2, len(writer.metrics()))
+
+    def test__create__evict(self):
+        """
+        create: reuse the slot of a metric out of the longest tier
+        """
+        writer = self.history(self.store(writable=True))
+        reader = self.history(self.store())
+        writer.update({"cpuUsage": 1, "memoryUsage": 2})
+        self.assertIsNotNone(reader.store.get("memoryUsage"))
+        writer.push("diskUsage.System", 3)
+        self.assertEqual(["cpuUsage", "memoryUsage"], writer.metrics())
+
+        self.clock.now += 3600
+        writer.update({"cpuUsage": 1, "diskUsage.System": 3})
+        self.assertEqual(["cpuUsage", "diskUsage.System"], writer.metrics())
+        self.assertIsNone(reader.store.get("memoryUsage"))
+        self.assertEqual(
+            [3], [_["avg"] for _ in reader.query(["diskUsage"])["metrics"][
+                "diskUsage.System"]])
+
+    def test__push__2038(self):
+        """
+        push: bucket numbers past 2038
+        """
+        self.clock.now = 2 ** 32
+        history = self.history(self.store(writable=True))
+        self.fill(history, 2)
+        self.assertEqual([0, 1], [_["avg"] for _ in history.query(
+            ["cpuUsage"], self.clock.now - 2)["metrics"]["cpuUsage"]])
+
+    def test__create__readonly(self):
+        """
+        create: reader cannot add metrics
+        """
+        self.store(writable=True)
+        with self.assertRaises(RRDError):
+            self.store().create("cpuUsage")
+
+    def test__open__missing(self):
+        """
+        open: reader without writer
+        """
+        with self.assertRaises(RRDError):
+            self.store()
+
+    def test__sync__restore(self):
+        """
+        sync: history is restored from backup after reboot
+        """
+        store = self.store(writable=True, backup=self.backup)
+        self.fill(self.history(store), 10)
+        self.assertTrue(store.sync() > 0)
+        self.assertEqual(0, store.sync())
+        store.close()
+        os.unlink(self.path)
+
+        history = self.history(self.store(writable=True, backup=self.backup))
+        self.assertEqual(
+            10, len(history.query(["cpuUsage"], self.clock.now - 10)[
+                "metrics"]["cpuUsage"]))
+
+    def test__sync__dirty_pages(self):
+        """
+        sync: only pages written since last sync are copied
+        """
+        store = self.store(writable=True, backup=self.backup)
+        history = self.history(store)
+        self.fill(history, 1)
+        store.sync()
+        self.fill(history, 1)
+        # records of the 1s and 1m buckets share a page
+        self.assertEqual(1, store.sync())
+
+    def test__sync__short_tiers(self):
+        """
+        sync: tiers spanning no more than the sync interval are not copied
+        """
+        def synced_pages(**kwargs):
+            path = os.path.join(self.tmpdir, "run/%d.rrd" % len(self.stores))
+            store = RRDStore(path, tiers=[(1, 600), (60, 60)], max_metrics=1,
+                             writable=True, backup=path + ".backup",
+                             **kwargs)
+            self.stores.append(store)
+            history = self.history(store)
+            self.fill(history, 1)
+            store.sync()
+            self.fill(history, 300)
+            return store.sync()
+
+        self.assertGreater(synced_pages(), 2)
+        self.assertEqual(1, synced_pages(sync_interval=600))
+
+    def test__reopen(self):
+        """
+        names: reader follows a recreated file
+        """
+        self.store(writable=True)
+        reader = self.store()
+        self.assertEqual([], reader.names())
+        os.unlink(self.path)
+        self.history(self.store(writable=True)).push("cpuUsage", 1)
+        self.assertEqual(["cpuUsage"], reader.names())
+
+
+if __name__ == "__main__":
+    unittest.main()
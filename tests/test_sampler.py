@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import socket
+import shutil
+import tempfile
+import unittest
+from mock import patch
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.sampler import CollectdSampler
+    from status.sampler import ProcSampler
+    from status.sampler import SamplerError
+    from status.sampler import create_sampler
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+dirpath = os.path.dirname(os.path.realpath(__file__))
+
+PROC_STAT_NEXT = """cpu  1300 0 600 8500 600 0 0 0 0 0
+cpu0 700 0 350 4200 250 0 0 0 0 0
+cpu1 600 0 250 4300 350 0 0 0 0 0
+intr 123456 0 0 0
+"""
+
+
+class TestProcSamplerClass(unittest.TestCase):
+
+    def setUp(self):
+        self.proc = tempfile.mkdtemp()
+        for name in ["stat", "meminfo"]:
+            shutil.copy(os.path.join(dirpath, "data/proc", name), self.proc)
+        self.sampler = ProcSampler(proc=self.proc)
+
+    def tearDown(self):
+        self.sampler.close()
+        shutil.rmtree(self.proc)
+
+    def test__sample(self):
+        """
+        sample: usages since boot, then usages from tick deltas
+        """
+        sample = self.sampler.sample()
+        self.assertAlmostEqual(15.0, sample["cpu_usage"])
+        self.assertEqual(2, len(sample["cpu_usages"]))
+        self.assertAlmostEqual(18.0, sample["cpu_usages"][0])
+        self.assertAlmostEqual(12.0, sample["cpu_usages"][1])
+        self.assertAlmostEqual(50.0, sample["memory_usage"])
+
+        # files are re-read through the same descriptor
+        with open(os.path.join(self.proc, "stat"), "r+") as f:
+            f.write(PROC_STAT_NEXT)
+            f.truncate()
+        sample = self.sampler.sample()
+        self.assertAlmostEqual(40.0, sample["cpu_usage"])
+        self.assertAlmostEqual(30.0, sample["cpu_usages"][0])
+        self.assertAlmostEqual(50.0, sample["cpu_usages"][1])
+
+    def test__sample_memory(self):
+        """
+        sample_memory: without reading cpu ticks
+        """
+        self.assertAlmostEqual(50.0, self.sampler.sample_memory())
+        self.assertEqual({}, self.sampler._ticks)
+
+    def test__sample__no_tick(self):
+        """
+        sample: no tick between two samples
+        """
+        self.sampler.sample()
+        sample = self.sampler.sample()
+        self.assertEqual(0.0, sample["cpu_usage"])
+
+    def test__get_memory_usage__no_memavailable(self):
+        """
+        get_memory_usage: kernel without MemAvailable
+        """
+        with open(os.path.join(self.proc, "meminfo"), "w") as f:
+            f.write("MemTotal: 1000 kB\nMemFree: 300 kB\n"
+                    "Buffers: 50 kB\nCached: 50 kB\n")
+        self.assertAlmostEqual(60.0, self.sampler.get_memory_usage())
+
+    def test__read_meminfo(self):
+        """
+        read_meminfo: values in bytes
+        """
+        meminfo = self.sampler.read_meminfo()
+        self.assertEqual(251256 * 1024, meminfo["MemTotal"])
+        self.assertEqual(0, meminfo["HugePages_Total"])
+
+
+class TestCollectdSamplerClass(unittest.TestCase):
+
+    def test__sample__no_collectd(self):
+        """
+        sample: collectd is not running
+        """
+        sampler = CollectdSampler(path="/nonexistent/collectd.sock")
+        with self.assertRaises(SamplerError):
+            sampler.sample()
+
+    @patch("status.sampler.Collectd")
+    def test__sample__backoff(self, mock_collectd):
+        """
+        sample: reconnect to collectd with backoff
+        """
+        mock_collectd.side_effect = socket.error("Connection refused")
+        sampler = CollectdSampler()
+        for _ in range(3):
+            with self.assertRaises(SamplerError):
+                sampler.sample()
+        self.assertEqual(1, mock_collectd.call_count)
+        self.assertEqual(1, sampler.backoff.failures)
+
+        sampler.backoff._next = 0
+        mock_collectd.side_effect = None
+        mock_collectd.return_value.get_usages.return_value = ([10.0], 20.0)
+        self.assertEqual(10.0, sampler.sample()["cpu_usage"])
+        self.assertEqual(0, sampler.backoff.failures)
+
+    @patch("status.sampler.Collectd")
+    def test__sample(self, mock_collectd):
+        """
+        sample: usages from collectd, limited to 100 percent
+        """
+        mock_collectd.return_value.get_usages.return_value = \
+            ([10.0, 130.0], 20.0)
+        sampler = CollectdSampler(memory=1024)
+        sample = sampler.sample()
+        self.assertEqual(55.0, sample["cpu_usage"])
+        self.assertEqual([10.0, 100.0], sample["cpu_usages"])
+        self.assertEqual(20.0, sample["memory_usage"])
+        mock_collectd.return_value.get_usages.assert_called_once_with(1024)
+
+    @patch("status.sampler.Collectd")
+    def test__sample_cpu_memory(self, mock_collectd):
+        """
+        sample_cpu/sample_memory: separated queries
+        """
+        mock_collectd.return_value.get_cpu_usages.return_value = [10.0]
+        mock_collectd.return_value.get_mem_usage.return_value = 120.0
+        sampler = CollectdSampler(memory=1024)
+        self.assertEqual({"cpu_usage": 10.0, "cpu_usages": [10.0]},
+                         sampler.sample_cpu())
+        self.assertEqual(100.0, sampler.sample_memory())
+        self.assertEqual(1, mock_collectd.call_count)
+
+    def test__create_sampler__unknown(self):
+        """
+        create_sampler: unknown backend
+        """
+        with self.assertRaises(SamplerError):
+            create_sampler("snmp")
+
+
+if __name__ == "__main__":
+    unittest.main()
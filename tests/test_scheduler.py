@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.scheduler import Scheduler
+    from status.scheduler import monotonic
+    from helpers import FakeClock
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestSchedulerClass(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock, sleep=self.clock.sleep)
+        self.calls = []
+
+    def job(self, name, cost=0.0):
+        def _job():
+            self.calls.append((name, self.clock.now))
+            self.clock.now += cost
+        return _job
+
+    def test__monotonic(self):
+        """
+        monotonic: never goes backward
+        """
+        first = monotonic()
+        self.assertTrue(monotonic() >= first)
+
+    def test__multi_rate(self):
+        """
+        run_pending: each job runs at its own interval
+        """
+        self.scheduler.add("cpu", 1, self.job("cpu"))
+        self.scheduler.add("disk", 5, self.job("disk"))
+        for _ in range(10):
+            self.scheduler.run_pending()
+            self.clock.sleep(self.scheduler.next_deadline() - self.clock())
+        cpu = [_ for _ in self.calls if _[0] == "cpu"]
+        disk = [_ for _ in self.calls if _[0] == "disk"]
+        self.assertEqual(10, len(cpu))
+        self.assertEqual([100.0, 105.0], [_[1] for _ in disk])
+
+    def test__no_drift(self):
+        """
+        run_pending: time spent in jobs does not shift the period
+        """
+        self.scheduler.add("cpu", 1, self.job("cpu", cost=0.3))
+        for _ in range(5):
+            self.scheduler.run_pending()
+            self.clock.sleep(self.scheduler.next_deadline() - self.clock())
+        self.assertEqual([100.0, 101.0, 102.0, 103.0, 104.0],
+                         [_[1] for _ in self.calls])
+
+    def test__catchup(self):
+        """
+        run_pending: missed ticks run back to back, up to max_catchup
+        """
+        job = self.scheduler.add("cpu", 1, self.job("cpu"), max_catchup=3)
+        self.scheduler.run_pending()
+        self.clock.now += 2.5
+        self.scheduler.run_pending()
+        self.assertEqual(3, len(self.calls))
+        self.assertEqual(0, job.skipped)
+
+        self.clock.now += 10
+        self.scheduler.run_pending()
+        self.assertEqual(6, len(self.calls))
+        self.assertEqual(7, job.skipped)
+        self.assertEqual(113.0, job.deadline)
+
+    def test__jitter(self):
+        """
+        stats: lateness of each run
+        """
+        self.scheduler.add("cpu", 1, self.job("cpu"))
+        self.scheduler.run_pending()
+        self.clock.now += 1.25
+        self.scheduler.run_pending()
+        stats = self.scheduler.stats()["cpu"]
+        self.assertEqual(2, stats["runs"])
+        self.assertEqual(0.25, stats["jitterLast"])
+        self.assertEqual(0.25, stats["jitterMax"])
+        self.assertEqual(0.125, stats["jitterAvg"])
+
+    def test__error(self):
+        """
+        run_pending: a failed job does not stop the others
+        """
+        def fail():
+            raise ValueError("failed")
+        self.scheduler.add("fail", 1, fail)
+        self.scheduler.add("cpu", 1, self.job("cpu"))
+        self.scheduler.run_pending()
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual(1, self.scheduler.stats()["fail"]["errors"])
+
+    def test__after_tick(self):
+        """
+        run_pending: after_tick is called once per round of due jobs
+        """
+        ticks = []
+        scheduler = Scheduler(clock=self.clock, sleep=self.clock.sleep,
+                              after_tick=lambda: ticks.append(self.clock()))
+        scheduler.add("cpu", 1, self.job("cpu"))
+        scheduler.add("memory", 1, self.job("memory"))
+        scheduler.run_pending()
+        scheduler.run_pending()
+        self.assertEqual([100.0], ticks)
+
+    def test__run(self):
+        """
+        run: sleep until the next deadline, until stopped
+        """
+        def stop():
+            if len(self.calls) >= 3:
+                self.scheduler.stop()
+        self.scheduler.add("cpu", 1, self.job("cpu"))
+        self.scheduler.add("stop", 1, stop)
+        self.scheduler.run()
+        self.assertEqual([100.0, 101.0, 102.0], [_[1] for _ in self.calls])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+from mock import patch
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.snapshot import SnapshotWriter
+    from status.snapshot import SnapshotReader
+    from status.snapshot import SnapshotError
+    from status.snapshot import HEADER, SEQ_OFFSET, SIZE
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestSnapshotClass(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "run/status.snapshot")
+        self.writer = SnapshotWriter(self.path, size=4096)
+        self.reader = SnapshotReader(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test__read(self):
+        """
+        read: latest snapshot
+        """
+        self.writer.write({"cpuUsage": 12.5, "disks": []})
+        self.assertEqual({"cpuUsage": 12.5, "disks": []}, self.reader.read())
+        self.writer.write({"cpuUsage": 20.0})
+        self.assertEqual(20.0, self.reader.get("cpuUsage"))
+        self.assertEqual("x", self.reader.get("memory", "x"))
+
+    def test__read__cached(self):
+        """
+        read: payload is decoded once per update
+        """
+        self.writer.write({"cpuUsage": 12.5})
+        with patch("status.snapshot.json.loads") as mock_loads:
+            mock_loads.return_value = {"cpuUsage": 12.5}
+            self.reader.read()
+            self.reader.read()
+            self.assertEqual(1, mock_loads.call_count)
+            self.writer.write({"cpuUsage": 12.5})
+            self.reader.read()
+            self.assertEqual(2, mock_loads.call_count)
+
+    def test__read__no_file(self):
+        """
+        read: daemon is not running
+        """
+        reader = SnapshotReader(os.path.join(self.tmpdir, "nonexistent"))
+        self.assertIsNone(reader.read())
+        self.assertEqual(0.0, reader.get("cpuUsage", 0.0))
+
+    def test__read__stale(self):
+        """
+        read: snapshot older than max_age
+        """
+        self.writer.write({"cpuUsage": 12.5}, timestamp=time.time() - 60)
+        self.assertIsNone(self.reader.read())
+
+    def test__read__busy(self):
+        """
+        read: writer is in the middle of an update
+        """
+        self.writer.write({"cpuUsage": 12.5})
+        self.assertEqual(12.5, self.reader.get("cpuUsage"))
+        self.writer.write({"cpuUsage": 50.0})
+        seq = struct.unpack_from("<I", self.writer._mm, SEQ_OFFSET)[0]
+        struct.pack_into("<I", self.writer._mm, SEQ_OFFSET, seq + 1)
+        self.assertEqual(12.5, self.reader.get("cpuUsage"))
+
+    def test__read__invalid(self):
+        """
+        read: retry an undecodable payload, then keep the previous one
+        """
+        self.writer.write({"cpuUsage": 12.5})
+        self.assertEqual(12.5, self.reader.get("cpuUsage"))
+        self.writer.write({"cpuUsage": 50.0})
+        with patch("status.snapshot.json.loads") as mock_loads:
+            mock_loads.side_effect = [ValueError, {"cpuUsage": 50.0}]
+            self.assertEqual(50.0, self.reader.get("cpuUsage"))
+        self.writer.write({"cpuUsage": 80.0})
+        self.writer._mm[HEADER.size] = "x"
+        self.assertEqual(50.0, self.reader.get("cpuUsage"))
+
+    def test__write__seq_last(self):
+        """
+        write: the even sequence is stored after the rest of the header
+        """
+        pack_into = struct.pack_into
+        headers = []
+
+        def record(fmt, buf, offset, *values):
+            headers.append((offset, values, HEADER.unpack_from(buf, 0)))
+            pack_into(fmt, buf, offset, *values)
+
+        with patch("status.snapshot.struct.pack_into", side_effect=record):
+            self.writer.write({"cpuUsage": 12.5}, timestamp=1000.0)
+        self.assertEqual(1, len(headers))
+        offset, (seq, ), (_, _, odd, timestamp, length) = headers[0]
+        self.assertEqual((SEQ_OFFSET, seq - 1), (offset, odd))
+        self.assertEqual(0, seq & 1)
+        self.assertEqual((1000.0, len('{"cpuUsage":12.5}')),
+                         (timestamp, length))
+
+    def test__write__too_large(self):
+        """
+        write: payload larger than the file
+        """
+        with self.assertRaises(SnapshotError):
+            self.writer.write({"data": "x" * 8192})
+
+    def test__write__optional(self):
+        """
+        write: drop optional keys while the payload is too large
+        """
+        self.writer.write({"cpuUsage": 10.0})
+        data = {
+            "cpuUsage": 12.5,
+            "processes": [{"cmdline": "x" * SIZE}],
+            "interfaces": {"eth0": {"rxBytes": 1}}
+        }
+        self.assertEqual(["processes"], self.writer.write(
+            data, optional=("processes", "interfaces")))
+        self.assertEqual({"cpuUsage": 12.5,
+                          "interfaces": {"eth0": {"rxBytes": 1}}},
+                         self.reader.read())
+        self.assertIn("processes", data)
+
+        data["cpuUsage"] = 20.0
+        data["disks"] = ["x" * SIZE]
+        with self.assertRaises(SnapshotError):
+            self.writer.write(data, optional=("processes", "interfaces"))
+        # previous snapshot is kept
+        self.assertEqual(12.5, self.reader.get("cpuUsage"))
+
+    def test__writer__restart(self):
+        """
+        SnapshotWriter: continue the sequence of the previous writer
+        """
+        self.writer.write({"cpuUsage": 12.5})
+        self.assertEqual(12.5, self.reader.get("cpuUsage"))
+        self.writer.close()
+        self.writer = SnapshotWriter(self.path, size=4096)
+        self.writer.write({"cpuUsage": 30.0})
+        self.assertEqual(30.0, self.reader.get("cpuUsage"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,14 +4,17 @@
 import os
 import sys
 import logging
+import shutil
 import unittest
 import tempfile
-from mock import patch
+from mock import patch, Mock
 
 try:
     sys.path.append(os.path.dirname(os.path.realpath(__file__)) + '/../')
     from status import Status
     from status import get_password, set_password
+    from status import StatusError
+    from status.snapshot import SnapshotWriter, SnapshotReader
 except ImportError as e:
     print os.path.dirname(os.path.realpath(__file__)) + '/../'
     print sys.path
@@ -64,19 +67,50 @@ class TestStatusClass(unittest.TestCase):
         hostname = self.bundle.get_hostname()
         self.assertEqual(hostname, "")
 
-    @patch("sh.sed")
-    @patch("sh.echo")
-    @patch("sh.hostname")
-    def test__set_hostname(self, mock_sethostname, mock_echo, mock_sed):
+    @patch("socket.gethostname")
+    @patch("status.sethostname")
+    def test__set_hostname(self, mock_sethostname, mock_gethostname):
         """
         set_hostname
         """
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.mkdir(os.path.join(root, "etc"))
+        with open(os.path.join(root, "etc/hosts"), "w") as f:
+            f.write("127.0.0.1\tlocalhost moxa\n::1 localhost\n")
+        mock_gethostname.return_value = "moxa"
+        self.bundle.root = root
+
         self.bundle.set_hostname("test")
+        mock_sethostname.assert_called_once_with("test")
+        with open(os.path.join(root, "etc/hostname")) as f:
+            self.assertEqual("test\n", f.read())
+        with open(os.path.join(root, "etc/hosts")) as f:
+            self.assertEqual("127.0.0.1\tlocalhost test\n::1 localhost\n",
+                             f.read())
+
+    @patch("socket.gethostname")
+    @patch("status.system._libc")
+    def test__set_hostname__unicode(self, mock_libc, mock_gethostname):
+        """
+        set_hostname: unicode hostnames reach sethostname(2) as bytes
+        """
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.mkdir(os.path.join(root, "etc"))
+        mock_gethostname.return_value = "moxa"
+        mock_libc.sethostname.return_value = 0
+        self.bundle.root = root
 
-    @patch("sh.sed")
-    @patch("sh.echo")
-    @patch("sh.hostname")
-    def test__set_hostname_failed(self, mock_sethostname, mock_echo, mock_sed):
+        self.bundle.set_hostname(u"moxa-gw")
+        hostname, length = mock_libc.sethostname.call_args[0]
+        self.assertIs(str, type(hostname))
+        self.assertEqual(("moxa-gw", 7), (hostname, length))
+        with open(os.path.join(root, "etc/hostname")) as f:
+            self.assertEqual("moxa-gw\n", f.read())
+
+    @patch("status.sethostname")
+    def test__set_hostname_failed(self, mock_sethostname):
         """
         set_hostname: failed
         """
@@ -93,6 +127,17 @@ class TestStatusClass(unittest.TestCase):
         version = self.bundle.get_product_version()
         self.assertEqual(VERSION_INFO, version)
 
+    @patch("status.sh")
+    def test__get_product_version__cached(self, mock_sh):
+        """
+        get_product_version: pversion runs once
+        """
+        mock_sh.pversion.return_value = PVERSION_INFO
+        self.assertEqual(VERSION_INFO, self.bundle.get_product_version())
+        self.assertEqual(VERSION_INFO, self.bundle.get_product_version())
+        self.assertEqual("UC-8112-LX-CG", self.bundle.get_model_name())
+        self.assertEqual(1, mock_sh.pversion.call_count)
+
     @patch("status.sh")
     def test__get_product_version__failed(self, mock_sh):
         """
@@ -102,6 +147,88 @@ class TestStatusClass(unittest.TestCase):
         version = self.bundle.get_product_version()
         self.assertEqual("(not installed)", version)
 
+    @patch("status.psutil")
+    def test__get_snapshot(self, mock_psutil):
+        """
+        get_cpu_usage/get_memory_usage/get_memory/get_disks: from snapshot
+        """
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "status.snapshot")
+            writer = SnapshotWriter(path, size=4096)
+            writer.write({
+                "cpuUsage": 12.5,
+                "memoryUsage": 40.0,
+                "memory": 257286144,
+                "disks": [{"name": "System", "mount": "/"}]
+            })
+            self.bundle.snapshot = SnapshotReader(path)
+            self.assertEqual(12.5, self.bundle.get_cpu_usage())
+            self.assertEqual(40.0, self.bundle.get_memory_usage())
+            self.assertEqual(257286144, self.bundle.get_memory())
+            self.assertEqual("System", self.bundle.get_disks()[0]["name"])
+            self.assertFalse(mock_psutil.disk_partitions.called)
+            self.assertFalse(mock_psutil.virtual_memory.called)
+            writer.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    @patch.object(Status, "get_disks")
+    def test__get_metrics__same_alias(self, mock_disks):
+        """
+        get_metrics: a metric for each disk sharing an alias
+        """
+        mock_disks.return_value = [
+            {"name": "UNKNOWN", "mount": "/mnt/vda",
+             "usage": {"percent": 1.0}},
+            {"name": "UNKNOWN", "mount": "/mnt/vdb",
+             "usage": {"percent": 2.0}}]
+        self.bundle.snapshot = SnapshotReader("/nonexistent/status.snapshot")
+        self.bundle._net_dev = Mock()
+        self.bundle._net_dev.sample.return_value = {}
+        metrics = self.bundle.get_metrics()
+        self.assertEqual(1.0, metrics["diskUsage.UNKNOWN:/mnt/vda"])
+        self.assertEqual(2.0, metrics["diskUsage.UNKNOWN:/mnt/vdb"])
+
+    def test__get_processes(self):
+        """
+        get_processes: top processes kept by mxsysstatusd
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, "status.snapshot")
+        writer = SnapshotWriter(path, size=4096)
+        self.addCleanup(writer.close)
+        writer.write({
+            "processes": [
+                {"pid": 1, "name": "init", "cpuUsage": 0.5, "rss": 4096},
+                {"pid": 80, "name": "node", "cpuUsage": 90.0, "rss": 1024}
+            ],
+            "processScan": {"processes": 120, "scanTime": 0.004}
+        })
+        self.bundle.snapshot = SnapshotReader(path)
+        processes = self.bundle.get_processes(sort="rss", limit=1)
+        self.assertEqual(["init"],
+                         [_["name"] for _ in processes["processes"]])
+        self.assertEqual(120, processes["scan"]["processes"])
+
+    def test__get_processes__no_daemon(self):
+        """
+        get_processes: scan /proc without mxsysstatusd
+        """
+        self.bundle.snapshot = SnapshotReader("/nonexistent/status.snapshot")
+        processes = self.bundle.get_processes(limit=3)
+        self.assertEqual(3, len(processes["processes"]))
+        self.assertEqual(1, processes["scan"]["scans"])
+
+    def test__get_snapshot__no_daemon(self):
+        """
+        get_cpu_usage: no snapshot, use the subscribed tag
+        """
+        self.bundle.snapshot = SnapshotReader("/nonexistent/status.snapshot")
+        self.bundle.sysstatus._cpu_usage = 33.0
+        self.assertEqual(33.0, self.bundle.get_cpu_usage())
+
     def test__get_password(self):
         """
         get_password
@@ -112,14 +239,25 @@ class TestStatusClass(unittest.TestCase):
             passhash = get_password("moxa", temp.name)
             self.assertEqual(passhash, "$6$Hs/8c4S4$gBHEMrckbK9dpFJ0xrrO07TecyKNgTeB2Q69PKwFuuZC47W0k7zdWyF115efj9c5UmpxjB.iz.sW/QbhEYER1/")  # noqa
 
-    @patch("status.usermod")
-    def test__set_password(self, mock_usermod):
+    def test__set_password(self):
         """
         set_password
         """
-        set_password("moxa", "user")
-        mock_usermod.called_args
-        self.assertTrue(mock_usermod.called)
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        os.mkdir(os.path.join(root, "etc"))
+        shadow = os.path.join(root, "etc/shadow")
+        with open(shadow, "w") as f:
+            f.write("root:*:16247:0:99999:7:::\nuser:!:16247:0:99999:7:::\n")
+        os.chmod(shadow, 0640)
+
+        set_password("moxa", "user", root=root)
+        passhash = get_password("user", shadow)
+        self.assertTrue(passhash.startswith("$6$rounds=10000$"))
+        self.assertEqual("*", get_password("root", shadow))
+        self.assertEqual(0640, os.stat(shadow).st_mode & 0777)
+        with self.assertRaises(StatusError):
+            set_password("moxa", "nobody", root=root)
     '''
     @patch("status.tar_syslog_files")
     @patch("status.requests.post")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.store import WriteBehindStore
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class FakeModel(object):
+
+    def __init__(self, path):
+        self.db = {"aliasName": "moxa"}
+        self.db_mutex = threading.RLock()
+        self.json_db_path = path
+
+
+class TestWriteBehindStoreClass(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "properties.json")
+        self.model = FakeModel(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def load(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test__update__coalesce(self):
+        """
+        update: updates within the delay are written once
+        """
+        store = WriteBehindStore(self.model, delay=60)
+        store.update({"aliasName": "a"})
+        store.update({"defaultRoute": "eth0"})
+        store.update({"aliasName": "b"})
+        self.assertEqual("b", store.db["aliasName"])
+        self.assertFalse(os.path.exists(self.path))
+
+        self.assertTrue(store.flush())
+        self.assertFalse(store.flush())
+        self.assertEqual(1, store.writes)
+        self.assertEqual({"aliasName": "b", "defaultRoute": "eth0"},
+                         self.load())
+        self.assertEqual([os.path.basename(self.path)],
+                         os.listdir(self.root))
+
+    def test__update__timer(self):
+        """
+        update: pending updates are written after the delay
+        """
+        store = WriteBehindStore(self.model, delay=0.01)
+        store.update({"aliasName": "a"})
+        timer = store._timer
+        timer.join(1)
+        self.assertEqual(1, store.writes)
+        self.assertEqual("a", self.load()["aliasName"])
+
+    def test__update__no_delay(self):
+        """
+        update: write on every update without delay
+        """
+        store = WriteBehindStore(self.model, delay=0)
+        store.update({"aliasName": "a"})
+        store.update({"aliasName": "b"})
+        self.assertEqual(2, store.writes)
+        self.assertEqual("b", self.load()["aliasName"])
+
+    def test__close(self):
+        """
+        close: write pending updates
+        """
+        store = WriteBehindStore(self.model, delay=60)
+        store.update({"aliasName": "a"})
+        store.close()
+        self.assertEqual("a", self.load()["aliasName"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from mock import patch
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.system import atomic_write
+    from status.system import update_hosts
+    from status.system import sethostname
+    from status.system import get_shadow_password, set_shadow_password
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+HOSTS = """# static hosts
+127.0.0.1\tlocalhost
+127.0.1.1\tmoxa moxa.local # device
+::1 localhost ip6-localhost
+"""
+
+
+class TestSystemClass(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, "etc"))
+        self.shadow = os.path.join(self.root, "etc/shadow")
+        with open(self.shadow, "w") as f:
+            f.write("root:*:16247:0:99999:7:::\n"
+                    "moxa:$6$old:16247:0:99999:7:::\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test__update_hosts(self):
+        """
+        update_hosts: rename alias, keep layout and comments
+        """
+        self.assertEqual(
+            HOSTS.replace("\tmoxa ", "\ttest "),
+            update_hosts(HOSTS, "moxa", "test"))
+
+    def test__update_hosts__missing(self):
+        """
+        update_hosts: add hostname to localhost if it is not found
+        """
+        self.assertEqual(
+            "127.0.0.1 localhost test\n",
+            update_hosts("127.0.0.1 localhost\n", "moxa", "test"))
+        self.assertEqual(
+            "::1 localhost\n127.0.0.1       localhost test\n",
+            update_hosts("::1 localhost", "moxa", "test"))
+        # already renamed, nothing is appended
+        self.assertEqual(HOSTS, update_hosts(HOSTS, "other", "moxa"))
+
+    def test__update_hosts__localhost(self):
+        """
+        update_hosts: never rename the names of loopback
+        """
+        self.assertEqual(
+            "127.0.0.1\tlocalhost gw1\n::1 localhost ip6-localhost\n",
+            update_hosts("127.0.0.1\tlocalhost\n::1 localhost ip6-localhost\n",
+                         "localhost", "gw1"))
+        self.assertEqual(
+            HOSTS.replace("moxa.local #", "moxa.local gw1 #"),
+            update_hosts(HOSTS, "ip6-localhost", "gw1"))
+        # hostname alias of the loopback line is renamed, not localhost
+        self.assertEqual("127.0.0.1 localhost gw1\n",
+                         update_hosts("127.0.0.1 localhost moxa\n",
+                                      "moxa", "gw1"))
+
+    def test__atomic_write(self):
+        """
+        atomic_write: keep mode of the original file
+        """
+        path = os.path.join(self.root, "etc/hostname")
+        atomic_write(path, "moxa\n")
+        os.chmod(path, 0600)
+        atomic_write(path, "test\n")
+        with open(path) as f:
+            self.assertEqual("test\n", f.read())
+        self.assertEqual(0600, os.stat(path).st_mode & 0777)
+        self.assertEqual(["hostname", "shadow"], sorted(os.listdir(
+            os.path.join(self.root, "etc"))))
+
+    def test__atomic_write__fsync(self):
+        """
+        atomic_write: sync the file, then its directory after the rename
+        """
+        path = os.path.join(self.root, "etc/hostname")
+        synced = []
+
+        def fsync(fd):
+            synced.append(os.path.isfile(path))
+
+        with patch("status.system.os.fsync", side_effect=fsync):
+            atomic_write(path, "moxa\n")
+        # file before the rename, directory after it
+        self.assertEqual([False, True], synced)
+
+    @patch("status.system._libc")
+    def test__sethostname(self, mock_libc):
+        """
+        sethostname: raise OSError on failure
+        """
+        mock_libc.sethostname.return_value = 0
+        sethostname("test")
+        mock_libc.sethostname.assert_called_once_with("test", 4)
+        mock_libc.sethostname.return_value = -1
+        with self.assertRaises(OSError):
+            sethostname("test")
+
+    def test__set_shadow_password(self):
+        """
+        set_shadow_password: only the hash of the user is replaced
+        """
+        set_shadow_password("moxa", "$6$new", self.shadow, self.root)
+        self.assertEqual("$6$new", get_shadow_password("moxa", self.shadow))
+        with open(self.shadow) as f:
+            self.assertEqual("root:*:16247:0:99999:7:::\n"
+                             "moxa:$6$new:16247:0:99999:7:::\n", f.read())
+        self.assertIsNone(get_shadow_password("nobody", self.shadow))
+        with self.assertRaises(KeyError):
+            set_shadow_password("nobody", "x", self.shadow, self.root)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.tags import TagCatalog, TagCatalogFile, build_tags
+    from status.tags import disk_tag_name
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class TestTagCatalogClass(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, "run/tags.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test__build_tags(self):
+        """
+        build_tags: metric, statistic, core, disk and interface tags
+        """
+        tags = build_tags(cpus=2, disks=["System"], interfaces=["eth0"])
+        names = [_["name"] for _ in tags]
+        self.assertEqual(["cpu_usage", "memory_usage", "disk_usage"],
+                         names[:3])
+        self.assertEqual(3 + 3 * 15 + 2 + 1 + 16, len(names))
+        self.assertIn("cpu_1_usage", names)
+        self.assertIn("disk_system_usage", names)
+        self.assertIn("net_eth0_tx_errors_rate", names)
+
+    def test__disk_tag_name(self):
+        """
+        disk_tag_name: alias as a tag name
+        """
+        self.assertEqual("disk_usb1_1_usage", disk_tag_name("USB1-1"))
+        self.assertEqual("disk_sd_card_usage", disk_tag_name("SD Card"))
+
+    def test__update(self):
+        """
+        update: rebuild only when the hardware changes
+        """
+        catalog = TagCatalog()
+        self.assertTrue(catalog.update(1, ["System"], ["eth0"]))
+        self.assertFalse(catalog.update(1, ["System"], ["eth0"]))
+        self.assertNotIn("disk_usb1_1_usage", catalog.names)
+        self.assertTrue(catalog.update(1, ["USB1-1", "System"], ["eth0"]))
+        self.assertIn("disk_usb1_1_usage", catalog.names)
+
+    def test__equipments(self):
+        """
+        equipments: built once per change of the catalog
+        """
+        catalog = TagCatalog()
+        catalog.update(1, ["System"], ["eth0"])
+        equipments = catalog.equipments()
+        self.assertFalse(catalog.update(1, ["System"], ["eth0"]))
+        self.assertIs(equipments, catalog.equipments())
+        catalog.update(2, ["System"], ["eth0"])
+        self.assertIsNot(equipments, catalog.equipments())
+        self.assertIs(catalog.tags,
+                      catalog.equipments()[0]["equipmentTags"])
+
+    def test__load(self):
+        """
+        load: parse the saved catalog once per change
+        """
+        reader = TagCatalogFile(self.path)
+        self.assertIsNone(reader.load())
+
+        catalog = TagCatalog()
+        catalog.update(1)
+        catalog.save(self.path)
+        equipments = reader.load()
+        self.assertEqual(catalog.equipments(), equipments)
+        self.assertIs(equipments, reader.load())
+
+        catalog.update(2)
+        catalog.save(self.path)
+        # make sure the replaced file is detected on coarse mtime
+        os.utime(self.path, (0, 0))
+        self.assertEqual(catalog.equipments(), reader.load())
+        with open(self.path) as f:
+            self.assertEqual("SYSTEM", json.load(f)[0]["equipmentName"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+import os
+import sys
+import unittest
+
+try:
+    sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../")
+    from status.versions import VersionTracker, VersionError
+    from status.versions import parse_version, etag
+except ImportError as e:
+    print "Please check the python PATH for import test module. (%s)" \
+        % __file__
+    print (e)
+    exit(1)
+
+
+class MockMessage(object):
+    pass
+
+
+class TestVersionTrackerClass(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = VersionTracker(clock=lambda: 1.0)
+
+    def test__update(self):
+        """
+        update: version increases only on changes
+        """
+        self.assertEqual(1002, self.tracker.update({"a": 1, "b": [1]}))
+        self.assertEqual(1002, self.tracker.update({"a": 1, "b": [1]}))
+        self.assertEqual(1003, self.tracker.update({"a": 2, "b": [1]}))
+
+    def test__changed(self):
+        """
+        changed: keys changed after a version
+        """
+        self.tracker.update({"a": 1, "b": {"c": 1}})
+        version = self.tracker.version
+        self.assertEqual([], self.tracker.changed(version))
+        self.tracker.update({"b": {"c": 2}})
+        self.assertEqual(["b"], self.tracker.changed(version))
+        self.assertEqual(["a"], self.tracker.changed(0, ["a"]))
+
+    def test__changed__restart(self):
+        """
+        changed: versions keep increasing after a restart
+        """
+        self.tracker.update({"a": 1})
+        version = self.tracker.version
+        tracker = VersionTracker(clock=lambda: 2.0)
+        tracker.update({"a": 1})
+        self.assertEqual(["a"], tracker.changed(version))
+
+
+class TestParseVersionClass(unittest.TestCase):
+
+    def test__parse_version(self):
+        """
+        parse_version: since query or If-None-Match header
+        """
+        message = MockMessage()
+        self.assertIsNone(parse_version(message))
+        message.query = {"since": "12"}
+        self.assertEqual(12, parse_version(message))
+        message.query = {}
+        message.headers = {"If-None-Match": 'W/' + etag(13)}
+        self.assertEqual(13, parse_version(message))
+
+    def test__parse_version__invalid(self):
+        """
+        parse_version: raise VersionError on invalid version
+        """
+        message = MockMessage()
+        message.query = {"since": "abc"}
+        with self.assertRaises(VersionError):
+            parse_version(message)
+
+
+if __name__ == "__main__":
+    unittest.main()